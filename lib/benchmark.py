@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for nightshift task discovery.
+
+Usage:
+    python benchmark.py parser [--max-headings=N] [--shape=flat|nested]
+    python benchmark.py generate <dest> [shape options]
+    python benchmark.py suite [--data-dir=DIR] [shape options] [--output=FILE]
+    python benchmark.py compare <old.json> <new.json>
+
+The parser benchmark generates org files of doubling size and reports
+time per heading. A linear parser keeps the per-heading cost flat as the
+file grows; the ratio column compares each size against the smallest.
+
+The suite generates a synthetic Data repository (or uses --data-dir) and
+times per-file parsing, cold/warm/uncached discovery and queue building,
+with org_parser and nightshift_parser side by side. Each measurement is
+repeated (best time reported) and then run once more under tracemalloc for
+peak Python memory; process-pool workers used by cold discovery are not
+included in that figure. Results are written as JSON for comparing releases
+with the compare command.
+"""
+
+import sys
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import org_parser
+import nightshift_parser
+from nightshift_parser import parse_org_file
+
+
+def generate_org_text(headings: int, shape: str = 'nested', depth: int = 4) -> str:
+    """Generate org content with the given number of task headings.
+
+    flat:   every task is a top-level heading
+    nested: project trees (next_actions.org style) up to `depth` levels deep
+    """
+    lines = ['#+TITLE: Benchmark', '']
+    for n in range(headings):
+        level = 1 if shape == 'flat' else (n % depth) + 1
+        state = 'QUEUED' if n % 3 == 0 else 'TODO'
+        tags = ' :AI:research:' if n % 5 == 0 else ''
+        lines.append(f"{'*' * level} {state} Task number {n}{tags}")
+        lines.append(':PROPERTIES:')
+        lines.append(f':ID: bench-{n}')
+        lines.append(f':IMPACT: {n % 10}')
+        if n % 4 == 0:
+            lines.append(':CONTEXT: |')
+            lines.append('  First line of context')
+            lines.append('  Second line of context')
+        lines.append(':END:')
+        lines.append(f'Body for task {n}.')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def bench_parser(max_headings: int = 100_000, shape: str = 'nested') -> List[dict]:
+    """Time parse_org_file on doubling file sizes up to max_headings."""
+    sizes = []
+    size = max_headings
+    while size >= 1000 and len(sizes) < 4:
+        sizes.insert(0, size)
+        size //= 2
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for headings in sizes:
+            org_file = Path(tmp) / f'bench-{headings}.org'
+            org_file.write_text(generate_org_text(headings, shape), encoding='utf-8')
+
+            start = time.perf_counter()
+            tasks = parse_org_file(org_file)
+            elapsed = time.perf_counter() - start
+
+            results.append({
+                'headings': headings,
+                'tasks': len(tasks),
+                'seconds': elapsed,
+                'us_per_heading': elapsed / headings * 1e6,
+            })
+    return results
+
+
+def print_parser_results(results: List[dict], shape: str) -> None:
+    """Print parser scaling results as a table."""
+    print(f"\nparse_org_file scaling ({shape})")
+    print("=" * 60)
+    print(f"{'headings':>10} {'tasks':>10} {'seconds':>10} {'us/heading':>12} {'ratio':>8}")
+    base = results[0]['us_per_heading'] if results else 0
+    for r in results:
+        ratio = r['us_per_heading'] / base if base else 0
+        print(f"{r['headings']:>10} {r['tasks']:>10} {r['seconds']:>10.3f} "
+              f"{r['us_per_heading']:>12.2f} {ratio:>8.2f}")
+
+
+# ---------------------------------------------------------------------------
+# Synthetic Data repositories
+# ---------------------------------------------------------------------------
+
+@dataclass
+class RepoShape:
+    """Size and content mix of a generated Data repository."""
+    spaces: int = 3
+    files_per_space: int = 100
+    headings_per_file: int = 40
+    depth: int = 4                 # Maximum heading level
+    multiline_ratio: float = 0.2   # Headings with a multiline :CONTEXT:
+    ai_density: float = 0.1        # Headings tagged :AI:
+    queued_per_space: int = 30     # Tasks in each space's nightshift.org
+    seed: int = 0
+
+
+_AI_TAGS = ['AI', 'AI:research', 'AI:content', 'AI:data', 'AI:code', 'AI:pm']
+_STATES = ['TODO'] * 6 + ['NEXT'] * 2 + ['DONE'] * 3 + ['WAITING']
+_WORDS = (
+    'review draft pricing report migrate onboarding metrics competitor '
+    'roadmap invoice backlog research summary interview archive sync'
+).split()
+
+
+def _space_name(n: int) -> str:
+    return '0-personal' if n == 0 else f'{n}-space{n}'
+
+
+def _heading(rng: random.Random, n: int, level: int, state: str, ai: bool,
+             shape: RepoShape, prefix: str) -> List[str]:
+    title = ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(2, 6)))
+    tags = f' :{rng.choice(_AI_TAGS)}:' if ai else (' :work:' if n % 7 == 0 else '')
+    lines = [f"{'*' * level} {state} {title.capitalize()} {n}{tags}"]
+    if n % 5 == 0:
+        lines.append('SCHEDULED: <2026-10-16 Fri>')
+    lines.append(':PROPERTIES:')
+    lines.append(f':ID: {prefix}-{n}')
+    lines.append(f':CREATED: [2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}]')
+    if ai:
+        lines.append(f':IMPACT: {rng.randint(1, 10)}')
+        lines.append(f':EFFORT: {rng.randint(1, 10)}')
+        lines.append(f':URGENCY: {rng.randint(1, 10)}')
+    if rng.random() < shape.multiline_ratio:
+        lines.append(':CONTEXT: |')
+        for _ in range(rng.randint(2, 5)):
+            lines.append('  ' + ' '.join(rng.choice(_WORDS) for _ in range(8)))
+    lines.append(':END:')
+    for _ in range(rng.randint(0, 3)):
+        lines.append(' '.join(rng.choice(_WORDS) for _ in range(rng.randint(4, 12))))
+    return lines
+
+
+def _org_file_text(rng: random.Random, shape: RepoShape, prefix: str) -> str:
+    lines = ['#+TITLE: ' + prefix, '']
+    level = 1
+    for n in range(shape.headings_per_file):
+        # Random walk over levels: children at most one level deeper
+        level = rng.randint(1, min(level + 1, shape.depth))
+        ai = rng.random() < shape.ai_density
+        lines.extend(_heading(rng, n, level, rng.choice(_STATES), ai, shape, prefix))
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def _nightshift_text(rng: random.Random, shape: RepoShape, prefix: str) -> str:
+    lines = ['#+TITLE: Nightshift queue', '']
+    for n in range(shape.queued_per_space):
+        state = 'QUEUED' if n % 6 else rng.choice(['DONE', 'WORKING', 'FAILED'])
+        lines.extend(_heading(rng, n, 1, state, True, shape, prefix))
+        if state == 'WORKING':
+            lines.insert(-1, ':NIGHTSHIFT_STATUS: executing')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def generate_data_repo(root: Path, shape: RepoShape) -> dict:
+    """Write a synthetic Data repository under root. Returns its totals.
+
+    Each space gets org/next_actions.org, org/inbox.org and
+    org/nightshift.org, with the rest of its files spread over project
+    subdirectories, plus markdown notes the walker must skip. Modification
+    times are backdated so the parse cache treats every file as settled.
+    """
+    rng = random.Random(shape.seed)
+    totals = {'files': 0, 'org_files': 0, 'bytes': 0}
+    written = []
+
+    for s in range(shape.spaces):
+        space = root / _space_name(s)
+        files = {
+            space / 'org' / 'nightshift.org': _nightshift_text(rng, shape, f's{s}-ns'),
+        }
+        for f in range(shape.files_per_space):
+            if f == 0:
+                rel = Path('org') / 'next_actions.org'
+            elif f == 1:
+                rel = Path('org') / 'inbox.org'
+            else:
+                rel = Path('org') / 'projects' / f'p{f % 10}' / f'project-{f}.org'
+            files[space / rel] = _org_file_text(rng, shape, f's{s}-f{f}')
+        for f in range(max(1, shape.files_per_space // 10)):
+            files[space / 'notes' / f'note-{f}.md'] = '# Note\n\nNot an org file.\n'
+
+        for path, text in files.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            data = text.encode('utf-8')
+            path.write_bytes(data)
+            written.append(path)
+            totals['files'] += 1
+            totals['bytes'] += len(data)
+            if path.suffix == '.org':
+                totals['org_files'] += 1
+
+    settled = time.time() - 3600
+    for path in written:
+        os.utime(path, (settled, settled))
+    return totals
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+ALL_AI_STATES = ['TODO', 'NEXT', 'QUEUED', 'WORKING', 'DONE', 'FAILED']
+
+
+def _measure(fn: Callable, repeats: int, setup: Optional[Callable] = None) -> dict:
+    """Best and mean wall time over repeats, then one run for peak memory."""
+    times = []
+    result = None
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'seconds': min(times),
+        'mean_seconds': sum(times) / len(times),
+        'runs': len(times),
+        'peak_bytes': peak,
+        'items': len(result) if hasattr(result, '__len__') else None,
+    }
+
+
+def _reset_caches(data_dir: Path) -> None:
+    """Drop the persistent parse cache, task index state and in-process caches."""
+    from discovery import ParseCache, state_dir
+
+    shutil.rmtree(state_dir(data_dir), ignore_errors=True)
+    ParseCache._instances.pop(Path(data_dir).resolve(), None)
+    nightshift_parser._workspace_cache.clear()
+
+
+def bench_file_parse(data_dir: Path, repeats: int) -> Dict[str, dict]:
+    """Parse every org file with each parser."""
+    org_files = sorted(p for p in data_dir.rglob('*.org') if p.is_file())
+    parsers = {
+        'org_parser': org_parser.parse_org_file,
+        'nightshift_parser': lambda f: nightshift_parser.parse_org_file(f),
+        'nightshift_parser_eager': lambda f: nightshift_parser.parse_org_file(f, lazy=False),
+    }
+
+    results = {}
+    for name, parse in parsers.items():
+        result = _measure(lambda: [t for f in org_files for t in parse(f)], repeats)
+        result['files'] = len(org_files)
+        result['us_per_file'] = result['seconds'] / max(1, len(org_files)) * 1e6
+        results[name] = result
+    return results
+
+
+def bench_discovery(data_dir: Path, repeats: int) -> Dict[str, dict]:
+    """find_ai_tasks over the whole tree: org_parser vs nightshift_parser."""
+    def find_nightshift(use_cache: bool):
+        return lambda: nightshift_parser.find_ai_tasks(
+            data_dir, states=ALL_AI_STATES, use_cache=use_cache)
+
+    results = {
+        'org_parser': _measure(
+            lambda: org_parser.find_ai_tasks(data_dir, states=ALL_AI_STATES), repeats),
+        'nightshift_uncached': _measure(find_nightshift(False), repeats),
+        'nightshift_cold': _measure(
+            find_nightshift(True), repeats, setup=lambda: _reset_caches(data_dir)),
+    }
+    # Warm: cache on disk and loaded in this process
+    _reset_caches(data_dir)
+    nightshift_parser.find_ai_tasks(data_dir, states=ALL_AI_STATES)
+    results['nightshift_warm'] = _measure(find_nightshift(True), repeats)
+    return results
+
+
+def bench_queue(data_dir: Path, repeats: int) -> Dict[str, dict]:
+    """build_queue cold (no caches), warm, and streaming."""
+    from queue import build_queue
+
+    results = {
+        'cold': _measure(
+            lambda: build_queue(data_dir), repeats, setup=lambda: _reset_caches(data_dir)),
+    }
+    _reset_caches(data_dir)
+    build_queue(data_dir)
+    results['warm'] = _measure(lambda: build_queue(data_dir), repeats)
+    results['stream'] = _measure(lambda: build_queue(data_dir, stream=True), repeats)
+    return results
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def run_suite(data_dir: Optional[Path], shape: RepoShape, repeats: int = 3) -> dict:
+    """Run every discovery benchmark. Generates a repo in a temp dir unless data_dir is given.
+
+    An existing data_dir has its nightshift parse cache cleared by the cold runs.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = None
+        if data_dir is None:
+            data_dir = Path(tmp)
+            repo = generate_data_repo(data_dir, shape)
+
+        return {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'revision': _git_revision(),
+                'parser_version': nightshift_parser.PARSER_VERSION,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'repeats': repeats,
+            },
+            'shape': asdict(shape) if repo else None,
+            'repo': repo,
+            'parse': bench_file_parse(data_dir, repeats),
+            'discovery': bench_discovery(data_dir, repeats),
+            'queue': bench_queue(data_dir, repeats),
+        }
+
+
+def print_suite_results(results: dict) -> None:
+    """Print suite results as one table per section."""
+    repo = results.get('repo')
+    if repo:
+        print(f"\nSynthetic repo: {repo['org_files']} org files, {repo['bytes'] / 1e6:.1f} MB")
+    for section in ('parse', 'discovery', 'queue'):
+        print(f"\n{section}")
+        print("=" * 68)
+        print(f"{'benchmark':<26} {'items':>8} {'best s':>10} {'mean s':>10} {'peak MB':>10}")
+        for name, r in results[section].items():
+            items = r['items'] if r['items'] is not None else '-'
+            print(f"{name:<26} {items:>8} {r['seconds']:>10.4f} "
+                  f"{r['mean_seconds']:>10.4f} {r['peak_bytes'] / 1e6:>10.1f}")
+
+
+def compare_results(old: dict, new: dict) -> None:
+    """Print new/old ratios of best time and peak memory for shared benchmarks."""
+    print(f"\n{old['meta'].get('revision')} -> {new['meta'].get('revision')}")
+    print(f"{'benchmark':<36} {'time x':>8} {'memory x':>10}")
+    for section in ('parse', 'discovery', 'queue'):
+        for name, r in new.get(section, {}).items():
+            base = old.get(section, {}).get(name)
+            if not base:
+                continue
+            time_ratio = r['seconds'] / base['seconds'] if base['seconds'] else 0
+            mem_ratio = r['peak_bytes'] / base['peak_bytes'] if base['peak_bytes'] else 0
+            print(f"{section + '.' + name:<36} {time_ratio:>8.2f} {mem_ratio:>10.2f}")
+
+
+def _add_shape_args(p: argparse.ArgumentParser) -> None:
+    defaults = RepoShape()
+    p.add_argument('--spaces', type=int, default=defaults.spaces)
+    p.add_argument('--files', type=int, default=defaults.files_per_space, help='Org files per space')
+    p.add_argument('--headings', type=int, default=defaults.headings_per_file, help='Headings per file')
+    p.add_argument('--depth', type=int, default=defaults.depth, help='Maximum heading level')
+    p.add_argument('--multiline', type=float, default=defaults.multiline_ratio,
+                   help='Fraction of headings with a multiline property')
+    p.add_argument('--ai-density', type=float, default=defaults.ai_density,
+                   help='Fraction of headings tagged :AI:')
+    p.add_argument('--queued', type=int, default=defaults.queued_per_space,
+                   help='Tasks in each nightshift.org')
+    p.add_argument('--seed', type=int, default=defaults.seed)
+
+
+def _shape_from_args(args) -> RepoShape:
+    return RepoShape(
+        spaces=args.spaces,
+        files_per_space=args.files,
+        headings_per_file=args.headings,
+        depth=args.depth,
+        multiline_ratio=args.multiline,
+        ai_density=args.ai_density,
+        queued_per_space=args.queued,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Nightshift discovery benchmarks')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_parser = sub.add_parser('parser', help='parse_org_file scaling on large files')
+    p_parser.add_argument('--max-headings', type=int, default=100_000)
+    p_parser.add_argument('--shape', choices=['flat', 'nested'], default='nested')
+
+    p_generate = sub.add_parser('generate', help='Write a synthetic Data repository')
+    p_generate.add_argument('dest', type=Path)
+    _add_shape_args(p_generate)
+
+    p_suite = sub.add_parser('suite', help='Parse, discovery and queue benchmarks')
+    p_suite.add_argument('--data-dir', type=Path, help='Benchmark an existing tree instead')
+    p_suite.add_argument('--repeats', type=int, default=3)
+    p_suite.add_argument('--output', type=Path, help='Write results as JSON')
+    _add_shape_args(p_suite)
+
+    p_compare = sub.add_parser('compare', help='Compare two suite JSON files')
+    p_compare.add_argument('old', type=Path)
+    p_compare.add_argument('new', type=Path)
+
+    args = parser.parse_args()
+
+    if args.command == 'parser':
+        results = bench_parser(args.max_headings, args.shape)
+        print_parser_results(results, args.shape)
+    elif args.command == 'generate':
+        totals = generate_data_repo(args.dest, _shape_from_args(args))
+        print(f"Wrote {totals['org_files']} org files ({totals['bytes'] / 1e6:.1f} MB) to {args.dest}")
+    elif args.command == 'suite':
+        results = run_suite(args.data_dir, _shape_from_args(args), args.repeats)
+        print_suite_results(results)
+        if args.output:
+            args.output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+            print(f"\nResults written to {args.output}")
+    elif args.command == 'compare':
+        old = json.loads(args.old.read_text(encoding='utf-8'))
+        new = json.loads(args.new.read_text(encoding='utf-8'))
+        compare_results(old, new)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,11 +5,13 @@ Implements distributed locking via git commit+push.
 
 import subprocess
 import socket
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-from nightshift_parser import OrgTask, update_task_property, update_task_state, write_org_file
+from discovery import state_dir
+from nightshift_parser import OrgTask, TaskEditSession, reload_task
 
 
 def get_executor_id() -> str:
@@ -45,6 +47,49 @@ def is_file_gitignored(data_dir: Path, file_path: Path) -> bool:
     return result.returncode == 0  # Exit 0 means file IS ignored
 
 
+def gitignored_files(data_dir: Path, file_paths: Iterable[Path]) -> Set[Path]:
+    """Which of file_paths are gitignored, with one git call."""
+    paths = [Path(p) for p in file_paths]
+    if not paths:
+        return set()
+    result = subprocess.run(
+        ['git', 'check-ignore', '--'] + [str(p) for p in paths],
+        cwd=data_dir,
+        capture_output=True,
+        text=True
+    )
+    ignored = {line.strip() for line in result.stdout.splitlines() if line.strip()}
+    return {p for p in paths if str(p) in ignored}
+
+
+# Machine-local state: kept out of git so executors never push or merge it.
+# Execution records stay tracked; they are what executors share.
+LOCAL_STATE_PATTERNS = (
+    'spend-*.jsonl', 'spend-*.jsonl.tmp', 'spend.lock',
+    'parse-cache.json', 'parse-cache.tmp', 'task-index.json', 'task-index.tmp',
+    'estimator-features.jsonl',
+)
+
+
+def ensure_state_gitignore(data_dir: Path) -> None:
+    """Add LOCAL_STATE_PATTERNS to the state directory's .gitignore (best effort)."""
+    path = state_dir(data_dir) / '.gitignore'
+    try:
+        text = path.read_text(encoding='utf-8')
+    except OSError:
+        text = ''
+    missing = [p for p in LOCAL_STATE_PATTERNS if p not in text.splitlines()]
+    if not missing:
+        return
+    if text and not text.endswith('\n'):
+        text += '\n'
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text + ''.join(p + '\n' for p in missing), encoding='utf-8')
+    except OSError:
+        pass
+
+
 def git_add(data_dir: Path, file_path: Path, force: bool = False) -> bool:
     """Stage a file. Returns True on success."""
     cmd = ['git', 'add']
@@ -60,6 +105,20 @@ def git_add(data_dir: Path, file_path: Path, force: bool = False) -> bool:
     return result.returncode == 0
 
 
+def git_add_files(data_dir: Path, file_paths: Iterable[Path]) -> bool:
+    """Stage several files with one git call. Returns True on success."""
+    paths = [str(p) for p in file_paths]
+    if not paths:
+        return True
+    result = subprocess.run(
+        ['git', 'add', '--'] + paths,
+        cwd=data_dir,
+        capture_output=True,
+        text=True
+    )
+    return result.returncode == 0
+
+
 def git_commit(data_dir: Path, message: str) -> bool:
     """Commit staged changes. Returns True on success."""
     result = subprocess.run(
@@ -82,10 +141,35 @@ def git_push(data_dir: Path) -> bool:
     return result.returncode == 0
 
 
-def git_reset_hard(data_dir: Path, ref: str = 'HEAD~1') -> bool:
-    """Hard reset to ref. Returns True on success."""
+def git_commits_ahead(data_dir: Path) -> int:
+    """Local commits not on the upstream branch yet (0 if unknown)."""
     result = subprocess.run(
-        ['git', 'reset', '--hard', ref],
+        ['git', 'rev-list', '--count', '@{upstream}..HEAD'],
+        cwd=data_dir,
+        capture_output=True,
+        text=True
+    )
+    try:
+        return int(result.stdout.strip()) if result.returncode == 0 else 0
+    except ValueError:
+        return 0
+
+
+def git_has_staged_changes(data_dir: Path) -> bool:
+    """True if the index differs from HEAD."""
+    result = subprocess.run(
+        ['git', 'diff', '--cached', '--quiet'],
+        cwd=data_dir,
+        capture_output=True
+    )
+    return result.returncode == 1
+
+
+def git_reset_keep(data_dir: Path, ref: str = 'HEAD~1') -> bool:
+    """Reset to ref, keeping uncommitted changes (e.g. not yet flushed by
+    CommitCoalescer) in files the reset does not touch. Returns True on success."""
+    result = subprocess.run(
+        ['git', 'reset', '--keep', ref],
         cwd=data_dir,
         capture_output=True,
         text=True
@@ -111,39 +195,9 @@ def claim_task(task: OrgTask, data_dir: Path, use_git: bool = True) -> bool:
     if file_is_gitignored:
         print(f"  NOTE: File is gitignored, using local mode (no git sync)")
 
-    # Update org file with claim properties
-    content = task.file_path.read_text(encoding='utf-8')
-
-    # Set state to WORKING
-    content = update_task_state(task, 'WORKING')
-    task.state = 'WORKING'  # Update in memory too
-
-    # Reload and add properties
-    task.file_path.write_text(content, encoding='utf-8')
-    task = OrgTask(
-        id=task.id,
-        title=task.title,
-        state='WORKING',
-        tags=task.tags,
-        properties=task.properties,
-        file_path=task.file_path,
-        line_number=task.line_number,
-        heading_level=task.heading_level,
-        body=task.body
-    )
-
-    content = update_task_property(task, 'NIGHTSHIFT_STATUS', 'executing')
-    write_org_file(task.file_path, content)
-
-    content = task.file_path.read_text(encoding='utf-8')
-    task.properties['NIGHTSHIFT_STATUS'] = 'executing'
-
-    # Find the task heading and add all properties
-    final_content = content.replace(
-        ':NIGHTSHIFT_STATUS: executing',
-        f':NIGHTSHIFT_STATUS: executing\n:NIGHTSHIFT_EXECUTOR: {executor_id}\n:NIGHTSHIFT_STARTED: {started_at}'
-    )
-    write_org_file(task.file_path, final_content)
+    # Update org file with claim state and properties: one load, one write
+    with TaskEditSession(task.file_path) as session:
+        _mark_claimed(session, task, executor_id, started_at)
 
     # If skipping git, we're done - local claim successful
     if skip_git:
@@ -163,7 +217,7 @@ def claim_task(task: OrgTask, data_dir: Path, use_git: bool = True) -> bool:
     # Push (this is the lock acquisition)
     if not git_push(data_dir):
         print(f"CONFLICT: Someone else claimed {task.id}, reverting...")
-        git_reset_hard(data_dir, 'HEAD~1')
+        git_reset_keep(data_dir, 'HEAD~1')
         git_pull(data_dir)
         return False
 
@@ -171,6 +225,124 @@ def claim_task(task: OrgTask, data_dir: Path, use_git: bool = True) -> bool:
     return True
 
 
+def _mark_claimed(session: TaskEditSession, task: OrgTask, executor_id: str, started_at: str) -> None:
+    session.set_state(task, 'WORKING')
+    session.set_properties(task, {
+        'NIGHTSHIFT_STATUS': 'executing',
+        'NIGHTSHIFT_EXECUTOR': executor_id,
+        'NIGHTSHIFT_STARTED': started_at,
+    })
+
+
+def _still_claimable(task: OrgTask, state: str) -> bool:
+    """After a pull: True if the task is still in state and nobody is executing it.
+
+    Refreshes the in-memory task from disk either way.
+    """
+    current = reload_task(task)
+    if current is None:
+        return False
+    task.state = current.state
+    task.properties = dict(current.properties)
+    return (current.state == state
+            and current.get_property('NIGHTSHIFT_STATUS', '') not in ('executing', 'claimed'))
+
+
+def claim_batch(tasks: List[OrgTask], data_dir: Path, use_git: bool = True) -> List[OrgTask]:
+    """
+    Claim several tasks with one edit pass per file and a single commit+push.
+
+    Tasks in gitignored files are claimed locally, as in claim_task. If the
+    push is rejected, the batch commit is dropped, the latest changes are
+    pulled, and each task that is still unclaimed is claimed on its own
+    with claim_task; tasks someone else took meanwhile are skipped.
+
+    Returns the tasks that were claimed, in input order.
+    """
+    if not tasks:
+        return []
+    if len(tasks) == 1:
+        return list(tasks) if claim_task(tasks[0], data_dir, use_git) else []
+    executor_id = get_executor_id()
+    started_at = now_iso()
+    original_states = {id(task): task.state for task in tasks}
+
+    by_file: Dict[Path, List[OrgTask]] = {}
+    for task in tasks:
+        by_file.setdefault(Path(task.file_path), []).append(task)
+    local_files = set(by_file) if not use_git else gitignored_files(data_dir, by_file)
+    if use_git and local_files:
+        print(f"  NOTE: {len(local_files)} file(s) gitignored, claiming their tasks locally (no git sync)")
+
+    # One load and one write per file
+    for file_path, file_tasks in by_file.items():
+        with TaskEditSession(file_path) as session:
+            for task in file_tasks:
+                _mark_claimed(session, task, executor_id, started_at)
+
+    git_files = [fp for fp in by_file if fp not in local_files]
+    if not git_files:
+        print(f"CLAIMED (local): {', '.join(t.id for t in tasks)} by {executor_id}")
+        return list(tasks)
+
+    git_tasks = [task for fp in git_files for task in by_file[fp]]
+    claimed_ids = {id(task) for fp in local_files for task in by_file[fp]}
+    ids = ', '.join(task.id for task in git_tasks)
+    if not git_add_files(data_dir, git_files) or not git_commit(
+            data_dir, f"nightshift: claim {len(git_tasks)} tasks\n\n{ids}"):
+        print(f"ERROR: Failed to commit batch claim for {ids}")
+        return [task for task in tasks if id(task) in claimed_ids]
+
+    # Push (this is the lock acquisition for the whole batch)
+    if git_push(data_dir):
+        print(f"CLAIMED: {ids} by {executor_id}")
+        claimed_ids.update(id(task) for task in git_tasks)
+        return [task for task in tasks if id(task) in claimed_ids]
+
+    print(f"CONFLICT: Batch claim of {len(git_tasks)} tasks rejected, resolving per task...")
+    git_reset_keep(data_dir, 'HEAD~1')
+    git_pull(data_dir)
+    for task in git_tasks:
+        if not _still_claimable(task, original_states[id(task)]):
+            print(f"  Already claimed elsewhere: {task.id}")
+            continue
+        if claim_task(task, data_dir, use_git):
+            claimed_ids.add(id(task))
+    return [task for task in tasks if id(task) in claimed_ids]
+
+
+# Properties a claim sets, restored by release_claims
+CLAIM_PROPERTIES = ('NIGHTSHIFT_STATUS', 'NIGHTSHIFT_EXECUTOR', 'NIGHTSHIFT_STARTED')
+
+
+def claim_snapshot(task: OrgTask) -> Tuple[str, Dict[str, Optional[str]]]:
+    """A task's state and claim properties (None: absent), to hand to release_claims."""
+    return task.state, {name: task.properties.get(name) for name in CLAIM_PROPERTIES}
+
+
+def release_claims(claims: Iterable[Tuple[OrgTask, tuple]]) -> List[Path]:
+    """
+    Undo claims on tasks that never ran, given (task, claim_snapshot taken
+    before the claim): the state and claim properties go back to how they
+    were, with properties the claim added removed. One edit pass per file.
+
+    Returns the files edited; committing them is up to the caller.
+    """
+    by_file: Dict[Path, List[Tuple[OrgTask, tuple]]] = {}
+    for task, snapshot in claims:
+        by_file.setdefault(Path(task.file_path), []).append((task, snapshot))
+    for file_path, file_claims in by_file.items():
+        with TaskEditSession(file_path) as session:
+            for task, (state, props) in file_claims:
+                session.set_state(task, state)
+                for prop_name, value in props.items():
+                    if value is None:
+                        session.remove_property(task, prop_name)
+                    else:
+                        session.set_property(task, prop_name, value)
+    return list(by_file)
+
+
 def complete_task(
     task: OrgTask,
     data_dir: Path,
@@ -194,47 +366,15 @@ def complete_task(
     }
     new_state = state_map.get(status, 'REVIEW')
 
-    # Update org file
-    content = task.file_path.read_text(encoding='utf-8')
-
-    # Update state
-    content = update_task_state(task, new_state)
-    write_org_file(task.file_path, content)
-
-    # Update properties
-    task.state = new_state
-    content = task.file_path.read_text(encoding='utf-8')
-
-    # Add completion properties
-    props_to_add = [
-        ('NIGHTSHIFT_STATUS', status),
-        ('NIGHTSHIFT_COMPLETED', completed_at),
-        ('NIGHTSHIFT_SCORE', str(score)),
-        ('NIGHTSHIFT_OUTPUT', output_path),
-    ]
-
-    for prop_name, prop_value in props_to_add:
-        content = content.replace(
-            ':NIGHTSHIFT_STATUS: executing',
-            f':NIGHTSHIFT_STATUS: {status}'
-        )
-
-    # Just append the properties (simplified)
-    # Find :NIGHTSHIFT_STATUS: line and add after it
-    lines = content.split('\n')
-    for i, line in enumerate(lines):
-        if ':NIGHTSHIFT_STATUS:' in line:
-            insert_lines = [
-                f':NIGHTSHIFT_COMPLETED: {completed_at}',
-                f':NIGHTSHIFT_SCORE: {score}',
-                f':NIGHTSHIFT_OUTPUT: {output_path}'
-            ]
-            for j, new_line in enumerate(insert_lines):
-                lines.insert(i + 1 + j, new_line)
-            break
-
-    content = '\n'.join(lines)
-    write_org_file(task.file_path, content)
+    # Update org file: state and completion properties, one load, one write
+    with TaskEditSession(task.file_path) as session:
+        session.set_state(task, new_state)
+        session.set_properties(task, {
+            'NIGHTSHIFT_STATUS': status,
+            'NIGHTSHIFT_COMPLETED': completed_at,
+            'NIGHTSHIFT_SCORE': str(score),
+            'NIGHTSHIFT_OUTPUT': output_path,
+        })
 
     return True
 
@@ -251,6 +391,92 @@ def git_commit_push(data_dir: Path, message: str, files: Optional[list] = None)
     return git_push(data_dir)
 
 
+class CommitCoalescer:
+    """Batch the run's bookkeeping commits into one commit+push.
+
+    add() notes a change (commit message plus the exact files it touched).
+    Pending changes are committed and pushed together every max_tasks
+    changes, once the oldest has waited max_seconds, and on flush(). Only the noted files (and those passed to track())
+    are staged, not the whole tree.
+
+    Claims do not go through here: their push is the distributed lock and
+    stays synchronous. Call commit() right before claiming so the claim's
+    files start clean and its push carries the pending changes along.
+    """
+
+    def __init__(self, data_dir: Path, max_tasks: int = 5, max_seconds: float = 300.0):
+        self.data_dir = data_dir
+        self.max_tasks = max(1, max_tasks)
+        self.max_seconds = max_seconds
+        self.pushes = 0
+        self._paths: Dict[Path, None] = {}  # Ordered set
+        self._messages: List[str] = []
+        self._since: Optional[float] = None
+
+    def track(self, files: Iterable) -> None:
+        """Stage files with the next commit without counting as a change."""
+        for f in files:
+            if f:
+                self._paths[Path(f)] = None
+
+    def add(self, message: str, files: Iterable = ()) -> bool:
+        """Queue a change; flushes when a limit is reached. Returns False if a flush failed."""
+        self.track(files)
+        self._messages.append(message)
+        if self._since is None:
+            self._since = time.monotonic()
+        if (len(self._messages) >= self.max_tasks
+                or time.monotonic() - self._since >= self.max_seconds):
+            return self.flush()
+        return True
+
+    def commit(self, all_files: bool = False) -> bool:
+        """Commit pending changes locally without pushing. Returns False if staging
+        or committing failed; the changes then stay pending.
+
+        all_files stages the whole working tree instead of the noted files.
+        Messages whose files turn out to be unchanged or gitignored go out
+        with the next commit that has content.
+        """
+        if all_files:
+            if subprocess.run(['git', 'add', '-A'], cwd=self.data_dir,
+                              capture_output=True).returncode != 0:
+                return False
+        else:
+            paths = [p for p in self._paths if p.exists()]
+            ignored = gitignored_files(self.data_dir, paths)
+            for path in ignored:
+                del self._paths[path]  # Never committable
+            paths = [p for p in paths if p not in ignored]
+            if paths and not git_add_files(self.data_dir, paths):
+                return False
+        if not git_has_staged_changes(self.data_dir):
+            return True
+        messages = self._messages
+        if len(messages) == 1:
+            message = messages[0]
+        elif messages:
+            message = f"nightshift: {len(messages)} updates\n\n" + '\n'.join(messages)
+        else:
+            message = "nightshift: update state"
+        if not git_commit(self.data_dir, message):
+            return False
+        self._paths, self._messages, self._since = {}, [], None
+        return True
+
+    def flush(self, all_files: bool = False) -> bool:
+        """Commit anything pending and push unpushed commits. Returns True on success."""
+        if not self.commit(all_files):
+            print("WARNING: Could not commit pending nightshift changes")
+            return False
+        if not git_commits_ahead(self.data_dir):
+            return True
+        if not git_push(self.data_dir):
+            return False
+        self.pushes += 1
+        return True
+
+
 if __name__ == '__main__':
     import sys
     from nightshift_parser import find_ai_tasks
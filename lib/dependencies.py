@@ -0,0 +1,253 @@
+"""
+Dependency-aware ordering for the nightshift queue.
+
+Tasks name their prerequisites by :ID: in a :DEPENDS_ON: property
+(space/comma separated, bare IDs or [[id:...]] links). DependencyGraph links
+the queued tasks into a DAG and produces:
+
+- order(): a topological order weighted by priority. A prerequisite
+  inherits the highest priority of anything waiting on it, so a low-scored
+  task that unblocks an urgent one runs early.
+- wavefronts(): ready sets; every task in a wave depends only on earlier
+  waves, so tasks within one wave can run concurrently.
+- blocked(): tasks that cannot run, with the reason (dependency cycle,
+  prerequisite not DONE yet, or downstream of either).
+
+Prerequisites outside the queue are looked up in task_states: DONE counts as
+met, any other known state blocks. Unknown IDs count as met, since finished
+tasks are usually archived out of the walk.
+"""
+
+import heapq
+import re
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+SATISFIED_STATES = frozenset({'DONE'})
+
+_DEPENDENCY_RE = re.compile(r'\[\[(?:id:)?([^\]]+)\](?:\[[^\]]*\])?\]|([^\s,\[\]]+)')
+
+
+def depends_on(task) -> List[str]:
+    """Prerequisite IDs from a task's :DEPENDS_ON: property, in order."""
+    value = task.get_property('DEPENDS_ON')
+    if not value:
+        return []
+    ids = []
+    for link, bare in _DEPENDENCY_RE.findall(value):
+        dep = (link or bare).strip()
+        if dep.startswith('id:'):
+            dep = dep[3:]
+        if dep and dep not in ids:
+            ids.append(dep)
+    return ids
+
+
+def _default_key(item) -> tuple:
+    return (-item.priority_score,)
+
+
+class DependencyGraph:
+    """DAG over queued tasks (QueuedTask-like: .task and .priority_score).
+
+    key orders tasks of equal effective priority (default: own priority);
+    remaining ties keep input order.
+    """
+
+    def __init__(
+        self,
+        items: Iterable,
+        task_states: Optional[Dict[str, str]] = None,
+        key: Callable = _default_key,
+    ):
+        self.items = list(items)
+        self._key = key
+        self._position = {id(item): i for i, item in enumerate(self.items)}
+        n = len(self.items)
+        self._prerequisites: List[List[int]] = [[] for _ in range(n)]
+        self._dependents: List[List[int]] = [[] for _ in range(n)]
+        self._waiting_on: Dict[int, List[str]] = {}
+
+        by_id: Dict[str, List[int]] = defaultdict(list)
+        for i, item in enumerate(self.items):
+            by_id[item.task.id].append(i)
+
+        for i, item in enumerate(self.items):
+            for dep in depends_on(item.task):
+                if dep in by_id:
+                    for j in by_id[dep]:
+                        if j not in self._prerequisites[i]:
+                            self._prerequisites[i].append(j)
+                            self._dependents[j].append(i)
+                elif task_states and task_states.get(dep, 'DONE') not in SATISFIED_STATES:
+                    self._waiting_on.setdefault(i, []).append(dep)
+
+        self._cycles = self._find_cycles()
+        self.cycles: List[List] = [[self.items[i] for i in scc] for scc in self._cycles]
+        self._blocked = self._find_blocked()
+        self._effective = self._effective_priorities()
+
+    # ---- Structure ----
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def prerequisites(self, item) -> List:
+        """Queued tasks this one waits for."""
+        return [self.items[j] for j in self._prerequisites[self._position[id(item)]]]
+
+    def dependents(self, item) -> List:
+        """Queued tasks waiting directly on this one."""
+        return [self.items[j] for j in self._dependents[self._position[id(item)]]]
+
+    def descendants(self, item) -> List:
+        """Everything that transitively waits on this task, in input order."""
+        seen: Set[int] = set()
+        stack = list(self._dependents[self._position[id(item)]])
+        while stack:
+            j = stack.pop()
+            if j not in seen:
+                seen.add(j)
+                stack.extend(self._dependents[j])
+        return [self.items[j] for j in sorted(seen)]
+
+    def has_dependencies(self) -> bool:
+        return any(self._prerequisites) or bool(self._waiting_on)
+
+    def _find_cycles(self) -> List[List[int]]:
+        """Strongly connected components that contain a cycle (iterative Tarjan)."""
+        n = len(self.items)
+        index = [None] * n
+        low = [0] * n
+        on_stack = [False] * n
+        stack: List[int] = []
+        counter = 0
+        cycles = []
+
+        for root in range(n):
+            if index[root] is not None:
+                continue
+            work = [(root, 0)]
+            while work:
+                v, child = work.pop()
+                if child == 0:
+                    index[v] = low[v] = counter
+                    counter += 1
+                    stack.append(v)
+                    on_stack[v] = True
+                edges = self._dependents[v]
+                if child < len(edges):
+                    work.append((v, child + 1))
+                    w = edges[child]
+                    if index[w] is None:
+                        work.append((w, 0))
+                    elif on_stack[w]:
+                        low[v] = min(low[v], index[w])
+                    continue
+                if low[v] == index[v]:
+                    scc = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        scc.append(w)
+                        if w == v:
+                            break
+                    if len(scc) > 1 or v in self._prerequisites[v]:
+                        cycles.append(sorted(scc))
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[v])
+        return cycles
+
+    def _find_blocked(self) -> Dict[int, str]:
+        reasons: Dict[int, str] = {}
+        for scc in self._cycles:
+            ids = ', '.join(self.items[i].task.id for i in scc)
+            for i in scc:
+                reasons[i] = f"dependency cycle among {ids}"
+        for i, deps in self._waiting_on.items():
+            reasons.setdefault(i, f"waiting on {', '.join(deps)}")
+
+        stack = list(reasons)
+        while stack:
+            i = stack.pop()
+            for j in self._dependents[i]:
+                if j not in reasons:
+                    reasons[j] = f"after blocked {self.items[i].task.id}"
+                    stack.append(j)
+        return reasons
+
+    def _topological(self) -> List[int]:
+        """Unblocked tasks in plain topological (Kahn) order."""
+        pending = {i: len(self._prerequisites[i]) for i in range(len(self.items))
+                   if i not in self._blocked}
+        ready = [i for i, count in pending.items() if count == 0]
+        order = []
+        while ready:
+            i = ready.pop()
+            order.append(i)
+            for j in self._dependents[i]:
+                if j not in pending:
+                    continue  # Blocked dependent
+                pending[j] -= 1
+                if pending[j] == 0:
+                    ready.append(j)
+        return order
+
+    def _effective_priorities(self) -> List[float]:
+        effective = [item.priority_score for item in self.items]
+        for i in reversed(self._topological()):
+            for j in self._dependents[i]:
+                if j not in self._blocked and effective[j] > effective[i]:
+                    effective[i] = effective[j]
+        return effective
+
+    def refresh(self) -> None:
+        """Recompute inherited priorities after priority_score changes."""
+        self._effective = self._effective_priorities()
+
+    # ---- Scheduling ----
+
+    def sort_key(self, item) -> tuple:
+        """Heap key: inherited priority first, then the item's own key."""
+        i = self._position[id(item)]
+        return (-self._effective[i],) + tuple(self._key(item))
+
+    def order(self) -> List:
+        """Runnable tasks, prerequisites first, otherwise best effective priority first."""
+        pending = {i: len(self._prerequisites[i]) for i in range(len(self.items))
+                   if i not in self._blocked}
+        heap = [(self.sort_key(self.items[i]), i) for i, count in pending.items() if count == 0]
+        heapq.heapify(heap)
+        order = []
+        while heap:
+            _, i = heapq.heappop(heap)
+            order.append(self.items[i])
+            for j in self._dependents[i]:
+                if j not in pending:
+                    continue  # Blocked dependent
+                pending[j] -= 1
+                if pending[j] == 0:
+                    heapq.heappush(heap, (self.sort_key(self.items[j]), j))
+        return order
+
+    def wavefronts(self) -> List[List]:
+        """Ready sets: wave k depends only on waves < k. Each wave is priority ordered."""
+        level: Dict[int, int] = {}
+        for i in self._topological():
+            level[i] = max((level[j] + 1 for j in self._prerequisites[i]), default=0)
+        waves: List[List[int]] = [[] for _ in range(max(level.values(), default=-1) + 1)]
+        for i, wave in level.items():
+            waves[wave].append(i)
+        return [
+            [self.items[i] for i in sorted(wave, key=lambda i: (self.sort_key(self.items[i]), i))]
+            for wave in waves
+        ]
+
+    def blocked(self) -> List[Tuple[object, str]]:
+        """(task, reason) for every task that cannot run, in input order."""
+        return [(self.items[i], self._blocked[i]) for i in sorted(self._blocked)]
+
+    def is_blocked(self, item) -> bool:
+        return self._position[id(item)] in self._blocked
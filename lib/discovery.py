@@ -0,0 +1,602 @@
+"""
+Task discovery for nightshift.
+
+- Directory walking: os.scandir walker that prunes excluded subtrees
+  (VCS, dependency and archive dirs, excluded spaces, ignore globs) before
+  descending into them.
+- Persistent parse cache for find_ai_tasks: parsed :AI: tasks are stored per
+  org file under .datacore/state/nightshift/ and reused while the file's
+  (mtime_ns, size) and the parser version are unchanged.
+- Prefilter: files whose bytes never contain ':AI' are skipped unparsed.
+- Parsing: cache misses are sharded across a process pool above a threshold.
+- Streaming: stream_ai_tasks yields tasks file by file as the walk proceeds,
+  for callers that stop early or cannot hold every task at once.
+"""
+
+import fnmatch
+import json
+import mmap
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+from nightshift_parser import OrgTask, PARSER_VERSION, iter_org_tasks, parse_org_file
+
+
+CACHE_FILENAME = 'parse-cache.json'
+
+# Files modified this recently are parsed but not cached: on filesystems with
+# coarse timestamps a second write in the same tick would keep the same key.
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+def state_dir(data_dir: Path) -> Path:
+    """Nightshift state directory (execution records, caches)."""
+    return data_dir / '.datacore' / 'state' / 'nightshift'
+
+
+_RECORD_RE = re.compile(r'^\d{8}-.*\.json$')
+
+
+def record_files(data_dir: Path) -> Set[str]:
+    """Names of the execution records (YYYYMMDD-*.json) in the state directory."""
+    try:
+        return {name for name in os.listdir(state_dir(data_dir)) if _RECORD_RE.match(name)}
+    except OSError:
+        return set()
+
+
+def is_ai_task(task: OrgTask) -> bool:
+    """True if the task carries an :AI: tag (:AI:, :AI:research:, ...)."""
+    return any(tag.startswith('AI') for tag in task.tags)
+
+
+# ---------------------------------------------------------------------------
+# Directory walker
+# ---------------------------------------------------------------------------
+
+# Never descended into: version control and dependency trees
+PRUNE_DIRS = frozenset({
+    '.git', '.hg', '.svn', 'node_modules', '__pycache__', '.venv', 'venv', '.tox',
+})
+
+
+def _prefix_set(spaces: Optional[List[str]]) -> frozenset:
+    """Normalize space names/paths ('1-team', '1-team/sub/') to part tuples."""
+    return frozenset(
+        tuple(p for p in str(s).strip('/').split('/') if p)
+        for s in (spaces or ())
+        if str(s).strip('/')
+    )
+
+
+class WalkFilter:
+    """Precompiled include/exclude rules for walking a data directory.
+
+    spaces and exclude_spaces are paths relative to the data directory
+    (normally top-level space dirs) and match whole path components.
+    ignore_globs are fnmatch patterns tested against both the relative
+    POSIX path and the entry name.
+    """
+
+    def __init__(
+        self,
+        spaces: Optional[List[str]] = None,
+        exclude_spaces: Optional[List[str]] = None,
+        ignore_globs: Optional[List[str]] = None,
+        prune_dirs: frozenset = PRUNE_DIRS,
+    ):
+        self.include = _prefix_set(spaces)
+        self.exclude = _prefix_set(exclude_spaces)
+        self.prune_dirs = prune_dirs
+        # Directories that must be entered to reach an included space
+        self.include_ancestors = frozenset(
+            prefix[:n] for prefix in self.include for n in range(1, len(prefix))
+        )
+        self._include_lengths = sorted({len(p) for p in self.include})
+        self._exclude_lengths = sorted({len(p) for p in self.exclude})
+        self.ignore = (
+            re.compile('|'.join(fnmatch.translate(g) for g in ignore_globs))
+            if ignore_globs else None
+        )
+
+    @staticmethod
+    def _under(parts: tuple, prefixes: frozenset, lengths: List[int]) -> bool:
+        return any(parts[:n] in prefixes for n in lengths if n <= len(parts))
+
+    def _ignored(self, parts: tuple) -> bool:
+        if self.ignore is None:
+            return False
+        return bool(self.ignore.match(parts[-1]) or self.ignore.match('/'.join(parts)))
+
+    def is_included(self, parts: tuple) -> bool:
+        """True if no space filter is set or parts lie inside an included space."""
+        return not self.include or self._under(parts, self.include, self._include_lengths)
+
+    def enter_dir(self, parts: tuple) -> bool:
+        """Decide whether to descend into the directory at relative path parts."""
+        name = parts[-1]
+        if name in self.prune_dirs or 'archive' in name.lower():
+            return False
+        if self._ignored(parts):
+            return False
+        if self.exclude and self._under(parts, self.exclude, self._exclude_lengths):
+            return False
+        return self.is_included(parts) or parts in self.include_ancestors
+
+    def accept_file(self, parts: tuple, dir_included: bool) -> bool:
+        """Decide whether an .org file inside an entered directory is scanned."""
+        if 'archive' in parts[-1].lower() or self._ignored(parts):
+            return False
+        return dir_included or self.is_included(parts)
+
+    def signature(self) -> list:
+        """JSON-friendly description of the rules, for detecting config changes."""
+        return [
+            sorted('/'.join(p) for p in self.include),
+            sorted('/'.join(p) for p in self.exclude),
+            self.ignore.pattern if self.ignore else None,
+            sorted(self.prune_dirs),
+        ]
+
+    def allows(self, parts: tuple) -> bool:
+        """Check a file path against every rule a walk would apply on the way down."""
+        for n in range(1, len(parts)):
+            if not self.enter_dir(parts[:n]):
+                return False
+        return self.accept_file(parts, len(parts) > 1 and self.is_included(parts[:-1]))
+
+
+def walk_order_key(parts: tuple) -> tuple:
+    """Sort key reproducing iter_org_files order for relative path parts."""
+    return tuple((1, p) for p in parts[:-1]) + ((0, parts[-1]),)
+
+
+def iter_org_files(
+    data_dir: Path,
+    walk_filter: Optional[WalkFilter] = None,
+    repo_roots: Optional[List[tuple]] = None,
+    start: tuple = (),
+) -> Iterator[Path]:
+    """Yield .org files under data_dir, pruning excluded subtrees.
+
+    Each directory's files come first, sorted by name, then its
+    subdirectories depth-first, so the order is stable across machines.
+    Symlinked directories are not followed. If repo_roots is given, the
+    relative parts of every walked directory holding a .git entry are
+    appended to it. start limits the walk to one subdirectory (given as
+    relative parts; the caller checks that it may be entered).
+    """
+    walk_filter = walk_filter or WalkFilter()
+    yield from _walk(data_dir.joinpath(*start), start, walk_filter, repo_roots)
+
+
+def _walk(
+    directory: Path,
+    parts: tuple,
+    walk_filter: WalkFilter,
+    repo_roots: Optional[List[tuple]] = None,
+) -> Iterator[Path]:
+    try:
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError:
+        return
+
+    dir_included = bool(parts) and walk_filter.is_included(parts)
+    subdirs = []
+    for entry in entries:
+        name = entry.name
+        if name == '.git' and repo_roots is not None:
+            repo_roots.append(parts)
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry)
+            elif name.endswith('.org') and entry.is_file():
+                if walk_filter.accept_file(parts + (name,), dir_included):
+                    yield directory / name
+        except OSError:
+            continue
+
+    for entry in subdirs:
+        sub_parts = parts + (entry.name,)
+        if walk_filter.enter_dir(sub_parts):
+            yield from _walk(directory / entry.name, sub_parts, walk_filter, repo_roots)
+
+
+# ---------------------------------------------------------------------------
+# Persistent parse cache
+# ---------------------------------------------------------------------------
+
+def _tasks_from_entry(entry: dict, org_file: Path) -> List[OrgTask]:
+    source = (entry['mtime_ns'], entry['size'])
+    return [OrgTask.from_record(t, org_file, source) for t in entry['tasks']]
+
+
+class ParseCache:
+    """On-disk cache of parsed :AI: tasks, keyed by (path, mtime_ns, size, version).
+
+    One instance per data directory is kept for the life of the process, so
+    repeated find_ai_tasks calls share the loaded cache. Tasks are rebuilt as
+    fresh OrgTask objects on every lookup because callers mutate them.
+    """
+
+    _instances: Dict[Path, 'ParseCache'] = {}
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = data_dir
+        self.path = state_dir(data_dir) / CACHE_FILENAME
+        self.entries: Dict[str, dict] = {}
+        self.seen: set = set()
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    @classmethod
+    def for_data_dir(cls, data_dir: Path) -> 'ParseCache':
+        """Get the process-wide cache for a data directory."""
+        key = Path(data_dir).resolve()
+        cache = cls._instances.get(key)
+        if cache is None:
+            cache = cls(data_dir)
+            cls._instances[key] = cache
+        return cache
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        if data.get('version') != PARSER_VERSION:
+            self.dirty = True  # Rewrite in the current format
+            return
+        files = data.get('files')
+        if isinstance(files, dict):
+            self.entries = files
+
+    def key(self, org_file: Path) -> str:
+        """Cache key: path relative to the data directory."""
+        try:
+            return str(org_file.relative_to(self.data_dir))
+        except ValueError:
+            return str(org_file)
+
+    def lookup(self, org_file: Path, st: os.stat_result) -> Optional[List[OrgTask]]:
+        """Return cached :AI: tasks if the file is unchanged, else None."""
+        key = self.key(org_file)
+        self.seen.add(key)
+        entry = self.entries.get(key)
+        if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            self.hits += 1
+            return _tasks_from_entry(entry, org_file)
+        self.misses += 1
+        return None
+
+    def store(self, org_file: Path, st: os.stat_result, tasks: List[OrgTask]) -> None:
+        """Record freshly parsed tasks for a file."""
+        key = self.key(org_file)
+        if time.time_ns() - st.st_mtime_ns > _RACY_WINDOW_NS:
+            self.entries[key] = {
+                'mtime_ns': st.st_mtime_ns,
+                'size': st.st_size,
+                'tasks': [t.to_record() for t in tasks],
+            }
+        elif key in self.entries:
+            del self.entries[key]
+        self.dirty = True
+
+    def trusted(self, org_file: Path) -> Optional[List[OrgTask]]:
+        """Return cached tasks without checking the file (caller knows it is unchanged)."""
+        key = self.key(org_file)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.seen.add(key)
+        self.hits += 1
+        return _tasks_from_entry(entry, org_file)
+
+    def forget(self, org_file: Path) -> None:
+        """Drop a file's entry (deleted or no longer matched)."""
+        if self.entries.pop(self.key(org_file), None) is not None:
+            self.dirty = True
+
+    def ai_files(self) -> List[str]:
+        """Relative paths of cached files that contain :AI: tasks."""
+        return [key for key, entry in self.entries.items() if entry['tasks']]
+
+    def get_tasks(self, org_file: Path, st: Optional[os.stat_result] = None) -> List[OrgTask]:
+        """Return the :AI: tasks of a file, parsing only if it changed."""
+        if st is None:
+            st = os.stat(org_file)
+        tasks = self.lookup(org_file, st)
+        if tasks is None:
+            tasks = parse_ai_file(org_file)
+            self.store(org_file, st, tasks)
+        return tasks
+
+    def save(self, prune: bool = True) -> None:
+        """Write the cache if anything changed. Drops files not seen this run."""
+        if prune:
+            stale = [k for k in self.entries if k not in self.seen]
+            for key in stale:
+                del self.entries[key]
+            self.dirty = self.dirty or bool(stale)
+        if not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix('.tmp')
+            tmp.write_text(
+                json.dumps({'version': PARSER_VERSION, 'files': self.entries}),
+                encoding='utf-8',
+            )
+            os.replace(tmp, self.path)
+            self.dirty = False
+        except OSError:
+            pass  # Cache is an optimization; a read-only state dir is fine
+
+
+# ---------------------------------------------------------------------------
+# Prefilter and discovery metrics
+# ---------------------------------------------------------------------------
+
+@dataclass
+class DiscoveryStats:
+    """Counters for one or more discovery passes."""
+    files_walked: int = 0
+    cache_hits: int = 0
+    prefilter_skipped: int = 0  # No ':AI' bytes, never decoded
+    parsed: int = 0
+    unreadable: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"{self.files_walked} files: {self.cache_hits} cached, "
+            f"{self.prefilter_skipped} skipped (no :AI), {self.parsed} parsed"
+            + (f", {self.unreadable} unreadable" if self.unreadable else "")
+        )
+
+
+def has_ai_marker(org_file: Path) -> bool:
+    """Byte-search a memory-mapped file for ':AI'.
+
+    Every :AI: tag is written as ':AI...' in a heading's tag string, so a
+    miss here proves the file has no :AI: tasks. Unreadable files return
+    True and are left for the parser to report.
+    """
+    try:
+        with open(org_file, 'rb') as f:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return mm.find(b':AI') != -1
+            except ValueError:
+                return False  # Empty files cannot be mapped
+    except OSError:
+        return True
+
+
+# ---------------------------------------------------------------------------
+# Parsing (serial or sharded across processes)
+# ---------------------------------------------------------------------------
+
+# Cache misses at or above this count are parsed in a process pool
+PARALLEL_PARSE_THRESHOLD = 200
+
+
+def parse_ai_file(org_file: Path) -> List[OrgTask]:
+    """Parse one org file and keep only its :AI: tasks."""
+    return [t for t in parse_org_file(org_file) if is_ai_task(t)]
+
+
+def _parse_ai_file_or_none(org_file: Path) -> Optional[List[OrgTask]]:
+    """Process-pool worker: unreadable files yield None instead of raising."""
+    try:
+        return parse_ai_file(org_file)
+    except OSError:
+        return None
+
+
+def _process_pool(max_workers: int):
+    """Create a ProcessPoolExecutor despite lib/queue.py shadowing stdlib queue.
+
+    concurrent.futures and multiprocessing import the stdlib queue module at
+    import time; with lib/ first on sys.path they would get nightshift's
+    queue.py. Import them with lib/ hidden, then restore sys.modules.
+    """
+    import sys
+    lib_dir = Path(__file__).resolve().parent
+    shadow = sys.modules.pop('queue', None)
+    saved_path = sys.path[:]
+    sys.path[:] = [p for p in sys.path if Path(p or '.').resolve() != lib_dir]
+    try:
+        import multiprocessing
+        import multiprocessing.queues  # noqa: F401 — binds stdlib queue.Empty
+        from concurrent.futures import ProcessPoolExecutor
+        import concurrent.futures.process  # noqa: F401
+    finally:
+        sys.path[:] = saved_path
+        if shadow is not None:
+            sys.modules['queue'] = shadow
+        elif not hasattr(sys.modules.get('queue'), 'build_queue'):
+            sys.modules.pop('queue', None)
+
+    # fork inherits the already-imported modules; spawn children would re-import
+    # queue with lib/ on PYTHONPATH
+    context = None
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+
+def parse_files(
+    org_files: List[Path],
+    parallel_threshold: int = PARALLEL_PARSE_THRESHOLD,
+    max_workers: Optional[int] = None,
+) -> List[Optional[List[OrgTask]]]:
+    """Parse files into :AI: task lists, in input order (None = unreadable).
+
+    Above parallel_threshold files (0 disables) the work is sharded across a
+    process pool; if the pool cannot start, parsing falls back to serial.
+    """
+    workers = max_workers or os.cpu_count() or 1
+    if 0 < parallel_threshold <= len(org_files) and workers > 1:
+        from concurrent.futures.process import BrokenProcessPool
+        chunksize = max(1, len(org_files) // (workers * 4))
+        try:
+            with _process_pool(workers) as pool:
+                return list(pool.map(_parse_ai_file_or_none, org_files, chunksize=chunksize))
+        except (BrokenProcessPool, OSError, ImportError):
+            pass
+
+    return [_parse_ai_file_or_none(f) for f in org_files]
+
+
+def load_ai_tasks(
+    org_files: List[Path],
+    cache: Optional[ParseCache] = None,
+    parallel_threshold: int = PARALLEL_PARSE_THRESHOLD,
+    max_workers: Optional[int] = None,
+    stats: Optional[DiscoveryStats] = None,
+    trusted: Optional[set] = None,
+) -> List[OrgTask]:
+    """Load :AI: tasks for org files, in file order.
+
+    Cache hits are served directly. Misses go through the ':AI' prefilter and
+    only the remaining candidates are parsed, so a warm cache never starts a
+    process pool. Prefiltered files are cached as having no tasks. Files in
+    trusted are known to be unchanged and are served from the cache without
+    a stat.
+    """
+    if stats is None:
+        stats = DiscoveryStats()
+    stats.files_walked += len(org_files)
+
+    results: List[Optional[List[OrgTask]]] = [None] * len(org_files)
+    candidates = []
+
+    for i, org_file in enumerate(org_files):
+        if trusted and cache is not None and org_file in trusted:
+            cached = cache.trusted(org_file)
+            if cached is not None:
+                stats.cache_hits += 1
+                results[i] = cached
+                continue
+        try:
+            st = os.stat(org_file)
+        except OSError:
+            stats.unreadable += 1
+            continue
+        if cache is not None:
+            cached = cache.lookup(org_file, st)
+            if cached is not None:
+                stats.cache_hits += 1
+                results[i] = cached
+                continue
+        if not has_ai_marker(org_file):
+            stats.prefilter_skipped += 1
+            if cache is not None:
+                cache.store(org_file, st, [])
+            continue
+        candidates.append((i, org_file, st))
+
+    parsed = parse_files([c[1] for c in candidates], parallel_threshold, max_workers)
+    for (i, org_file, st), tasks in zip(candidates, parsed):
+        if tasks is None:
+            stats.unreadable += 1
+            continue
+        stats.parsed += 1
+        results[i] = tasks
+        if cache is not None:
+            cache.store(org_file, st, tasks)
+
+    return [task for tasks in results if tasks for task in tasks]
+
+
+def discover_ai_tasks(
+    data_dir: Path,
+    spaces: Optional[List[str]] = None,
+    exclude_spaces: Optional[List[str]] = None,
+    ignore_globs: Optional[List[str]] = None,
+    use_cache: bool = True,
+    parallel_threshold: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    stats: Optional[DiscoveryStats] = None,
+) -> List[OrgTask]:
+    """Walk data_dir once and return :AI: tasks in every state, in file order.
+
+    See nightshift_parser.find_ai_tasks for the meaning of the arguments.
+    """
+    if parallel_threshold is None:
+        parallel_threshold = PARALLEL_PARSE_THRESHOLD
+
+    cache = ParseCache.for_data_dir(data_dir) if use_cache else None
+    org_files = list(iter_org_files(data_dir, WalkFilter(spaces, exclude_spaces, ignore_globs)))
+    tasks = load_ai_tasks(org_files, cache, parallel_threshold, max_workers, stats)
+
+    if cache is not None:
+        # Only a full walk knows which files disappeared
+        cache.save(prune=not spaces and not exclude_spaces)
+
+    return tasks
+
+
+def stream_ai_tasks(
+    data_dir: Path,
+    spaces: Optional[List[str]] = None,
+    exclude_spaces: Optional[List[str]] = None,
+    ignore_globs: Optional[List[str]] = None,
+    use_cache: bool = True,
+    stats: Optional[DiscoveryStats] = None,
+) -> Iterator[OrgTask]:
+    """Yield :AI: tasks in every state, in file order, while walking data_dir.
+
+    Streaming counterpart of discover_ai_tasks: files are visited one at a
+    time and parsed line by line (no process pool), so neither the file list
+    nor the task list is materialized. A file's tasks are cached only once it
+    has been read to the end; the cache is saved when the generator finishes
+    or is closed.
+    """
+    if stats is None:
+        stats = DiscoveryStats()
+    cache = ParseCache.for_data_dir(data_dir) if use_cache else None
+    walk_filter = WalkFilter(spaces, exclude_spaces, ignore_globs)
+
+    try:
+        for org_file in iter_org_files(data_dir, walk_filter):
+            stats.files_walked += 1
+            try:
+                st = os.stat(org_file)
+            except OSError:
+                stats.unreadable += 1
+                continue
+            if cache is not None:
+                cached = cache.lookup(org_file, st)
+                if cached is not None:
+                    stats.cache_hits += 1
+                    yield from cached
+                    continue
+            if not has_ai_marker(org_file):
+                stats.prefilter_skipped += 1
+                if cache is not None:
+                    cache.store(org_file, st, [])
+                continue
+
+            tasks = []
+            try:
+                for task in iter_org_tasks(org_file):
+                    if is_ai_task(task):
+                        tasks.append(task)
+                        yield task
+            except OSError:
+                stats.unreadable += 1
+                continue
+            stats.parsed += 1
+            if cache is not None:
+                cache.store(org_file, st, tasks)
+    finally:
+        if cache is not None:
+            cache.save(prune=False)
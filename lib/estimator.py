@@ -0,0 +1,351 @@
+"""
+History-driven cost and duration estimates for queued tasks.
+
+Trained on the execution records in .datacore/state/nightshift/
+(YYYYMMDD-*.json, one per execution). Tokens and wall time are modelled as
+log-normal:
+
+- A base level per :AI: tag and per (tag, space), shrunk towards the parent
+  level (all tasks -> tag -> tag+space) by how many records back it.
+- Adjustments for EFFORT and prompt length, fitted by ridge regression on
+  the residuals and shrunk towards conservative priors. Execution records do
+  not carry these, so the run loop appends them per exec_id to
+  estimator-features.jsonl (record_features) and training joins the two.
+
+Each Estimate carries the expected value plus p10/p90 bounds. Records are
+parsed once per process; later refreshes only read new files.
+"""
+
+import json
+import math
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Cost estimate: tokens / 1000 * price per 1k tokens (same as metrics.py)
+COST_PER_1K_TOKENS = 0.015
+
+FEATURES_FILENAME = 'estimator-features.jsonl'
+
+_RECORD_RE = re.compile(r'^\d{8}-.*\.json$')
+
+# Used until history says otherwise
+DEFAULT_TOKENS = 5000
+DEFAULT_SECONDS = 600.0
+_PRIOR_LOG_SD = 0.8
+
+# Shrinkage strength: records needed before a group's own mean dominates
+_SHRINK = 3.0
+# Ridge priors (log-scale change per EFFORT point / per doubling of prompt)
+_PRIOR_EFFORT = 0.08
+_PRIOR_PROMPT = 0.3 * math.log(2)
+_RIDGE = 8.0
+
+_Z_P90 = 1.2816  # Standard normal 90th percentile
+
+
+@dataclass
+class Estimate:
+    """Expected value and 80% interval for one quantity."""
+    expected: float
+    low: float   # p10
+    high: float  # p90
+
+    def scaled(self, factor: float) -> 'Estimate':
+        return Estimate(self.expected * factor, self.low * factor, self.high * factor)
+
+
+@dataclass
+class TaskEstimate:
+    tokens: Estimate
+    cost_usd: Estimate
+    seconds: Estimate
+    samples: int  # Records behind the most specific level used
+
+
+def _lognormal(mu: float, sd: float) -> Estimate:
+    return Estimate(
+        expected=math.exp(mu + sd * sd / 2),
+        low=math.exp(mu - _Z_P90 * sd),
+        high=math.exp(mu + _Z_P90 * sd),
+    )
+
+
+def _effort(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def prompt_chars(task) -> int:
+    """Approximate prompt length: title, Rich Task Standard properties and body."""
+    props = task.properties
+    size = len(task.title)
+    for name in ('ROLE', 'CONTEXT', 'CURRENT_STATUS', 'KEY_FILES', 'ACCEPTANCE_CRITERIA', 'TOOLS'):
+        size += len(props.get(name, ''))
+    return size + len(task.body or '')
+
+
+def task_features(task) -> dict:
+    return {
+        'ai_tag': task.ai_tag or ':AI:',
+        'space': task.space or '0-personal',
+        'effort': _effort(task.get_property('EFFORT')),
+        'prompt_chars': prompt_chars(task),
+    }
+
+
+def record_features(data_dir: Path, exec_id: str, task) -> None:
+    """Append a task's estimator features for an execution (best effort)."""
+    from discovery import state_dir
+
+    features = task_features(task)
+    features['exec_id'] = exec_id
+    path = state_dir(data_dir) / FEATURES_FILENAME
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(features) + '\n')
+    except OSError:
+        pass
+
+
+class _Level:
+    """Running log-space sums for one group of records."""
+    __slots__ = ('n', 'sum', 'sumsq')
+
+    def __init__(self):
+        self.n = 0
+        self.sum = 0.0
+        self.sumsq = 0.0
+
+    def add(self, value: float) -> None:
+        self.n += 1
+        self.sum += value
+        self.sumsq += value * value
+
+    def shrunk_mean(self, parent_mean: float) -> float:
+        return (self.sum + _SHRINK * parent_mean) / (self.n + _SHRINK)
+
+    def variance(self, prior: float) -> float:
+        """Sample variance shrunk towards prior (prior counts as _SHRINK records)."""
+        if self.n < 2:
+            return prior
+        mean = self.sum / self.n
+        ss = max(0.0, self.sumsq - self.n * mean * mean)
+        return (ss + _SHRINK * prior) / (self.n - 1 + _SHRINK)
+
+
+class _Target:
+    """Hierarchical log-normal model for one quantity (tokens or seconds)."""
+
+    def __init__(self, default: float):
+        # Centre the prior so the expected value with no history is `default`
+        self.default_mu = math.log(default) - _PRIOR_LOG_SD ** 2 * (1 + 1 / _SHRINK) / 2
+        self.levels: Dict[tuple, _Level] = {}
+        self.beta = (_PRIOR_EFFORT, _PRIOR_PROMPT)
+        self.prompt_ref: Optional[float] = None  # Mean log prompt length in history
+
+    def _level(self, key: tuple) -> _Level:
+        level = self.levels.get(key)
+        if level is None:
+            level = self.levels[key] = _Level()
+        return level
+
+    def fit(self, rows: List[Tuple[str, str, Optional[float], Optional[int], float]]) -> None:
+        self.levels = {}
+        for tag, space, _, _, value in rows:
+            y = math.log(value)
+            self._level(()).add(y)
+            self._level((tag,)).add(y)
+            self._level((tag, space)).add(y)
+
+        with_prompt = [r[3] for r in rows if r[3]]
+        self.prompt_ref = (
+            sum(math.log(p) for p in with_prompt) / len(with_prompt) if with_prompt else None)
+
+        # Ridge fit of EFFORT / prompt-length slopes on the group residuals,
+        # centred on the priors so sparse features barely move them
+        sxx = [[_RIDGE, 0.0], [0.0, _RIDGE]]
+        sxy = [_RIDGE * _PRIOR_EFFORT, _RIDGE * _PRIOR_PROMPT]
+        for tag, space, effort, prompt, value in rows:
+            resid = math.log(value) - self.base(tag, space)[0]
+            x = (effort - 5.0 if effort is not None else 0.0,
+                 math.log(prompt) - self.prompt_ref if prompt and self.prompt_ref else 0.0)
+            for i in range(2):
+                sxy[i] += x[i] * resid
+                for j in range(2):
+                    sxx[i][j] += x[i] * x[j]
+        det = sxx[0][0] * sxx[1][1] - sxx[0][1] * sxx[1][0]
+        if det > 0:
+            self.beta = (
+                (sxy[0] * sxx[1][1] - sxy[1] * sxx[0][1]) / det,
+                (sxy[1] * sxx[0][0] - sxy[0] * sxx[1][0]) / det,
+            )
+
+    def base(self, tag: str, space: str) -> Tuple[float, float, int]:
+        """(mean log value, variance, records at the most specific level)."""
+        mu = self.default_mu
+        var = _PRIOR_LOG_SD ** 2
+        samples = 0
+        for key in ((), (tag,), (tag, space)):
+            level = self.levels.get(key)
+            if level is None or level.n == 0:
+                break
+            mu = level.shrunk_mean(mu)
+            var = level.variance(var)
+            samples = level.n
+        return mu, var, samples
+
+    def predict(self, tag: str, space: str, effort: Optional[float], prompt: int) -> Tuple[Estimate, int]:
+        mu, var, samples = self.base(tag, space)
+        if effort is not None:
+            mu += self.beta[0] * (effort - 5.0)
+        if prompt and self.prompt_ref is not None:
+            mu += self.beta[1] * (math.log(prompt) - self.prompt_ref)
+        # Residual spread plus uncertainty in the level's mean
+        sd = math.sqrt(max(var, 1e-6) * (1 + 1 / (samples + _SHRINK)))
+        return _lognormal(mu, sd), samples
+
+
+class HistoryEstimator:
+    """Token/cost/duration estimator for one data directory."""
+
+    _instances: Dict[Path, 'HistoryEstimator'] = {}
+
+    def __init__(self, data_dir: Path):
+        from discovery import state_dir
+
+        self.state_dir = state_dir(data_dir)
+        self.tokens = _Target(DEFAULT_TOKENS)
+        self.seconds = _Target(DEFAULT_SECONDS)
+        self._records: Dict[str, dict] = {}  # file name -> slim record
+        self._features: Dict[str, dict] = {}  # exec_id -> features
+        self._features_offset = 0
+        self._dir_key = None
+
+    @classmethod
+    def for_data_dir(cls, data_dir: Path) -> 'HistoryEstimator':
+        """Process-wide estimator, refreshed with any new records."""
+        key = Path(data_dir).resolve()
+        estimator = cls._instances.get(key)
+        if estimator is None:
+            estimator = cls._instances[key] = cls(data_dir)
+        estimator.refresh()
+        return estimator
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    # ---- Training ----
+
+    def refresh(self) -> None:
+        """Read new execution records and features; refit if anything changed."""
+        try:
+            dir_mtime = os.stat(self.state_dir).st_mtime_ns
+        except OSError:
+            return
+        try:
+            features_size = os.stat(self.state_dir / FEATURES_FILENAME).st_size
+        except OSError:
+            features_size = None
+        # New records change the directory mtime; appended features do not
+        dir_key = (dir_mtime, features_size)
+        if dir_key == self._dir_key:
+            return
+
+        changed = self._read_features()
+        try:
+            names = [n for n in os.listdir(self.state_dir) if _RECORD_RE.match(n)]
+        except OSError:
+            names = []
+        for name in names:
+            if name not in self._records:
+                self._records[name] = self._read_record(self.state_dir / name)
+                changed = True
+        self._dir_key = dir_key
+        if changed:
+            self._fit()
+
+    def _read_features(self) -> bool:
+        path = self.state_dir / FEATURES_FILENAME
+        try:
+            with open(path, 'rb') as f:
+                f.seek(self._features_offset)
+                data = f.read()
+        except OSError:
+            return False
+        end = data.rfind(b'\n') + 1  # Leave a partially written line for next time
+        self._features_offset += end
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+                self._features[entry['exec_id']] = entry
+            except (ValueError, KeyError, TypeError):
+                continue
+        return end > 0
+
+    @staticmethod
+    def _read_record(path: Path) -> dict:
+        try:
+            data = json.loads(path.read_text())
+        except (ValueError, OSError):
+            return {}
+        if not isinstance(data, dict) or data.get('status') == 'skipped':
+            return {}
+        return {
+            'exec_id': data.get('exec_id') or path.stem,
+            'ai_tag': data.get('ai_tag') or ':AI:',
+            'space': data.get('space') or '0-personal',
+            'tokens': data.get('tokens_used') or 0,
+            'seconds': data.get('duration_seconds') or 0,
+        }
+
+    def _fit(self) -> None:
+        token_rows = []
+        second_rows = []
+        for record in self._records.values():
+            if not record:
+                continue
+            features = self._features.get(record['exec_id'], {})
+            effort = _effort(features.get('effort'))
+            prompt = features.get('prompt_chars')
+            row = (record['ai_tag'], record['space'], effort, prompt)
+            try:
+                tokens = float(record['tokens'])
+                seconds = float(record['seconds'])
+            except (TypeError, ValueError):
+                continue
+            if tokens > 0:
+                token_rows.append(row + (tokens,))
+            if seconds > 0:
+                second_rows.append(row + (seconds,))
+        self.tokens.fit(token_rows)
+        self.seconds.fit(second_rows)
+
+    # ---- Prediction ----
+
+    def estimate(self, task) -> TaskEstimate:
+        f = task_features(task)
+        args = (f['ai_tag'], f['space'], f['effort'], f['prompt_chars'])
+        tokens, samples = self.tokens.predict(*args)
+        seconds, _ = self.seconds.predict(*args)
+        return TaskEstimate(
+            tokens=tokens,
+            cost_usd=tokens.scaled(COST_PER_1K_TOKENS / 1000),
+            seconds=seconds,
+            samples=samples,
+        )
+
+    def fill(self, queue: Iterable) -> None:
+        """Set estimate fields on QueuedTasks in place."""
+        for item in queue:
+            estimate = self.estimate(item.task)
+            item.estimate = estimate
+            item.estimated_tokens = int(round(estimate.tokens.expected))
+            item.estimated_cost_usd = estimate.cost_usd.expected
+            item.estimated_seconds = estimate.seconds.expected
@@ -89,13 +89,15 @@ def write_nightshift_summary(
     review_tasks: List[Dict[str, Any]] = None,
     total_duration: float = 0,
     total_tokens: int = 0
-) -> None:
+) -> List[Path]:
     """
     Write nightshift execution summary to appropriate journals.
 
     Writes to:
     - Each space's journal (for tasks in that space)
     - Personal journal (summary of all)
+
+    Returns the journal files written.
     """
     if failed_tasks is None:
         failed_tasks = []
@@ -113,6 +115,7 @@ def write_nightshift_summary(
         tasks_by_space[space].append(task_data)
 
     # Write to each space journal
+    written = []
     for space, tasks in tasks_by_space.items():
         space_journal = get_journal_path(data_dir, space)
 
@@ -144,6 +147,7 @@ def write_nightshift_summary(
 
         summary = '\n'.join(summary_lines)
         append_to_journal(space_journal, 'Nightshift', summary)
+        written.append(space_journal)
         print(f"Updated journal: {space_journal}")
 
     # Write summary to personal journal
@@ -167,7 +171,9 @@ def write_nightshift_summary(
         personal_summary += "**Action required**: Review pending tasks in 0-inbox/\n"
 
     append_to_journal(personal_journal, 'Nightshift', personal_summary)
+    written.append(personal_journal)
     print(f"Updated personal journal: {personal_journal}")
+    return written
 
 
 if __name__ == '__main__':
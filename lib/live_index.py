@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Live :AI: task index for nightshift daemon mode.
+
+Keeps the parsed tasks of every org file in memory and stays current through
+Linux inotify watches on the data directory: each event re-parses only the
+file that changed. Where inotify is unavailable (macOS, watch limit reached)
+it falls back to polling file mtimes.
+
+Usage:
+    python live_index.py <data_dir> [--poll] [--interval=SECONDS] [--run]
+
+Prints new QUEUED tasks as they appear; with --run, starts a nightshift run
+whenever new tasks are queued.
+"""
+
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from nightshift_parser import OrgTask
+from discovery import (
+    ParseCache,
+    WalkFilter,
+    has_ai_marker,
+    iter_org_files,
+    parse_ai_file,
+    walk_order_key,
+)
+from task_index import TaskIndex
+
+
+# ---------------------------------------------------------------------------
+# inotify via ctypes (no third-party dependency)
+# ---------------------------------------------------------------------------
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF
+)
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+class _Inotify:
+    """Minimal inotify wrapper: one fd, directory watches, raw event reads."""
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify requires Linux')
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._libc = libc
+        self._ctypes = ctypes
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+    def add_watch(self, path: Path) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(path)), _WATCH_MASK)
+        if wd < 0:
+            errno = self._ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(path))
+        return wd
+
+    def read_events(self, timeout: float) -> List[Tuple[int, int, str]]:
+        """Wait up to timeout seconds; return (wd, mask, name) events."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].split(b'\0', 1)[0]
+                offset += length
+                events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+# ---------------------------------------------------------------------------
+# Live index
+# ---------------------------------------------------------------------------
+
+# Events are collected for this long before re-parsing, so a burst of writes
+# (git checkout, editor save) re-parses each file once
+_DEBOUNCE_SECONDS = 0.2
+
+
+def is_runnable(task: OrgTask) -> bool:
+    """QUEUED task in a nightshift.org file that no executor has claimed."""
+    return (
+        task.state == 'QUEUED'
+        and 'nightshift.org' in task.file_path.name
+        and task.properties.get('NIGHTSHIFT_STATUS', '') not in ['executing', 'claimed']
+    )
+
+
+class LiveTaskIndex:
+    """Long-lived, in-memory :AI: task index for one data directory.
+
+    Call start() once, then poll() in the daemon loop. poll() blocks until
+    files change (or the timeout passes) and re-parses only those files.
+    """
+
+    def __init__(
+        self,
+        data_dir: Path,
+        spaces: Optional[List[str]] = None,
+        exclude_spaces: Optional[List[str]] = None,
+        ignore_globs: Optional[List[str]] = None,
+        use_inotify: bool = True,
+        poll_interval: float = 5.0,
+    ):
+        self.data_dir = data_dir
+        self.walk_filter = WalkFilter(spaces, exclude_spaces, ignore_globs)
+        self.use_inotify = use_inotify
+        self.poll_interval = poll_interval
+        self.mode = 'stopped'  # 'inotify' or 'poll' once started
+        self._files: Dict[Path, Tuple[int, int, List[OrgTask]]] = {}
+        self._watches: Dict[int, Path] = {}
+        self._inotify: Optional[_Inotify] = None
+        self._reported: Set[str] = set()
+
+    # ---- Lifecycle ----
+
+    def start(self) -> None:
+        """Load every file (through the persistent parse cache) and start watching."""
+        if self.use_inotify:
+            try:
+                self._inotify = _Inotify()
+                self._watch_tree(())
+                self.mode = 'inotify'
+            except OSError:
+                self._close_inotify()
+        if self._inotify is None:
+            self.mode = 'poll'
+
+        cache = ParseCache.for_data_dir(self.data_dir)
+        for org_file in iter_org_files(self.data_dir, self.walk_filter):
+            try:
+                st = os.stat(org_file)
+                tasks = cache.get_tasks(org_file, st)
+            except OSError:
+                continue
+            self._files[org_file] = (st.st_mtime_ns, st.st_size, tasks)
+        cache.save(prune=False)
+
+    def close(self) -> None:
+        self._close_inotify()
+        self.mode = 'stopped'
+
+    def _close_inotify(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._watches.clear()
+
+    # ---- Watching ----
+
+    def _watch_tree(self, start: tuple) -> None:
+        """Add watches for a directory and every subdirectory a walk would enter."""
+        stack = [start]
+        while stack:
+            parts = stack.pop()
+            directory = self.data_dir.joinpath(*parts)
+            wd = self._inotify.add_watch(directory)
+            self._watches[wd] = directory
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            sub_parts = parts + (entry.name,)
+                            if self.walk_filter.enter_dir(sub_parts):
+                                stack.append(sub_parts)
+            except OSError:
+                continue
+
+    def poll(self, timeout: Optional[float] = None) -> List[Path]:
+        """Wait for changes and apply them. Returns the files that changed."""
+        if timeout is None:
+            timeout = self.poll_interval
+        if self._inotify is not None:
+            try:
+                return self._poll_inotify(timeout)
+            except OSError:
+                # Watch limit hit or fd trouble: degrade to mtime polling
+                self._close_inotify()
+                self.mode = 'poll'
+        time.sleep(timeout)
+        return self._poll_mtimes()
+
+    def _poll_inotify(self, timeout: float) -> List[Path]:
+        events = self._inotify.read_events(timeout)
+        if not events:
+            return []
+        # Debounce: gather the rest of the burst
+        deadline = time.monotonic() + _DEBOUNCE_SECONDS
+        while time.monotonic() < deadline:
+            events.extend(self._inotify.read_events(max(0.0, deadline - time.monotonic())))
+
+        changed_files: Set[Path] = set()
+        new_dirs: List[Path] = []
+        gone_dirs: List[Path] = []
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                return self._poll_mtimes()  # Events were lost; rescan everything
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    new_dirs.append(path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    gone_dirs.append(path)
+            elif name.endswith('.org') and not mask & IN_CREATE:
+                changed_files.add(path)
+
+        for directory in gone_dirs:
+            changed_files.update(f for f in self._files if directory in f.parents)
+        for directory in new_dirs:
+            parts = tuple(directory.relative_to(self.data_dir).parts)
+            if self.walk_filter.enter_dir(parts) and directory.is_dir():
+                self._watch_tree(parts)
+                changed_files.update(iter_org_files(self.data_dir, self.walk_filter, start=parts))
+
+        return [f for f in sorted(changed_files) if self._refresh(f)]
+
+    def _poll_mtimes(self) -> List[Path]:
+        """Re-walk and stat every file; re-parse the ones whose mtime/size moved."""
+        seen = set()
+        changed = []
+        for org_file in iter_org_files(self.data_dir, self.walk_filter):
+            seen.add(org_file)
+            if self._refresh(org_file):
+                changed.append(org_file)
+        for org_file in [f for f in self._files if f not in seen]:
+            del self._files[org_file]
+            changed.append(org_file)
+        return changed
+
+    def _refresh(self, org_file: Path) -> bool:
+        """Re-parse one file if it changed. Returns True if the index changed."""
+        try:
+            st = os.stat(org_file)
+        except OSError:
+            return self._files.pop(org_file, None) is not None
+
+        parts = tuple(org_file.relative_to(self.data_dir).parts)
+        if not self.walk_filter.allows(parts):
+            return self._files.pop(org_file, None) is not None
+
+        current = self._files.get(org_file)
+        if current and current[0] == st.st_mtime_ns and current[1] == st.st_size:
+            return False
+        try:
+            tasks = parse_ai_file(org_file) if has_ai_marker(org_file) else []
+        except OSError:
+            return False
+        self._files[org_file] = (st.st_mtime_ns, st.st_size, tasks)
+        return True
+
+    # ---- Queries ----
+
+    def tasks(self) -> List[OrgTask]:
+        """All indexed :AI: tasks in walk order."""
+        ordered = sorted(
+            self._files,
+            key=lambda f: walk_order_key(tuple(f.relative_to(self.data_dir).parts)),
+        )
+        return [task for f in ordered for task in self._files[f][2]]
+
+    def snapshot(self) -> TaskIndex:
+        """Point-in-time TaskIndex for status/queue queries."""
+        return TaskIndex(self.tasks())
+
+    def queued(self) -> List[OrgTask]:
+        """Runnable QUEUED tasks currently in nightshift.org files."""
+        return [task for task in self.tasks() if is_runnable(task)]
+
+    def new_queued(self) -> List[OrgTask]:
+        """Runnable QUEUED tasks not returned by a previous call."""
+        fresh = [task for task in self.queued() if task.id not in self._reported]
+        self._reported.update(task.id for task in fresh)
+        return fresh
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Watch for new nightshift :AI: tasks')
+    parser.add_argument('data_dir', type=Path, help='Path to Data directory')
+    parser.add_argument('--poll', action='store_true', help='Force mtime polling instead of inotify')
+    parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls')
+    parser.add_argument('--run', action='store_true', help='Run nightshift when new tasks are queued')
+    args = parser.parse_args()
+
+    from nightshift_settings import get_settings
+    settings = get_settings(args.data_dir)
+
+    live = LiveTaskIndex(
+        args.data_dir,
+        spaces=settings.spaces,
+        exclude_spaces=settings.exclude_spaces,
+        ignore_globs=settings.ignore_globs,
+        use_inotify=not args.poll,
+        poll_interval=args.interval,
+    )
+    live.start()
+    print(f"Watching {args.data_dir} ({live.mode}), {len(live.queued())} tasks queued")
+
+    try:
+        while True:
+            if not live.poll():
+                continue
+            fresh = live.new_queued()
+            for task in fresh:
+                print(f"  + [QUEUED] {task.title} ({task.ai_tag})")
+            if fresh and args.run:
+                from run import run_task_mode
+                run_task_mode(args.data_dir)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        live.close()
@@ -3,17 +3,23 @@ Nightshift org-mode parser backed by org-workspace library.
 
 Drop-in replacement for org_parser.py.
 - Reading: keeps custom parse_org_file for multiline '|' property support
-- Writing: uses org-workspace (transition + set_property + save)
+- Writing: uses org-workspace (transition + set_property + save), or an
+  in-place byte patch (org_patch) for state/property edits of :ID: tasks
 """
 
+import io
+import os
 import re
-from dataclasses import dataclass, field
+import sys
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator, Tuple
 from datetime import datetime
 
 from org_workspace import OrgWorkspace, StateConfig
 
+import org_patch
+
 
 # ---------------------------------------------------------------------------
 # Nightshift state config — all states non-terminal so any transition is valid
@@ -31,21 +37,91 @@ NIGHTSHIFT_STATE_CONFIG = StateConfig(
 
 
 # ---------------------------------------------------------------------------
-# OrgTask dataclass (same interface as org_parser.OrgTask)
+# OrgTask (same interface as org_parser.OrgTask)
+#
+# Compact: __slots__ instead of a per-instance __dict__, interned state, tag
+# and property-name strings. Tasks from parse_org_file record the byte range
+# of their subtree plus the file's (mtime_ns, size), and read the body and
+# multiline ('|') property values from the file on first access.
 # ---------------------------------------------------------------------------
 
-@dataclass
+_SPACE_DIR_RE = re.compile(r'^\d+-')
+
+
 class OrgTask:
     """Represents an org-mode task with properties."""
-    id: str
-    title: str
-    state: str  # TODO, NEXT, WORKING, DONE, REVIEW, FAILED, QUEUED, EXECUTING
-    tags: List[str]
-    properties: Dict[str, str]
-    file_path: Path
-    line_number: int
-    heading_level: int
-    body: str = ""
+    __slots__ = (
+        'id', 'title', 'state', 'tags', 'file_path', 'line_number',
+        'heading_level', 'start_offset', 'end_offset',
+        '_properties', '_body', '_source', '_pending',
+    )
+
+    def __init__(
+        self,
+        id: str,
+        title: str,
+        state: str,  # TODO, NEXT, WORKING, DONE, REVIEW, FAILED, QUEUED, EXECUTING
+        tags: List[str],
+        properties: Dict[str, str],
+        file_path: Path,
+        line_number: int,
+        heading_level: int,
+        body: Optional[str] = "",
+        start_offset: Optional[int] = None,
+        end_offset: Optional[int] = None,
+        source: Optional[Tuple[int, int]] = None,
+        pending: Tuple[str, ...] = (),
+    ):
+        self.id = id
+        self.title = title
+        self.state = state
+        self.tags = tags
+        self.file_path = file_path
+        self.line_number = line_number
+        self.heading_level = heading_level
+        self.start_offset = start_offset  # Byte range of the subtree in file_path
+        self.end_offset = end_offset
+        self._properties = properties
+        self._body = body  # None until read from the file
+        self._source = source  # (mtime_ns, size) the offsets refer to
+        self._pending = pending  # Multiline property names not yet read
+
+    @property
+    def properties(self) -> Dict[str, str]:
+        if self._pending:
+            self._load()
+        return self._properties
+
+    @properties.setter
+    def properties(self, value: Dict[str, str]) -> None:
+        self._properties = value
+        self._pending = ()
+
+    @property
+    def body(self) -> str:
+        if self._body is None:
+            self._load()
+        return self._body
+
+    @body.setter
+    def body(self, value: str) -> None:
+        self._body = value
+
+    def get_property(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Property lookup that only reads the file if name is a pending multiline value."""
+        if name in self._pending:
+            self._load()
+        return self._properties.get(name, default)
+
+    def _load(self) -> None:
+        """Fill in the body and pending multiline properties from the file."""
+        full = _reload_task(self)
+        if self._body is None:
+            self._body = full.body if full else ""
+        for name in self._pending:
+            value = full._properties.get(name) if full else None
+            self._properties[name] = value if value is not None else ""
+        self._pending = ()
 
     @property
     def ai_tag(self) -> Optional[str]:
@@ -58,26 +134,152 @@ class OrgTask:
     @property
     def space(self) -> Optional[str]:
         """Get the space from SPACE property or file path."""
-        if 'SPACE' in self.properties:
-            return self.properties['SPACE']
-        parts = self.file_path.parts
-        for part in parts:
-            if re.match(r'^\d+-', part):
+        space = self.get_property('SPACE')
+        if space is not None:
+            return space
+        for part in self.file_path.parts:
+            if _SPACE_DIR_RE.match(part):
                 return part
         return None
 
+    # ---- Serialization (parse cache) ----
+
+    def to_record(self) -> dict:
+        """JSON-able form that keeps unread values unread."""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'state': self.state,
+            'tags': self.tags,
+            'properties': self._properties,
+            'line_number': self.line_number,
+            'heading_level': self.heading_level,
+            'body': self._body,
+            'start': self.start_offset,
+            'end': self.end_offset,
+            'pending': list(self._pending),
+        }
+
+    @classmethod
+    def from_record(cls, data: dict, file_path: Path, source: Optional[Tuple[int, int]]) -> 'OrgTask':
+        """Rebuild a task from to_record() output; source is the file's (mtime_ns, size)."""
+        return cls(
+            id=data['id'],
+            title=data['title'],
+            state=sys.intern(data['state']),
+            tags=[sys.intern(t) for t in data['tags']],
+            properties={sys.intern(k): v for k, v in data['properties'].items()},
+            file_path=file_path,
+            line_number=data['line_number'],
+            heading_level=data['heading_level'],
+            body=data['body'],
+            start_offset=data.get('start'),
+            end_offset=data.get('end'),
+            source=source,
+            pending=tuple(data.get('pending') or ()),
+        )
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (
+            (self.id, self.title, self.state, self.tags, self.properties,
+             self.file_path, self.line_number, self.heading_level, self.body)
+            == (other.id, other.title, other.state, other.tags, other.properties,
+                other.file_path, other.line_number, other.heading_level, other.body)
+        )
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return (
+            f"OrgTask(id={self.id!r}, title={self.title!r}, state={self.state!r}, "
+            f"tags={self.tags!r}, file_path={self.file_path!r}, line_number={self.line_number!r})"
+        )
+
 
 # ---------------------------------------------------------------------------
 # Internal helpers
 # ---------------------------------------------------------------------------
 
+# Loaded single-file workspaces kept per process (most recently used last)
+WORKSPACE_CACHE_SIZE = 8
+
+
+def _stat_key(fp: Path) -> Optional[tuple]:
+    try:
+        st = os.stat(fp)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class _WorkspaceCache:
+    """Bounded LRU of loaded OrgWorkspaces, keyed by resolved path.
+
+    An entry is reused only while the file's (mtime_ns, size, inode) match
+    what was loaded or last saved through the cache, and the workspace has
+    no unsaved edits (a failed edit session leaves it dirty; it is dropped).
+    """
+
+    def __init__(self, max_entries: int = WORKSPACE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Path, tuple]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fp: Path) -> OrgWorkspace:
+        stat_key = _stat_key(fp)
+        entry = self._entries.pop(fp, None)
+        if entry is not None and stat_key is not None and entry[1] == stat_key and not entry[0].dirty_files():
+            self.hits += 1
+            self._entries[fp] = entry
+            return entry[0]
+
+        self.misses += 1
+        ws = OrgWorkspace(state_config=NIGHTSHIFT_STATE_CONFIG)
+        if stat_key is not None:
+            ws.load(fp)
+            self._remember(fp, ws, stat_key)
+        return ws
+
+    def saved(self, fp: Path, ws: OrgWorkspace) -> None:
+        """Record that ws was just written to fp, so the next load reuses it."""
+        stat_key = _stat_key(fp)
+        if stat_key is None:
+            self.invalidate(fp)
+        else:
+            self._remember(fp, ws, stat_key)
+
+    def invalidate(self, fp: Path) -> None:
+        self._entries.pop(fp, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _remember(self, fp: Path, ws: OrgWorkspace, stat_key: tuple) -> None:
+        self._entries.pop(fp, None)
+        self._entries[fp] = (ws, stat_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+_workspace_cache = _WorkspaceCache()
+
+
 def _load_ws(file_path: Path) -> tuple:
-    """Load a workspace for a single file. Returns (ws, file_path_resolved)."""
+    """Load a workspace for a single file. Returns (ws, file_path_resolved).
+
+    Served from the process-wide workspace cache while the file is unchanged.
+    """
     fp = Path(file_path).resolve()
-    ws = OrgWorkspace(state_config=NIGHTSHIFT_STATE_CONFIG)
-    if fp.exists():
-        ws.load(fp)
-    return ws, fp
+    return _workspace_cache.get(fp), fp
+
+
+def _save_ws(ws: OrgWorkspace, fp: Path) -> None:
+    """Save a workspace loaded by _load_ws and keep the cache entry current."""
+    ws.save(fp)
+    _workspace_cache.saved(fp, ws)
 
 
 def _find_node(ws: OrgWorkspace, task: OrgTask):
@@ -88,89 +290,305 @@ def _find_node(ws: OrgWorkspace, task: OrgTask):
 # ---------------------------------------------------------------------------
 # parse_org_file — kept from org_parser for multiline '|' property support
 # org-workspace puts continuation lines in body, losing the property values.
+#
+# Single pass over the lines with a stack of open task headings. Every line
+# is classified once and then fed to each open task, so the cost is
+# O(lines * nesting depth) instead of rescanning each subtree per heading.
+# Semantics match the original scan: a task owns every line up to the next
+# heading at the same or higher level, including drawers of nested headings.
+# Files are read in blocks and tasks are yielded as they complete
+# (iter_org_tasks); parse_org_file just collects the stream.
 # ---------------------------------------------------------------------------
 
-def parse_org_file(file_path: Path) -> List[OrgTask]:
-    """Parse an org file and extract all tasks (with multiline property support)."""
-    tasks = []
-    if not file_path.exists():
-        return tasks
-
-    content = file_path.read_text(encoding='utf-8')
-    lines = content.split('\n')
+# Bump when parse output changes so persisted parse caches are invalidated
+PARSER_VERSION = 2
 
-    i = 0
-    while i < len(lines):
-        line = lines[i]
+TASK_STATES = (
+    'TODO', 'NEXT', 'WORKING', 'DONE', 'REVIEW', 'FAILED',
+    'WAITING', 'QUEUED', 'EXECUTING',
+)
 
-        heading_match = re.match(
-            r'^(\*+)\s+(TODO|NEXT|WORKING|DONE|REVIEW|FAILED|WAITING|QUEUED|EXECUTING)\s+(.+?)(\s+:[\w:]+:)?\s*$',
-            line
+_STATES_ALT = '|'.join(TASK_STATES)
+_TASK_HEADING_RE = re.compile(
+    r'^(\*+)\s+(' + _STATES_ALT + r')\s+(.+?)(\s+:[\w:]+:)?\s*$'
+)
+_HEADING_RE = re.compile(r'^(\*+)\s')
+_PROPERTY_RE = re.compile(r'^:(\w+):\s*(.*)$')
+_STATE_PREFIX_RE = re.compile(r'^(\*+\s+)(' + _STATES_ALT + r')(\s+)')
+
+# Line kinds, computed once per line and shared by all open tasks
+_LINE_TEXT = 0
+_LINE_DRAWER_START = 1
+_LINE_DRAWER_END = 2
+
+
+class _OpenTask:
+    """Accumulator for a task heading whose subtree is still being read.
+
+    Lazy tasks (body_lines is None) skip the body and multiline property
+    values, remembering only which multiline properties exist.
+    """
+    __slots__ = (
+        'slot', 'level', 'line_number', 'state', 'title', 'tags',
+        'properties', 'body_lines', 'in_properties', 'accumulating',
+        'start_offset', 'pending',
+    )
+
+    def __init__(self, slot, level, line_number, state, title, tags, start_offset=None):
+        self.slot = slot
+        self.level = level
+        self.line_number = line_number
+        self.state = state
+        self.title = title
+        self.tags = tags
+        self.properties = {}
+        self.body_lines = [] if start_offset is None else None
+        self.in_properties = False
+        self.accumulating = None
+        self.start_offset = start_offset
+        self.pending = None
+
+    def feed(self, line: str, kind: int, prop_match) -> None:
+        if kind == _LINE_DRAWER_START:
+            self.in_properties = True
+        elif kind == _LINE_DRAWER_END:
+            self.in_properties = False
+        elif self.in_properties:
+            if prop_match:
+                name, value = sys.intern(prop_match.group(1)), prop_match.group(2)
+                if value.strip() == '|':
+                    # Multiline property — accumulate continuation lines
+                    self.properties[name] = ''
+                    self.accumulating = name
+                    if self.body_lines is None:
+                        self.pending = (self.pending or set()) | {name}
+                else:
+                    self.properties[name] = value
+                    self.accumulating = None
+                    if self.pending and name in self.pending:
+                        self.pending.discard(name)
+            elif self.accumulating and self.body_lines is not None:
+                self.properties[self.accumulating] += line.rstrip() + '\n'
+        elif self.body_lines is not None:
+            self.body_lines.append(line)
+
+    def build(self, file_path: Path, end_offset=None, source=None) -> 'OrgTask':
+        lazy = self.body_lines is None
+        return OrgTask(
+            id=self.properties.get('ID') or f"{file_path.stem}-L{self.line_number}",
+            title=self.title,
+            state=self.state,
+            tags=self.tags,
+            properties=self.properties,
+            file_path=file_path,
+            line_number=self.line_number,
+            heading_level=self.level,
+            body=None if lazy else '\n'.join(self.body_lines).strip(),
+            start_offset=self.start_offset,
+            end_offset=end_offset,
+            source=source,
+            pending=tuple(sorted(self.pending)) if self.pending else (),
         )
 
-        if heading_match:
-            level = len(heading_match.group(1))
-            state = heading_match.group(2)
-            title = heading_match.group(3).strip()
-            tags_str = heading_match.group(4) or ""
-            tags = [t for t in tags_str.strip().strip(':').split(':') if t]
-
-            properties = {}
-            accumulating = None
-            body_lines = []
-            j = i + 1
-            in_properties = False
-
-            while j < len(lines):
-                next_line = lines[j]
-
-                if re.match(r'^\*{1,' + str(level) + r'}\s', next_line):
-                    break
-
-                if next_line.strip() == ':PROPERTIES:':
-                    in_properties = True
-                    j += 1
-                    continue
-                elif next_line.strip() == ':END:':
-                    in_properties = False
-                    j += 1
-                    continue
-
-                if in_properties:
-                    prop_match = re.match(r'^:(\w+):\s*(.*)$', next_line.strip())
-                    if prop_match:
-                        current_prop = prop_match.group(1)
-                        current_val = prop_match.group(2)
-                        if current_val.strip() == '|':
-                            properties[current_prop] = ''
-                            accumulating = current_prop
-                        else:
-                            properties[current_prop] = current_val
-                            accumulating = None
-                    elif accumulating:
-                        properties[accumulating] += next_line.rstrip() + '\n'
-                else:
-                    body_lines.append(next_line)
 
-                j += 1
+def _iter_tasks(lines, file_path: Path, source=None) -> Iterator[OrgTask]:
+    """Stream tasks from (line, byte length) pairs, in heading order.
+
+    A task is complete once the next heading at its level or above arrives,
+    and is yielded as soon as every task before it has been yielded, so only
+    the subtree of the outermost open heading is ever held in memory.
+
+    With source=(mtime_ns, size) tasks are lazy: they record their byte range
+    (from the byte lengths) instead of holding body and multiline values.
+    """
+    lazy = source is not None
+    stack: List[_OpenTask] = []
+    done: Dict[int, OrgTask] = {}
+    next_slot = 0
+    next_emit = 0
+    offset = 0
+
+    for line_number, (line, nbytes) in enumerate(lines, 1):
+        heading = _HEADING_RE.match(line)
+        if heading:
+            level = len(heading.group(1))
+            while stack and stack[-1].level >= level:
+                closed = stack.pop()
+                done[closed.slot] = closed.build(file_path, offset, source)
+            while next_emit in done:
+                yield done.pop(next_emit)
+                next_emit += 1
+
+        if stack:
+            stripped = line.strip()
+            prop_match = None
+            if stripped == ':PROPERTIES:':
+                kind = _LINE_DRAWER_START
+            elif stripped == ':END:':
+                kind = _LINE_DRAWER_END
+            else:
+                kind = _LINE_TEXT
+                if stripped.startswith(':'):
+                    prop_match = _PROPERTY_RE.match(stripped)
+            for open_task in stack:
+                open_task.feed(line, kind, prop_match)
+
+        if heading:
+            task_match = _TASK_HEADING_RE.match(line)
+            if task_match:
+                tags_str = task_match.group(4) or ""
+                stack.append(_OpenTask(
+                    slot=next_slot,
+                    level=level,
+                    line_number=line_number,
+                    state=sys.intern(task_match.group(2)),
+                    title=task_match.group(3).strip(),
+                    tags=[sys.intern(t) for t in tags_str.strip().strip(':').split(':') if t],
+                    start_offset=offset if lazy else None,
+                ))
+                next_slot += 1
+
+        offset += nbytes
+
+    while stack:
+        closed = stack.pop()
+        done[closed.slot] = closed.build(file_path, offset if lazy else None, source)
+    while next_emit in done:
+        yield done.pop(next_emit)
+        next_emit += 1
+
+
+_READ_BLOCK = 1 << 20
+
+
+def _iter_file_lines(f) -> Iterator[Tuple[str, int]]:
+    """(line, byte length) pairs from a binary file.
+
+    Lines come out exactly as read_text().split('\n') would give them
+    (universal newlines, trailing '' after a final newline) while reading the
+    file in fixed-size blocks, with each line's exact byte length.
+    """
+    tail = b''
+    while True:
+        block = f.read(_READ_BLOCK)
+        if not block:
+            break
+        block = tail + block
+        cut = block.rfind(b'\n') + 1
+        tail = block[cut:]
+        if not cut:
+            continue
+        if block.isascii() and b'\r' not in block:
+            # Fast path: one decode per block, byte length == character count
+            for line in block[:cut - 1].decode('ascii').split('\n'):
+                yield line, len(line) + 1
+        else:
+            for raw in block[:cut - 1].split(b'\n'):
+                yield from _decode_raw_line(raw, 1)
+
+    # Final line without a newline ('' when the file ends with one)
+    yield from _decode_raw_line(tail, 0)
+
+
+def _decode_raw_line(raw: bytes, newline_bytes: int) -> Iterator[Tuple[str, int]]:
+    """Decode one '\n'-free raw line, splitting on lone '\r' like text mode does."""
+    if newline_bytes and raw.endswith(b'\r'):
+        raw = raw[:-1]  # '\r\n' ending
+        newline_bytes += 1
+    text = raw.decode('utf-8')
+    if '\r' in text:
+        pieces = text.split('\r')
+        for piece in pieces[:-1]:
+            yield piece, len(piece.encode('utf-8')) + 1
+        text = pieces[-1]
+    yield text, len(text.encode('utf-8')) + newline_bytes
+
+
+def parse_org_lines(lines, file_path: Path) -> List[OrgTask]:
+    """Parse org lines (without trailing newlines) into eager tasks, in heading order."""
+    return list(_iter_tasks(((line, 0) for line in lines), file_path))
+
+
+def iter_org_tasks(file_path: Path, lazy: bool = True) -> Iterator[OrgTask]:
+    """Stream the tasks of an org file in heading order.
+
+    Reads the file line by line, so memory is bounded by the largest
+    top-level subtree rather than the file. lazy=True leaves bodies and
+    multiline property values in the file until first read.
+    """
+    try:
+        f = open(file_path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        st = os.fstat(f.fileno())
+        source = (st.st_mtime_ns, st.st_size) if lazy else None
+        yield from _iter_tasks(_iter_file_lines(f), file_path, source)
+
+
+def parse_org_file(file_path: Path, lazy: bool = True) -> List[OrgTask]:
+    """Parse an org file and extract all tasks (with multiline property support).
+
+    lazy=True leaves bodies and multiline property values in the file until
+    a task's body or properties are first read.
+    """
+    return list(iter_org_tasks(file_path, lazy))
+
+
+def _reload_task(task: OrgTask) -> Optional[OrgTask]:
+    """Eagerly re-parse a lazy task from its file.
+
+    Reads only the task's byte range while the file is unchanged since it was
+    parsed, or (for tasks with an :ID:) the range the org_patch index tracks
+    across in-place patches. Otherwise re-parses the whole file and finds the
+    task by :ID: (or heading line). Returns None if the task is gone.
+    """
+    fp = task.file_path
+    try:
+        st = os.stat(fp)
+    except OSError:
+        return None
 
-            task_id = properties.get('ID') or f"{file_path.stem}-L{i+1}"
+    ranges = []
+    if task.start_offset is not None and task._source == (st.st_mtime_ns, st.st_size):
+        ranges.append((task.start_offset, task.end_offset))
+    elif task._properties.get('ID') == task.id:
+        patched_range = org_patch.subtree_range(fp, task.id)
+        if patched_range is not None:
+            ranges.append(patched_range)
+
+    for start, end in ranges:
+        try:
+            with open(fp, 'rb') as f:
+                f.seek(start)
+                data = f.read(end - start)
+            lines = [line for line, _ in _iter_file_lines(io.BytesIO(data))]
+            if end < st.st_size:
+                lines.pop()  # '' after the newline that ends the subtree
+            sub = parse_org_lines(lines, fp)
+        except (OSError, UnicodeDecodeError):
+            sub = []
+        if sub and sub[0].title == task.title and sub[0].heading_level == task.heading_level:
+            return sub[0]
+
+    try:
+        tasks = parse_org_file(fp, lazy=False)
+    except (OSError, UnicodeDecodeError):
+        return None
+    def match_rank(candidate: OrgTask) -> int:
+        same_heading = candidate.title == task.title
+        same_line = same_heading and candidate.line_number == task.line_number
+        if candidate.id == task.id:
+            return 1 + same_heading + same_line
+        return int(same_line)
 
-            tasks.append(OrgTask(
-                id=task_id,
-                title=title,
-                state=state,
-                tags=tags,
-                properties=properties,
-                file_path=file_path,
-                line_number=i + 1,
-                heading_level=level,
-                body='\n'.join(body_lines).strip(),
-            ))
+    best = max(tasks, key=match_rank, default=None)
+    return best if best is not None and match_rank(best) else None
 
-        i += 1
 
-    return tasks
+def reload_task(task: OrgTask) -> Optional[OrgTask]:
+    """The task as currently on disk (e.g. after a git pull), or None if it is gone."""
+    return _reload_task(task)
 
 
 # ---------------------------------------------------------------------------
@@ -182,41 +600,66 @@ def find_ai_tasks(
     states: List[str] = None,
     spaces: List[str] = None,
     exclude_spaces: List[str] = None,
+    use_cache: bool = True,
+    ignore_globs: List[str] = None,
+    parallel_threshold: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    stats=None,
 ) -> List[OrgTask]:
-    """Find all :AI: tagged tasks in the data directory."""
+    """Find all :AI: tagged tasks in the data directory.
+
+    Args:
+        data_dir: Root data directory
+        states: Task states to include (default: TODO, NEXT)
+        spaces: Only walk these spaces (paths relative to data_dir)
+        exclude_spaces: Never walk these spaces
+        use_cache: Reuse parsed tasks from .datacore/state/nightshift/ for
+            files whose mtime and size are unchanged
+        ignore_globs: Extra fnmatch patterns for files/dirs to skip
+        parallel_threshold: Parse in a process pool when at least this many
+            files need parsing (default: discovery.PARALLEL_PARSE_THRESHOLD,
+            0 disables)
+        max_workers: Process pool size (default: CPU count)
+        stats: Optional discovery.DiscoveryStats to accumulate file counts
+            (walked, cached, skipped by the ':AI' prefilter, parsed)
+
+    VCS, dependency and archive directories are pruned without being walked.
+    """
+    from discovery import discover_ai_tasks
+
     if states is None:
         states = ['TODO', 'NEXT']
 
-    ai_tasks = []
-
-    for org_file in data_dir.rglob('*.org'):
-        if not org_file.is_file():
-            continue
-        if 'archive' in str(org_file).lower():
-            continue
-
-        file_path_str = str(org_file)
+    tasks = discover_ai_tasks(
+        data_dir, spaces, exclude_spaces, ignore_globs,
+        use_cache, parallel_threshold, max_workers, stats,
+    )
+    return [task for task in tasks if task.state in states]
 
-        if spaces:
-            if not any(
-                f"/{space}/" in file_path_str or file_path_str.startswith(f"{space}/")
-                for space in spaces
-            ):
-                continue
 
-        if exclude_spaces:
-            if any(
-                f"/{space}/" in file_path_str or f"/{space}" in file_path_str
-                for space in exclude_spaces
-            ):
-                continue
+def iter_ai_tasks(
+    data_dir: Path,
+    states: List[str] = None,
+    spaces: List[str] = None,
+    exclude_spaces: List[str] = None,
+    use_cache: bool = True,
+    ignore_globs: List[str] = None,
+    stats=None,
+) -> Iterator[OrgTask]:
+    """Streaming find_ai_tasks: yield :AI: tasks as the walk finds them.
+
+    Same arguments and order as find_ai_tasks (minus the process pool), but
+    files are read line by line and tasks are yielded as they complete, so
+    callers can stop early and huge files never sit in memory whole.
+    """
+    from discovery import stream_ai_tasks
 
-        for task in parse_org_file(org_file):
-            if any(tag.startswith('AI') for tag in task.tags):
-                if task.state in states:
-                    ai_tasks.append(task)
+    if states is None:
+        states = ['TODO', 'NEXT']
 
-    return ai_tasks
+    for task in stream_ai_tasks(data_dir, spaces, exclude_spaces, ignore_globs, use_cache, stats):
+        if task.state in states:
+            yield task
 
 
 # ---------------------------------------------------------------------------
@@ -224,7 +667,14 @@ def find_ai_tasks(
 # ---------------------------------------------------------------------------
 
 def update_task_state(task: OrgTask, new_state: str) -> str:
-    """Update the TODO state of a task via org-workspace. Returns updated file content."""
+    """Update the TODO state of a task via org-workspace. Returns updated file content.
+
+    Tasks with an :ID: get an in-place patch of the heading line instead of a
+    full parse and re-serialize.
+    """
+    if _patch_edits(task.file_path, [(task, ('state', new_state))]):
+        return task.file_path.read_text(encoding='utf-8')
+
     ws, fp = _load_ws(task.file_path)
     node = _find_node(ws, task)
 
@@ -234,15 +684,14 @@ def update_task_state(task: OrgTask, new_state: str) -> str:
         lines = content.split('\n')
         idx = task.line_number - 1
         if idx < len(lines):
-            lines[idx] = re.sub(
-                r'^(\*+\s+)(TODO|NEXT|WORKING|DONE|REVIEW|FAILED|WAITING|QUEUED|EXECUTING)(\s+)',
+            lines[idx] = _STATE_PREFIX_RE.sub(
                 rf'\g<1>{new_state}\3',
                 lines[idx],
             )
         return '\n'.join(lines)
 
     ws.transition(node, new_state)
-    ws.save(fp)
+    _save_ws(ws, fp)
     return fp.read_text(encoding='utf-8')
 
 
@@ -252,6 +701,9 @@ def update_task_state(task: OrgTask, new_state: str) -> str:
 
 def update_task_property(task: OrgTask, prop_name: str, prop_value: str) -> str:
     """Update a property in an org file via org-workspace. Returns updated file content."""
+    if _patch_edits(task.file_path, [(task, ('property', prop_name, prop_value))]):
+        return task.file_path.read_text(encoding='utf-8')
+
     ws, fp = _load_ws(task.file_path)
     node = _find_node(ws, task)
 
@@ -260,7 +712,7 @@ def update_task_property(task: OrgTask, prop_name: str, prop_value: str) -> str:
         return _update_task_property_regex(task, prop_name, prop_value)
 
     ws.set_property(node, prop_name, prop_value)
-    ws.save(fp)
+    _save_ws(ws, fp)
     return fp.read_text(encoding='utf-8')
 
 
@@ -322,6 +774,124 @@ def _update_task_property_regex(task: OrgTask, prop_name: str, prop_value: str)
     return '\n'.join(lines)
 
 
+# ---------------------------------------------------------------------------
+# TaskEditSession — batch edits to one file: one load, one save
+# ---------------------------------------------------------------------------
+
+def _patch_edits(file_path: Path, edits: List[tuple]) -> bool:
+    """Apply (task, edit) pairs as an in-place byte patch (see org_patch).
+
+    Only tasks with their own :ID: and single-line values qualify; returns
+    False without touching the file when the edits need org-workspace.
+    """
+    by_id: Dict[str, List[tuple]] = {}
+    titles: Dict[str, str] = {}
+    for task, edit in edits:
+        task_id = task.get_property('ID')
+        if not task_id or task_id != task.id:
+            return False
+        if edit[0] == 'state' and edit[1] not in NIGHTSHIFT_STATE_CONFIG.all_states:
+            return False  # Let org-workspace raise InvalidTransitionError
+        if titles.setdefault(task_id, task.title) != task.title:
+            return False  # Two tasks share an :ID: (inherited from a child drawer)
+        by_id.setdefault(task_id, []).append(edit)
+
+    patched = org_patch.patch_tasks(file_path, by_id, titles, NIGHTSHIFT_STATE_CONFIG.all_states)
+    if patched:
+        _workspace_cache.invalidate(Path(file_path).resolve())
+    return patched
+
+
+class TaskEditSession:
+    """Apply state and property edits to several tasks of one org file.
+
+    Edits are collected in memory and written once on save() (or on leaving
+    the with block without an exception):
+
+        with TaskEditSession(path) as session:
+            session.set_state(task, 'WORKING')
+            session.set_properties(task, {'NIGHTSHIFT_STATUS': 'executing'})
+
+    The write is a byte patch of just the affected heading lines and drawers
+    when possible (org_patch); otherwise the file is loaded into org-workspace
+    once, every edit applied, and saved once. There, tasks are found by :ID:,
+    or by heading line (falling back to a unique heading title) for tasks
+    without one.
+    """
+
+    def __init__(self, file_path: Path):
+        self.file_path = Path(file_path).resolve()
+        self._edits: List[tuple] = []
+
+    def __enter__(self) -> 'TaskEditSession':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.save()
+
+    def _add(self, task: OrgTask, edit: tuple) -> None:
+        if Path(task.file_path).resolve() != self.file_path:
+            raise ValueError(f"Task {task.id} is not in {self.file_path}")
+        self._edits.append((task, edit))
+
+    def set_state(self, task: OrgTask, new_state: str) -> None:
+        """Change the task's TODO state (and the in-memory task)."""
+        self._add(task, ('state', new_state))
+        task.state = new_state
+
+    def set_property(self, task: OrgTask, prop_name: str, prop_value: str) -> None:
+        """Set one property (and the in-memory task)."""
+        self._add(task, ('property', prop_name, prop_value))
+        task.properties[prop_name] = prop_value
+
+    def set_properties(self, task: OrgTask, props: Dict[str, str]) -> None:
+        """Set several properties, in order."""
+        for prop_name, prop_value in props.items():
+            self.set_property(task, prop_name, prop_value)
+
+    def remove_property(self, task: OrgTask, prop_name: str) -> None:
+        """Delete a property from the drawer, if present (and from the in-memory task)."""
+        self._add(task, ('remove', prop_name))
+        task.properties.pop(prop_name, None)
+
+    def save(self) -> None:
+        """Write all pending edits to the file."""
+        edits, self._edits = self._edits, []
+        if not edits or _patch_edits(self.file_path, edits):
+            return
+
+        ws, fp = _load_ws(self.file_path)
+        nodes: Dict[int, object] = {}
+        for task, edit in edits:
+            node = nodes.get(id(task))
+            if node is None:
+                node = nodes[id(task)] = _locate_node(ws, fp, task)
+            if edit[0] == 'state':
+                ws.transition(node, edit[1])
+            elif edit[0] == 'remove':
+                # Same read-copy-merge-assign protocol as ws.set_property
+                props = dict(node.node.properties)
+                if props.pop(edit[1], None) is not None:
+                    node.node.properties = props
+            else:
+                ws.set_property(node, edit[1], edit[2])
+        _save_ws(ws, fp)
+
+
+def _locate_node(ws: OrgWorkspace, fp: Path, task: OrgTask):
+    """Find a task's node by :ID:, heading line, or unique heading title."""
+    node = _find_node(ws, task)
+    if node is None:
+        same_title = [view for view in ws.all_nodes() if view.heading.strip() == task.title]
+        node = next((view for view in same_title if view.node.linenumber == task.line_number), None)
+        if node is None and len(same_title) == 1:
+            node = same_title[0]  # Lines moved since the task was parsed
+    if node is None:
+        raise KeyError(f"Task not found in {fp}: {task.title}")
+    return node
+
+
 # ---------------------------------------------------------------------------
 # write_org_file — simple file write (kept for caller compatibility)
 # ---------------------------------------------------------------------------
@@ -329,6 +899,7 @@ def _update_task_property_regex(task: OrgTask, prop_name: str, prop_value: str)
 def write_org_file(file_path: Path, content: str) -> None:
     """Write content to an org file."""
     file_path.write_text(content, encoding='utf-8')
+    _workspace_cache.invalidate(Path(file_path).resolve())
 
 
 # ---------------------------------------------------------------------------
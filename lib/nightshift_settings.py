@@ -0,0 +1,202 @@
+"""
+Typed nightshift settings, loaded once per process.
+
+get_settings(data_dir) returns a shared NightshiftSettings parsed from
+.datacore/modules/nightshift/config.local.yaml. Every call re-stats the file
+and re-parses it only when its (mtime_ns, size) changed, so a long run picks
+up edits without paying for a YAML parse per task. Space team configs used
+for output review sections are cached the same way.
+"""
+
+import copy
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def config_path(data_dir: Path) -> Path:
+    """Nightshift module config file for a data directory."""
+    return data_dir / '.datacore' / 'modules' / 'nightshift' / 'config.local.yaml'
+
+
+class _YamlCache:
+    """Parsed YAML files keyed by path, re-read only when (mtime_ns, size) changes.
+
+    Missing files load as {}. Parse errors propagate and are not cached.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Path, Tuple[tuple, Any]] = {}
+        self.parses = 0
+
+    def load(self, path: Path) -> dict:
+        try:
+            st = os.stat(path)
+            key = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            key = None
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        if key is None:
+            self._entries[path] = (None, {})
+            return self._entries[path][1]
+
+        import yaml
+        with open(path) as f:
+            data = yaml.safe_load(f) or {}
+        self.parses += 1
+        self._entries[path] = (key, data)
+        return data
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_yaml_cache = _YamlCache()
+
+
+def _as_int(value, default: Optional[int]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_float(value, default: float) -> float:
+    try:
+        return float(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_list(value) -> Optional[List[str]]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [value]
+    return [str(v) for v in value]
+
+
+def _space_quotas(value) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """(weights, daily budgets) from space_quotas; non-positive values are dropped."""
+    weights: Dict[str, float] = {}
+    budgets: Dict[str, float] = {}
+    if not isinstance(value, dict):
+        return weights, budgets
+    for space, quota in value.items():
+        if not isinstance(quota, dict):
+            continue
+        weight = _as_float(quota.get('weight'), 0.0)
+        if weight > 0:
+            weights[str(space)] = weight
+        budget = _as_float(quota.get('budget_daily_usd'), 0.0)
+        if budget > 0:
+            budgets[str(space)] = budget
+    return weights, budgets
+
+
+@dataclass(frozen=True)
+class NightshiftSettings:
+    """The `nightshift:` section of config.local.yaml, with defaults applied.
+
+    raw holds the whole parsed file for keys without a typed field; it is
+    shared, so treat it as read-only.
+    """
+    enabled: bool = True
+    quality_threshold: float = 0.80
+    max_retries: int = 2
+    budget_daily_usd: float = 0.0  # 0 = unlimited
+    # Run window (systemd TimeoutStartSec of the overnight unit) and whether
+    # run_task_mode plans the queue to fit the budget and (once there is
+    # execution history) the window
+    run_timeout_seconds: float = 3600.0
+    plan_runs: bool = True
+    # Fair share across spaces (space_quotas: {space: {weight, budget_daily_usd}})
+    fair_share: bool = True
+    space_weights: Dict[str, float] = field(default_factory=dict)
+    space_budgets_usd: Dict[str, float] = field(default_factory=dict)
+    # Tasks claimed together with one commit+push (1 = claim each task on its own)
+    claim_window: int = 5
+    # Completion commits are pushed together every N tasks or T seconds
+    commit_every_tasks: int = 5
+    commit_every_seconds: float = 300.0
+    # Discovery
+    spaces: Optional[List[str]] = None
+    exclude_spaces: Optional[List[str]] = None
+    ignore_globs: Optional[List[str]] = None
+    parallel_parse_threshold: Optional[int] = None
+    parallel_parse_workers: Optional[int] = None
+    incremental_index: bool = True
+    raw: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'NightshiftSettings':
+        """Build from a parsed config.local.yaml; malformed values fall back to defaults."""
+        section = config.get('nightshift') or {}
+        defaults = cls()
+        weights, budgets = _space_quotas(section.get('space_quotas'))
+        return cls(
+            enabled=bool(section.get('enabled', defaults.enabled)),
+            quality_threshold=_as_float(section.get('quality_threshold'), defaults.quality_threshold),
+            max_retries=_as_int(section.get('max_retries'), defaults.max_retries),
+            budget_daily_usd=_as_float(section.get('budget_daily_usd'), defaults.budget_daily_usd),
+            run_timeout_seconds=_as_float(section.get('run_timeout_seconds'), defaults.run_timeout_seconds),
+            plan_runs=bool(section.get('plan_runs', defaults.plan_runs)),
+            fair_share=bool(section.get('fair_share', defaults.fair_share)),
+            space_weights=weights,
+            space_budgets_usd=budgets,
+            claim_window=max(1, _as_int(section.get('claim_window'), defaults.claim_window)),
+            commit_every_tasks=max(1, _as_int(section.get('commit_every_tasks'), defaults.commit_every_tasks)),
+            commit_every_seconds=_as_float(section.get('commit_every_seconds'), defaults.commit_every_seconds),
+            spaces=_as_list(section.get('spaces')),
+            exclude_spaces=_as_list(section.get('exclude_spaces')),
+            ignore_globs=_as_list(section.get('ignore_globs')),
+            parallel_parse_threshold=_as_int(section.get('parallel_parse_threshold'), None),
+            parallel_parse_workers=_as_int(section.get('parallel_parse_workers'), None),
+            incremental_index=bool(section.get('incremental_index', defaults.incremental_index)),
+            raw=config,
+        )
+
+
+_settings: Dict[Path, NightshiftSettings] = {}
+
+
+def get_settings(data_dir: Path) -> NightshiftSettings:
+    """Shared settings for data_dir, re-parsed only after the config file changes."""
+    path = config_path(data_dir)
+    config = _yaml_cache.load(path)
+    settings = _settings.get(path)
+    if settings is None or settings.raw is not config:
+        settings = NightshiftSettings.from_config(config)
+        _settings[path] = settings
+    return settings
+
+
+def load_config_dict(data_dir: Path) -> dict:
+    """Private copy of the parsed config.local.yaml (for callers that mutate it)."""
+    return copy.deepcopy(_yaml_cache.load(config_path(data_dir)))
+
+
+def team_members(data_dir: Path, space: str) -> List[str]:
+    """Review team for a space from its .datacore/config.yaml.
+
+    Falls back to the root .datacore/settings.yaml, then to ['reviewer'].
+    """
+    path = data_dir / space / '.datacore' / 'config.yaml'
+    if not path.exists():
+        path = data_dir / '.datacore' / 'settings.yaml'
+    if not path.exists():
+        return ['reviewer']
+
+    config = _yaml_cache.load(path)
+    team = config.get('team', {})
+    members = team.get('members', [])
+    return [m.get('id', m.get('name', 'unknown')) for m in members]
+
+
+def clear_cache() -> None:
+    """Forget every cached file (tests, or after replacing files within one mtime tick)."""
+    _yaml_cache.clear()
+    _settings.clear()
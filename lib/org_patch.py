@@ -0,0 +1,397 @@
+"""
+In-place patching of org heading lines and property drawers.
+
+A state flip (QUEUED -> WORKING) or a property update touches a few bytes of
+one task, but a round trip through org-workspace parses and re-serializes
+the whole file. This module keeps a byte-offset index of the headings (and
+their :ID:s) of recently patched files, splices only the changed bytes, and
+rewrites the file atomically: the unchanged ranges are copied kernel-side
+(copy_file_range) into a temp file that replaces the original.
+
+Before patching, the heading line at the indexed offset is read back and
+checked against the digest recorded in the index; on any mismatch the index
+is rebuilt from the file. Edits this module cannot express safely (missing
+or malformed drawers, multiline values, headings without a state keyword)
+are refused, and callers fall back to org-workspace.
+"""
+
+import bisect
+import hashlib
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+_HEADING_LINE_RE = re.compile(rb'^\*+[ \t][^\n]*', re.MULTILINE)
+_ID_LINE_RE = re.compile(rb'^[ \t]*:ID:[ \t]*([^\s]+)[ \t]*\r?$', re.MULTILINE)
+_STATE_RE = re.compile(rb'^(\*+[ \t]+)([A-Z]+)(?=[ \t\r\n]|$)')
+_PROPERTY_LINE_RE = re.compile(rb'^[ \t]*:\w+:')
+_PLANNING_RE = re.compile(rb'^[ \t]*(SCHEDULED|DEADLINE|CLOSED):')
+
+# Indexes kept per process (most recently used last)
+PATCH_INDEX_SIZE = 8
+
+
+def _digest(line: bytes) -> bytes:
+    return hashlib.blake2b(line, digest_size=8).digest()
+
+
+def _stat_key(path: Path) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class PatchRefused(Exception):
+    """The edit cannot be applied as a byte patch; use the full writer."""
+
+
+class _StaleIndex(Exception):
+    """The heading at an indexed offset no longer matches its digest."""
+
+
+class HeadingIndex:
+    """Byte offsets and digests of every heading line in one file, plus :ID: owners."""
+
+    def __init__(self, data: bytes):
+        self.size = len(data)
+        self.starts: List[int] = []
+        self.levels: List[int] = []
+        self.digests: List[bytes] = []
+        for m in _HEADING_LINE_RE.finditer(data):
+            line = m.group(0)
+            self.starts.append(m.start())
+            self.levels.append(len(line) - len(line.lstrip(b'*')))
+            self.digests.append(_digest(line))
+
+        # :ID: -> heading number; IDs seen twice are ambiguous (None)
+        self.ids: Dict[str, Optional[int]] = {}
+        for m in _ID_LINE_RE.finditer(data):
+            owner = bisect.bisect_right(self.starts, m.start()) - 1
+            if owner < 0:
+                continue
+            task_id = m.group(1).decode('utf-8', 'replace')
+            self.ids[task_id] = None if task_id in self.ids else owner
+
+    def find(self, task_id: str) -> Optional[int]:
+        return self.ids.get(task_id)
+
+    def subtree_end(self, heading: int) -> int:
+        """Offset where the heading's subtree ends (next heading at its level or above)."""
+        level = self.levels[heading]
+        for i in range(heading + 1, len(self.starts)):
+            if self.levels[i] <= level:
+                return self.starts[i]
+        return self.size
+
+    def shift(self, after: int, delta: int) -> None:
+        """Move headings that start after a patched range by delta bytes."""
+        if not delta:
+            return
+        self.size += delta
+        for i in range(bisect.bisect_right(self.starts, after), len(self.starts)):
+            self.starts[i] += delta
+
+
+_indexes: 'OrderedDict[Path, Tuple[tuple, HeadingIndex]]' = OrderedDict()
+
+
+def _get_index(path: Path, stat_key: tuple, rebuild: bool = False) -> HeadingIndex:
+    entry = _indexes.pop(path, None)
+    if entry is not None and entry[0] == stat_key and not rebuild:
+        index = entry[1]
+    else:
+        index = HeadingIndex(path.read_bytes())
+    _remember(path, stat_key, index)
+    return index
+
+
+def _remember(path: Path, stat_key: tuple, index: HeadingIndex) -> None:
+    _indexes.pop(path, None)
+    _indexes[path] = (stat_key, index)
+    while len(_indexes) > PATCH_INDEX_SIZE:
+        _indexes.popitem(last=False)
+
+
+def invalidate(path: Path) -> None:
+    _indexes.pop(Path(path).resolve(), None)
+
+
+_title_res: Dict[frozenset, 're.Pattern'] = {}
+
+
+def _heading_title(line: str, states: frozenset) -> Optional[str]:
+    """A task heading's title, split the way nightshift_parser's _TASK_HEADING_RE does."""
+    pattern = _title_res.get(states)
+    if pattern is None:
+        alternatives = '|'.join(re.escape(s) for s in sorted(states))
+        pattern = _title_res[states] = re.compile(
+            r'^(\*+)\s+(' + alternatives + r')\s+(.+?)(\s+:[\w:]+:)?\s*$')
+    m = pattern.match(line)
+    return m.group(3).strip() if m else None
+
+
+def _heading_matches(f, index: HeadingIndex, heading: int) -> bool:
+    f.seek(index.starts[heading])
+    return _digest(f.readline().rstrip(b'\n')) == index.digests[heading]
+
+
+def subtree_range(file_path: Path, task_id: str) -> Optional[Tuple[int, int]]:
+    """Current byte range of the subtree whose heading owns :ID: task_id.
+
+    Uses the cached index when the file is unchanged since it was last
+    indexed or patched, so readers can follow a task across patches without
+    re-parsing the file. Returns None if the ID is missing or ambiguous.
+    """
+    path = Path(file_path).resolve()
+    stat_key = _stat_key(path)
+    if stat_key is None:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            for attempt in range(2):
+                index = _get_index(path, stat_key, rebuild=attempt > 0)
+                heading = index.find(task_id)
+                if heading is None:
+                    return None
+                if _heading_matches(f, index, heading):
+                    return index.starts[heading], index.subtree_end(heading)
+    except OSError:
+        pass
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Region editing
+# ---------------------------------------------------------------------------
+
+def _read_lines(f, offset: int) -> List[bytes]:
+    """Lines (with their newlines) from offset up to, not including, the next heading."""
+    f.seek(offset)
+    lines = [f.readline()]
+    while True:
+        line = f.readline()
+        if not line or _HEADING_LINE_RE.match(line):
+            return lines
+        lines.append(line)
+
+
+def _drawer_bounds(lines: List[bytes]) -> Optional[Tuple[int, int]]:
+    """Indices of the :PROPERTIES: and :END: lines of the heading's own drawer."""
+    i = 1
+    if i < len(lines) and _PLANNING_RE.match(lines[i]):
+        i += 1
+    if i >= len(lines) or lines[i].strip() != b':PROPERTIES:':
+        return None
+    for j in range(i + 1, len(lines)):
+        if lines[j].strip() == b':END:':
+            return i, j
+    raise PatchRefused('unterminated property drawer')
+
+
+def _newline(line: bytes) -> bytes:
+    return b'\r\n' if line.endswith(b'\r\n') else b'\n'
+
+
+def _apply_edits(lines: List[bytes], edits: List[tuple], states: frozenset) -> List[bytes]:
+    """Apply ('state', name) / ('property', key, value) / ('remove', key) edits to a heading's lines."""
+    lines = list(lines)
+    if not lines[0].endswith(b'\n'):
+        lines[0] += b'\n'  # Heading at EOF without newline
+    nl = _newline(lines[0])
+
+    for edit in edits:
+        if edit[0] == 'state':
+            m = _STATE_RE.match(lines[0])
+            if m is None or m.group(2).decode('ascii') not in states:
+                raise PatchRefused('heading has no state keyword')
+            lines[0] = m.group(1) + edit[1].encode('ascii') + lines[0][m.end():]
+            continue
+
+        if edit[0] == 'remove':
+            bounds = _drawer_bounds(lines)
+            if bounds is not None:
+                found = _property_span(lines, bounds, edit[1].encode('utf-8'))
+                if found is not None:
+                    del lines[found[0]:found[1]]
+            continue
+
+        _, key, value = edit
+        if '\n' in value:
+            raise PatchRefused('multiline property value')
+        key_b = key.encode('utf-8')
+        bounds = _drawer_bounds(lines)
+        if bounds is None:
+            insert_at = 2 if len(lines) > 1 and _PLANNING_RE.match(lines[1]) else 1
+            lines[insert_at:insert_at] = [b':PROPERTIES:' + nl, b':END:' + nl]
+            bounds = (insert_at, insert_at + 1)
+        start, end = bounds
+        indent = lines[start][:len(lines[start]) - len(lines[start].lstrip())]
+        new_line = indent + b':' + key_b + b': ' + value.encode('utf-8') + nl
+
+        found = _property_span(lines, bounds, key_b)
+        if found is not None:
+            lines[found[0]:found[1]] = [new_line]
+        else:
+            lines[end:end] = [new_line]
+    return lines
+
+
+def _property_span(lines: List[bytes], bounds: Tuple[int, int], key: bytes) -> Optional[Tuple[int, int]]:
+    """Line range of a drawer property, including continuation lines of a multiline value."""
+    start, end = bounds
+    prefix = b':' + key + b':'
+    for i in range(start + 1, end):
+        stripped = lines[i].strip()
+        if stripped == prefix or stripped.startswith(prefix + b' ') or stripped.startswith(prefix + b'\t'):
+            stop = i + 1
+            if stripped[len(prefix):].strip() == b'|':
+                while stop < end and not _PROPERTY_LINE_RE.match(lines[stop]):
+                    stop += 1  # Continuation lines of the old multiline value
+            return i, stop
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Atomic splice
+# ---------------------------------------------------------------------------
+
+def _copy_range(src: int, dst: int, offset: int, count: int) -> None:
+    """Copy count bytes at offset from src to dst's current position."""
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    while count > 0:
+        copied = 0
+        if copy_file_range is not None:
+            try:
+                copied = copy_file_range(src, dst, count, offset)
+            except OSError:
+                copy_file_range = None
+                continue
+        else:
+            chunk = os.pread(src, min(count, 1 << 20), offset)
+            copied = os.write(dst, chunk) if chunk else 0
+        if copied <= 0:
+            raise OSError('short copy while patching')
+        offset += copied
+        count -= copied
+
+
+def _splice(path: Path, stat_key: tuple, patches: List[Tuple[int, int, bytes]]) -> None:
+    """Write path with [start, end) ranges replaced, via temp file + rename.
+
+    Refuses if the file changed since stat_key was taken (offsets would be off).
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with open(path, 'rb') as src:
+            st = os.fstat(src.fileno())
+            if (st.st_mtime_ns, st.st_size, st.st_ino) != stat_key:
+                raise PatchRefused('file changed while patching')
+            size = st.st_size
+            mode = st.st_mode & 0o7777
+            pos = 0
+            for start, end, data in patches:
+                _copy_range(src.fileno(), fd, pos, start - pos)
+                os.write(fd, data)
+                pos = end
+            _copy_range(src.fileno(), fd, pos, size - pos)
+        os.fchmod(fd, mode)
+        os.fsync(fd)
+        os.close(fd)
+        fd = None
+        os.replace(tmp, path)
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def patch_tasks(
+    file_path: Path,
+    edits: Dict[str, List[tuple]],
+    titles: Dict[str, str],
+    states: Iterable[str],
+) -> bool:
+    """Apply edits keyed by task :ID: to one file as a byte patch.
+
+    edits maps task ID -> [('state', NEW) | ('property', KEY, VALUE) |
+    ('remove', KEY), ...];
+    titles maps task ID -> expected heading title (a sanity check against
+    IDs inherited from child drawers); states are the TODO keywords a
+    heading may carry. Returns False, leaving the file untouched, when any
+    edit cannot be patched safely.
+    """
+    states = frozenset(states)
+    path = Path(file_path).resolve()
+    stat_key = _stat_key(path)
+    if stat_key is None:
+        return False
+
+    for attempt in range(2):
+        index = _get_index(path, stat_key, rebuild=attempt > 0)
+        try:
+            patches = _plan(path, index, edits, titles, states)
+        except _StaleIndex:
+            continue
+        except (PatchRefused, OSError, UnicodeError):
+            return False
+        break
+    else:
+        invalidate(path)
+        return False
+
+    if not patches:
+        return True
+
+    try:
+        _splice(path, stat_key, [(s, e, data) for s, e, data, _ in patches])
+    except (PatchRefused, OSError):
+        invalidate(path)
+        return False
+
+    # Keep the index current for the next patch instead of rescanning
+    for start, end, data, heading in sorted(patches, reverse=True):
+        index.shift(start, len(data) - (end - start))
+        index.digests[heading] = _digest(data.split(b'\n', 1)[0])
+    new_key = _stat_key(path)
+    if new_key is not None:
+        _remember(path, new_key, index)
+    return True
+
+
+def _plan(
+    path: Path,
+    index: HeadingIndex,
+    edits: Dict[str, List[tuple]],
+    titles: Dict[str, str],
+    states: frozenset,
+) -> list:
+    patches = []
+    with open(path, 'rb') as f:
+        for task_id, task_edits in edits.items():
+            heading = index.find(task_id)
+            if heading is None:
+                raise PatchRefused(f'no unique heading for :ID: {task_id}')
+            if not _heading_matches(f, index, heading):
+                raise _StaleIndex()
+            start = index.starts[heading]
+            lines = _read_lines(f, start)
+            if titles.get(task_id) and _heading_title(lines[0].decode('utf-8'), states) != titles[task_id]:
+                raise PatchRefused('heading title does not match')
+            old = b''.join(lines)
+            new = b''.join(_apply_edits(lines, task_edits, states))
+            if not old.endswith(b'\n') and new.endswith(b'\n'):
+                new = new[:-len(_newline(new))]  # Keep "no newline at end of file"
+            if new != old:
+                patches.append((start, start + len(old), new, heading))
+    patches.sort()
+    return patches
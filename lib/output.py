@@ -5,12 +5,12 @@ Writes results to 0-inbox/ and updates task state.
 
 import subprocess
 import logging
-import yaml
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, Any, Optional, Tuple, List
 
 from nightshift_parser import OrgTask
+from nightshift_settings import team_members
 from evaluate import EvaluationResult
 
 logger = logging.getLogger(__name__)
@@ -46,20 +46,8 @@ def get_output_dir(task: OrgTask, data_dir: Path) -> Path:
 
 def get_team_members(task: OrgTask, data_dir: Path) -> List[str]:
     """Get team members from space config for review checkboxes."""
-    space = task.space or '0-personal'
-    config_path = data_dir / space / '.datacore' / 'config.yaml'
-
-    if not config_path.exists():
-        # Fallback to root config
-        config_path = data_dir / '.datacore' / 'settings.yaml'
-
     try:
-        if config_path.exists():
-            with open(config_path, 'r') as f:
-                config = yaml.safe_load(f) or {}
-            team = config.get('team', {})
-            members = team.get('members', [])
-            return [m.get('id', m.get('name', 'unknown')) for m in members]
+        return team_members(data_dir, task.space or '0-personal')
     except Exception as e:
         logger.warning(f"Could not read team config: {e}")
 
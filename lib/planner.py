@@ -0,0 +1,282 @@
+"""
+Budget- and deadline-aware run planning for nightshift.
+
+plan_queue picks a subset of a built queue with high total priority whose
+estimated cost fits the remaining daily budget and whose estimated wall
+time fits the run window (systemd stops the overnight run after
+TimeoutStartSec=3600). This is a two-constraint 0/1 knapsack, solved by
+dynamic programming over (time, cost) states discretized to 30 seconds and
+one cent. :DEPENDS_ON: prerequisites in the queue must be chosen before a
+task that waits on them can be.
+
+The DP only sees the MAX_CANDIDATES tasks with the most priority per share
+of the budget and window (plus their prerequisites); the others are added
+greedily, densest first, while they still fit. Without :DEPENDS_ON: among the candidates the DP is exact;
+with it, each (time, cost) state keeps a single chosen set, so the result is
+a heuristic.
+
+Chosen tasks keep the queue's order (priority, prerequisites first), and the
+plan carries each task's expected start and finish offsets.
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from dependencies import DependencyGraph
+
+
+# Claim, evaluation, output and git push around each execution
+TASK_OVERHEAD_SECONDS = 60.0
+# Pull, queue build, summaries and the final push
+RUN_OVERHEAD_SECONDS = 120.0
+
+_TIME_UNIT = 30.0   # seconds
+_COST_UNIT = 0.01   # USD
+# Dominated states are pruned once the frontier passes _PRUNE_AT; above
+# _MAX_STATES only the highest-priority states are kept
+_PRUNE_AT = 2000
+_MAX_STATES = 20000
+# Tasks planned by the DP: about a second at worst, and the dense picks
+# leave little for more candidates to improve
+MAX_CANDIDATES = 48
+
+
+@dataclass
+class PlannedTask:
+    item: object  # QueuedTask
+    start_seconds: float
+    finish_seconds: float
+    finish_high_seconds: float  # Rough p90 of the finish offset
+    cumulative_cost_usd: float
+
+
+@dataclass
+class Plan:
+    tasks: List[PlannedTask] = field(default_factory=list)
+    deferred: List[Tuple[object, str]] = field(default_factory=list)
+    budget_usd: Optional[float] = None
+    deadline_seconds: Optional[float] = None
+
+    @property
+    def total_priority(self) -> float:
+        return sum(p.item.priority_score for p in self.tasks)
+
+    @property
+    def total_cost_usd(self) -> float:
+        return self.tasks[-1].cumulative_cost_usd if self.tasks else 0.0
+
+    @property
+    def total_seconds(self) -> float:
+        return self.tasks[-1].finish_seconds if self.tasks else 0.0
+
+    def queue(self) -> List:
+        """The chosen QueuedTasks in execution order."""
+        return [p.item for p in self.tasks]
+
+    def trim_to(self, deadline_seconds: float) -> None:
+        """Defer planned tasks expected to finish after deadline_seconds (e.g. once
+        planning itself has used part of the window)."""
+        keep = [p for p in self.tasks if p.finish_seconds <= deadline_seconds]
+        # finish_seconds only grows, so the dropped tasks are a suffix and
+        # no kept task waits on one of them
+        self.deferred = [(p.item, "longer than the run window")
+                         for p in self.tasks[len(keep):]] + self.deferred
+        self.tasks = keep
+        self.deadline_seconds = deadline_seconds
+
+
+def _estimates(item, conservative: bool) -> Tuple[float, float, float, float]:
+    """(cost, seconds, seconds p90, cost p90) for a queued task."""
+    est = getattr(item, 'estimate', None)
+    if est is None:
+        return item.estimated_cost_usd, item.estimated_seconds, item.estimated_seconds, item.estimated_cost_usd
+    cost = est.cost_usd.high if conservative else est.cost_usd.expected
+    seconds = est.seconds.high if conservative else est.seconds.expected
+    return cost, seconds, est.seconds.high, est.cost_usd.high
+
+
+def plan_queue(
+    queue: List,
+    budget_usd: Optional[float] = None,
+    deadline_seconds: Optional[float] = None,
+    overhead_seconds: float = TASK_OVERHEAD_SECONDS,
+    conservative: bool = False,
+    max_candidates: int = MAX_CANDIDATES,
+) -> Plan:
+    """Choose and order tasks from queue under budget and time-window limits.
+
+    Args:
+        queue: QueuedTasks from build_queue (estimates filled in)
+        budget_usd: Remaining spend allowed (None: unlimited; <= 0 plans nothing)
+        deadline_seconds: Wall time available for executions (None: unlimited)
+        overhead_seconds: Per-task time on top of the execution estimate
+        conservative: Plan with p90 cost and duration instead of expected
+        max_candidates: Tasks planned by the DP (the densest, plus their
+            prerequisites); the rest are only added greedily
+    """
+    if budget_usd is not None:
+        budget_usd = max(0.0, budget_usd)  # Exhausted budget: nothing fits
+    plan = Plan(budget_usd=budget_usd, deadline_seconds=deadline_seconds)
+    if not queue:
+        return plan
+
+    time_limit = math.floor(deadline_seconds / _TIME_UNIT) if deadline_seconds is not None else None
+    cost_limit = math.floor(budget_usd / _COST_UNIT + 1e-9) if budget_usd is not None else None
+
+    graph = DependencyGraph(queue)
+    position = {id(item): i for i, item in enumerate(queue)}
+    weights = []
+    reasons: Dict[int, str] = {}
+    for i, item in enumerate(queue):
+        cost, seconds, _, _ = _estimates(item, conservative)
+        t = math.ceil((seconds + overhead_seconds) / _TIME_UNIT) if time_limit is not None else 0
+        c = math.ceil(cost / _COST_UNIT - 1e-9) if cost_limit is not None else 0
+        weights.append((t, c))
+        if time_limit is not None and t > time_limit:
+            reasons[i] = "longer than the run window"
+        elif cost_limit is not None and c > cost_limit:
+            reasons[i] = "costs more than the remaining budget"
+
+    def density(i: int) -> float:
+        """Priority per share of the budget and window a task would use."""
+        t, c = weights[i]
+        share = (t / time_limit if time_limit else 0.0) + (c / cost_limit if cost_limit else 0.0)
+        return queue[i].priority_score / share if share > 0 else math.inf
+
+    # The DP plans the densest tasks plus their prerequisites (so the set is
+    # closed under :DEPENDS_ON:); everything else is only filled in greedily
+    by_density = sorted((i for i in range(len(queue)) if i not in reasons), key=lambda i: -density(i))
+    planned = set(by_density[:max(0, max_candidates)])
+    stack = list(planned)
+    while stack:
+        for prerequisite in graph.prerequisites(queue[stack.pop()]):
+            j = position[id(prerequisite)]
+            if j not in planned:
+                planned.add(j)
+                stack.append(j)
+    candidates = sorted(planned)  # Queue order: prerequisites first
+    bit_of = {i: k for k, i in enumerate(candidates)}
+
+    # DP over (time, cost) -> (priority, chosen mask over candidates); states
+    # only grow by adding a task whose prerequisites are already in the mask
+    states: Dict[Tuple[int, int], Tuple[float, int]] = {(0, 0): (0.0, 0)}
+    prune_at = _PRUNE_AT
+    for k, i in enumerate(candidates):
+        if i in reasons:
+            continue
+        item = queue[i]
+        t, c = weights[i]
+        required = 0
+        for prerequisite in graph.prerequisites(item):
+            required |= 1 << bit_of[position[id(prerequisite)]]
+        bit = 1 << k
+        value = item.priority_score
+        additions = []
+        for (st, sc), (sv, mask) in states.items():
+            nt, nc = st + t, sc + c
+            if time_limit is not None and nt > time_limit:
+                continue
+            if cost_limit is not None and nc > cost_limit:
+                continue
+            if mask & required != required:
+                continue
+            additions.append(((nt, nc), (sv + value, mask | bit)))
+        for key, candidate in additions:
+            current = states.get(key)
+            if current is None or candidate[0] > current[0]:
+                states[key] = candidate
+        if len(states) > prune_at:
+            states = _prune(states)
+            # A frontier that stays large is pruned again only once it doubles
+            prune_at = max(_PRUNE_AT, 2 * len(states))
+
+    best_key = min(states, key=lambda k: (-states[k][0], k[0], k[1]))
+    best_mask = states[best_key][1]
+    chosen = {i for k, i in enumerate(candidates) if best_mask >> k & 1}
+
+    # Greedy fill with the remaining tasks, densest first
+    used_t, used_c = best_key
+    for i in by_density:
+        if i in planned:
+            continue
+        t, c = weights[i]
+        if time_limit is not None and used_t + t > time_limit:
+            continue
+        if cost_limit is not None and used_c + c > cost_limit:
+            continue
+        if any(position[id(p)] not in chosen for p in graph.prerequisites(queue[i])):
+            continue
+        chosen.add(i)
+        used_t, used_c = used_t + t, used_c + c
+
+    elapsed = 0.0
+    spent = 0.0
+    variance = 0.0
+    for i, item in enumerate(queue):
+        if i not in chosen:
+            continue
+        cost, seconds, seconds_high, _ = _estimates(item, conservative)
+        start = elapsed
+        elapsed += seconds + overhead_seconds
+        spent += cost
+        variance += max(0.0, seconds_high - seconds) ** 2
+        plan.tasks.append(PlannedTask(
+            item=item,
+            start_seconds=start,
+            finish_seconds=elapsed,
+            finish_high_seconds=elapsed + math.sqrt(variance),
+            cumulative_cost_usd=spent,
+        ))
+
+    for i, item in enumerate(queue):
+        if i in chosen:
+            continue
+        reason = reasons.get(i)
+        if reason is None:
+            missing = [p.task.id for p in graph.prerequisites(item)
+                       if position[id(p)] not in chosen]
+            if missing:
+                reason = f"waits on deferred {', '.join(missing)}"
+            else:
+                reason = "does not fit alongside higher-value tasks"
+        plan.deferred.append((item, reason))
+    return plan
+
+
+def _prune(states: Dict[Tuple[int, int], Tuple[float, int]]) -> Dict[Tuple[int, int], Tuple[float, int]]:
+    """Drop dominated states (another takes no longer, costs no more, is worth as much).
+
+    Falls back to keeping the highest-priority states if the frontier is
+    still too large; the plan is then approximate.
+    """
+    size = max(c for _, c in states) + 2
+    tree = [float('-inf')] * size  # Fenwick tree: best value with cost <= c
+
+    def best_up_to(c: int) -> float:
+        best = float('-inf')
+        i = c + 1
+        while i > 0:
+            best = max(best, tree[i])
+            i -= i & -i
+        return best
+
+    def record(c: int, value: float) -> None:
+        i = c + 1
+        while i < size:
+            if tree[i] < value:
+                tree[i] = value
+            i += i & -i
+
+    kept = {}
+    for key in sorted(states):
+        value = states[key][0]
+        if best_up_to(key[1]) >= value:
+            continue
+        kept[key] = states[key]
+        record(key[1], value)
+
+    if len(kept) > _MAX_STATES:
+        top = sorted(kept, key=lambda k: -kept[k][0])[:_MAX_STATES // 2]
+        kept = {k: kept[k] for k in top}
+    return kept
@@ -4,12 +4,20 @@ Queue management for nightshift.
 Discovers :AI: tasks and builds execution queue.
 """
 
+import heapq
+import itertools
 import sys
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 from dataclasses import dataclass
 
-from nightshift_parser import OrgTask, find_ai_tasks
+from nightshift_parser import OrgTask, iter_ai_tasks
+from task_index import TaskIndex
+from dependencies import DependencyGraph, SATISFIED_STATES, depends_on
+from nightshift_settings import NightshiftSettings, get_settings, load_config_dict
+from estimator import COST_PER_1K_TOKENS, DEFAULT_TOKENS, HistoryEstimator, TaskEstimate
+from planner import RUN_OVERHEAD_SECONDS, Plan, plan_queue
 
 
 @dataclass
@@ -17,7 +25,30 @@ class QueuedTask:
     """A task ready for execution with priority score."""
     task: OrgTask
     priority_score: float
-    estimated_tokens: int = 5000  # Default estimate
+    estimated_tokens: int = DEFAULT_TOKENS  # Default estimate
+    estimated_cost_usd: float = 0.0
+    estimated_seconds: float = 0.0
+    estimate: Optional[TaskEstimate] = None  # Expected values with p10/p90 bounds
+
+
+# Component weights of calculate_priority (sum to 1.0)
+PRIORITY_WEIGHTS = {
+    'impact': 0.35,
+    'urgency': 0.25,
+    'readiness': 0.20,
+    'effort': 0.10,
+    'intent': 0.10,
+}
+
+# AI tag type affects priority
+AI_TAG_BOOST = {
+    ':AI:pm:': 1.2,
+    ':AI:research:': 1.1,
+    ':AI:content:': 1.0,
+    ':AI:data:': 1.0,
+    ':AI:code:': 0.9,
+    ':AI:': 0.8,
+}
 
 
 def calculate_priority(task: OrgTask) -> float:
@@ -27,6 +58,9 @@ def calculate_priority(task: OrgTask) -> float:
 
     Formula: Impact * 0.35 + Urgency * 0.25 + Readiness * 0.20 + Effort * 0.10 + Intent * 0.10
     Weights sum to 1.0. Intent score from strategic alignment (default 5).
+
+    This is the reference scorer; scoring.PriorityBatch computes the same
+    scores for many tasks and weight configurations at once.
     """
     # Default values (1-10 scale)
     impact = 5
@@ -35,29 +69,33 @@ def calculate_priority(task: OrgTask) -> float:
     effort = 5  # Lower effort = higher priority for this component
     intent = 5  # Strategic intent alignment (default neutral)
 
-    # Get from properties if available
-    if 'IMPACT' in task.properties:
+    # Get from properties if available (get_property leaves lazy bodies unread)
+    value = task.get_property('IMPACT')
+    if value is not None:
         try:
-            impact = int(task.properties['IMPACT'])
+            impact = int(value)
         except ValueError:
             pass
 
-    if 'URGENCY' in task.properties:
+    value = task.get_property('URGENCY')
+    if value is not None:
         try:
-            urgency = int(task.properties['URGENCY'])
+            urgency = int(value)
         except ValueError:
             pass
 
-    if 'EFFORT' in task.properties:
+    value = task.get_property('EFFORT')
+    if value is not None:
         try:
             # Invert effort (lower effort = better)
-            effort = 10 - int(task.properties['EFFORT'])
+            effort = 10 - int(value)
         except ValueError:
             pass
 
-    if 'INTENT_SCORE' in task.properties:
+    value = task.get_property('INTENT_SCORE')
+    if value is not None:
         try:
-            intent = float(task.properties['INTENT_SCORE'])
+            intent = float(value)
         except ValueError:
             pass
 
@@ -67,87 +105,476 @@ def calculate_priority(task: OrgTask) -> float:
     elif task.state == 'TODO':
         readiness = 5
 
-    # AI tag type affects priority
-    tag_boost = {
-        ':AI:pm:': 1.2,
-        ':AI:research:': 1.1,
-        ':AI:content:': 1.0,
-        ':AI:data:': 1.0,
-        ':AI:code:': 0.9,
-        ':AI:': 0.8,
-    }
     ai_tag = task.ai_tag or ':AI:'
-    multiplier = tag_boost.get(ai_tag, 1.0)
+    multiplier = AI_TAG_BOOST.get(ai_tag, 1.0)
 
     # Calculate weighted score (weights sum to 1.0)
+    w = PRIORITY_WEIGHTS
     score = (
-        impact * 0.35 +
-        urgency * 0.25 +
-        readiness * 0.20 +
-        effort * 0.10 +
-        intent * 0.10
+        impact * w['impact'] +
+        urgency * w['urgency'] +
+        readiness * w['readiness'] +
+        effort * w['effort'] +
+        intent * w['intent']
     ) * multiplier
 
     return round(score, 2)
 
 
 def load_config(data_dir: Path) -> dict:
-    """Load nightshift config from config.local.yaml if present."""
-    import yaml
-    config_path = data_dir / '.datacore' / 'modules' / 'nightshift' / 'config.local.yaml'
-    if config_path.exists():
-        with open(config_path) as f:
-            return yaml.safe_load(f) or {}
-    return {}
+    """Load nightshift config from config.local.yaml if present.
+
+    Returns a private copy of the cached file; prefer
+    nightshift_settings.get_settings for typed, shared access.
+    """
+    return load_config_dict(data_dir)
+
+
+def _settings_for(data_dir: Path, config: Optional[dict]) -> NightshiftSettings:
+    if config is None:
+        return get_settings(data_dir)
+    return NightshiftSettings.from_config(config)
+
+
+def build_task_index(data_dir: Path, config: Optional[dict] = None) -> TaskIndex:
+    """Scan the data directory once, honouring the nightshift discovery config.
+
+    Incremental by default (nightshift.incremental_index): after a git pull
+    only the files git reports as changed are re-checked.
+    """
+    settings = _settings_for(data_dir, config)
+    return TaskIndex.build(
+        data_dir,
+        spaces=settings.spaces,
+        exclude_spaces=settings.exclude_spaces,
+        ignore_globs=settings.ignore_globs,
+        parallel_threshold=settings.parallel_parse_threshold,
+        max_workers=settings.parallel_parse_workers,
+        incremental=settings.incremental_index,
+    )
+
+
+def iter_queue_candidates(tasks: Iterable[OrgTask]) -> Iterator[QueuedTask]:
+    """Score tasks as they arrive, skipping ones already being executed."""
+    for task in tasks:
+        status = task.get_property('NIGHTSHIFT_STATUS', '')
+        if status not in ['executing', 'claimed']:
+            yield QueuedTask(task=task, priority_score=calculate_priority(task))
 
 
-def build_queue(data_dir: Path, limit: Optional[int] = None, include_pending: bool = False) -> List[QueuedTask]:
+def queue_sort_key(item: QueuedTask) -> tuple:
+    """Highest priority first; on ties QUEUED tasks before pending ones."""
+    return (-item.priority_score, item.task.state != 'QUEUED')
+
+
+def _is_queue_source(task: OrgTask, include_pending: bool) -> bool:
+    if task.state == 'QUEUED':
+        return 'nightshift.org' in task.file_path.name
+    return (
+        include_pending
+        and task.state in ('TODO', 'NEXT')
+        and 'nightshift.org' not in str(task.file_path)
+    )
+
+
+def stream_queue_tasks(
+    data_dir: Path,
+    include_pending: bool = False,
+    config: Optional[dict] = None,
+) -> Iterator[OrgTask]:
+    """Yield queue-source tasks straight from the walk, without an index.
+
+    Memory stays bounded by one file's :AI: tasks, and callers can stop as
+    soon as they have what they need.
+    """
+    settings = _settings_for(data_dir, config)
+    states = ['QUEUED', 'TODO', 'NEXT'] if include_pending else ['QUEUED']
+    for task in iter_ai_tasks(
+        data_dir,
+        states=states,
+        spaces=settings.spaces,
+        exclude_spaces=settings.exclude_spaces,
+        ignore_globs=settings.ignore_globs,
+    ):
+        if _is_queue_source(task, include_pending):
+            yield task
+
+
+def _queue_tasks(
+    data_dir: Path,
+    include_pending: bool,
+    index: Optional[TaskIndex],
+    stream: bool,
+) -> Iterable[OrgTask]:
+    """Queue-source tasks from a streaming walk or a TaskIndex."""
+    if stream and index is None:
+        return stream_queue_tasks(data_dir, include_pending)
+
+    if index is None:
+        index = build_task_index(data_dir)
+
+    # Primary: Find QUEUED tasks in nightshift.org only (not source files)
+    tasks = index.query(states=['QUEUED'], file_name='nightshift.org')
+
+    # Optionally include :AI: tasks from other files that haven't been queued yet
+    if include_pending:
+        tasks += [t for t in index.query(states=['TODO', 'NEXT'])
+                  if _is_queue_source(t, include_pending)]
+    return tasks
+
+
+def _task_states(data_dir: Path, index: Optional[TaskIndex]) -> Dict[str, str]:
+    """State of every indexed task by :ID: (an unfinished duplicate wins)."""
+    if index is None:
+        index = build_task_index(data_dir)
+    states: Dict[str, str] = {}
+    for task in index:
+        if states.get(task.id, 'DONE') in SATISFIED_STATES:
+            states[task.id] = task.state
+    return states
+
+
+def build_dependency_graph(
+    data_dir: Path,
+    include_pending: bool = False,
+    index: Optional[TaskIndex] = None,
+    stream: bool = False,
+    candidates: Optional[List[QueuedTask]] = None,
+) -> DependencyGraph:
+    """DependencyGraph over the queue candidates (see build_queue for the arguments).
+
+    Prerequisites outside the queue are resolved against the task index,
+    which is only built when some :DEPENDS_ON: names a task not in the queue.
+    """
+    if candidates is None:
+        candidates = list(iter_queue_candidates(
+            _queue_tasks(data_dir, include_pending, index, stream)))
+    queued_ids = {item.task.id for item in candidates}
+    external = any(
+        dep not in queued_ids for item in candidates for dep in depends_on(item.task))
+    task_states = _task_states(data_dir, index) if external else None
+    return DependencyGraph(candidates, task_states, key=queue_sort_key)
+
+
+def _noting_depends_on(items: Iterable[QueuedTask], seen: List[bool]) -> Iterator[QueuedTask]:
+    """Pass items through, appending to seen once one has :DEPENDS_ON:."""
+    for item in items:
+        if not seen and depends_on(item.task):
+            seen.append(True)
+        yield item
+
+
+def build_queue(
+    data_dir: Path,
+    limit: Optional[int] = None,
+    include_pending: bool = False,
+    index: Optional[TaskIndex] = None,
+    stream: Optional[bool] = None,
+    estimate: bool = True,
+) -> List[QueuedTask]:
     """Build execution queue from nightshift.org QUEUED tasks, sorted by priority.
 
     Args:
         data_dir: Root data directory
         limit: Maximum number of tasks to return
         include_pending: If True, also include TODO/NEXT :AI: tasks not yet moved to nightshift.org
+        index: Pre-built TaskIndex to query instead of scanning data_dir
+        stream: Score tasks straight from a streaming walk instead of
+            building a TaskIndex (bounded memory for very large backlogs).
+            Defaults to streaming when a limit is set.
+        estimate: Fill token/cost/duration estimates from execution history
+            (for the returned tasks only)
+
+    With a limit, only the best `limit` tasks are kept while scoring (a
+    bounded heap), so the full candidate list is never held or sorted. The
+    result is identical to sorting everything and slicing.
+
+    When any task has :DEPENDS_ON:, the queue is a priority-weighted
+    topological order instead (see dependencies.DependencyGraph): every task
+    comes after its prerequisites, and tasks in a cycle or waiting on an
+    unfinished task outside the queue are left out. The graph needs every
+    candidate, so with a limit the candidates are then collected again.
     """
-    # Load config for space filtering
-    config = load_config(data_dir)
-    nightshift_config = config.get('nightshift', {})
-    spaces = nightshift_config.get('spaces')
-    exclude_spaces = nightshift_config.get('exclude_spaces')
+    if stream is None:
+        stream = bool(limit)
+    candidates = iter_queue_candidates(_queue_tasks(data_dir, include_pending, index, stream))
 
-    # Primary: Find QUEUED tasks in nightshift.org only (not source files)
-    all_queued = find_ai_tasks(data_dir, states=['QUEUED'], spaces=spaces, exclude_spaces=exclude_spaces)
-    tasks = [t for t in all_queued if 'nightshift.org' in t.file_path.name]
+    if limit:
+        seen_depends: List[bool] = []
+        queue = heapq.nsmallest(
+            limit, _noting_depends_on(candidates, seen_depends), key=queue_sort_key)
+        if seen_depends:
+            candidates = list(iter_queue_candidates(
+                _queue_tasks(data_dir, include_pending, index, stream)))
+            queue = build_dependency_graph(
+                data_dir, include_pending, index, stream, candidates).order()[:limit]
+    else:
+        queue = list(candidates)
+        if any(depends_on(item.task) for item in queue):
+            queue = build_dependency_graph(
+                data_dir, include_pending, index, stream, queue).order()
+        else:
+            # Sort by priority (highest first)
+            queue.sort(key=queue_sort_key)
+
+    if estimate:
+        HistoryEstimator.for_data_dir(data_dir).fill(queue)
+    return queue
 
-    # Optionally include :AI: tasks from other files that haven't been queued yet
-    if include_pending:
-        pending_tasks = find_ai_tasks(data_dir, states=['TODO', 'NEXT'], spaces=spaces, exclude_spaces=exclude_spaces)
-        # Filter to only tasks NOT in nightshift.org (those are the pending ones)
-        for task in pending_tasks:
-            if 'nightshift.org' not in str(task.file_path):
-                tasks.append(task)
-
-    # Filter out tasks that are already being executed
-    eligible = []
-    for task in tasks:
-        status = task.properties.get('NIGHTSHIFT_STATUS', '')
-        if status not in ['executing', 'claimed']:
-            eligible.append(task)
 
-    # Calculate priorities and create queue
-    queue = []
-    for task in eligible:
-        priority = calculate_priority(task)
-        queue.append(QueuedTask(task=task, priority_score=priority))
+class TaskQueue:
+    """Execution queue that hands out the next-best task on demand.
 
-    # Sort by priority (highest first)
-    queue.sort(key=lambda q: q.priority_score, reverse=True)
+    Building it heapifies the candidates (linear), and each pop_next() costs
+    O(log n), so a run that stops after a few tasks never pays for a full
+    sort. rerank() re-scores a single task in O(log n) by invalidating its
+    old heap entry; ties keep discovery order, as in build_queue.
 
-    # Apply limit
-    if limit:
-        queue = queue[:limit]
+    With a DependencyGraph, tasks are held back until complete() has been
+    called for all their prerequisites, and ready tasks are ranked by the
+    graph's inherited priority. Blocked tasks are never handed out.
+    """
 
-    return queue
+    def __init__(self, items: Iterable[QueuedTask] = (), graph: Optional[DependencyGraph] = None):
+        self._counter = itertools.count()
+        self._seq: Dict[int, int] = {}
+        self._entries: Dict[int, list] = {}
+        self._heap: List[list] = []
+        self._graph = graph
+        self._held: Dict[int, list] = {}  # id(item) -> [item, unmet prerequisite count]
+        for item in items:
+            if graph is not None:
+                if graph.is_blocked(item):
+                    continue
+                unmet = len(graph.prerequisites(item))
+                if unmet:
+                    self._held[id(item)] = [item, unmet]
+                    continue
+            self._heap.append(self._entry(item))
+        heapq.heapify(self._heap)
+
+    def _entry(self, item: QueuedTask) -> list:
+        seq = self._seq.setdefault(id(item), next(self._counter))
+        key = self._graph.sort_key(item) if self._graph is not None else queue_sort_key(item)
+        entry = [key, seq, item]
+        self._entries[id(item)] = entry
+        return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, item: QueuedTask) -> bool:
+        return id(item) in self._entries
+
+    def __iter__(self) -> Iterator[QueuedTask]:
+        """Remaining tasks in priority order, without removing them."""
+        return (entry[2] for entry in sorted(self._entries.values()))
+
+    def push(self, item: QueuedTask) -> None:
+        """Add a task (or re-add a popped one)."""
+        self._invalidate(item)
+        heapq.heappush(self._heap, self._entry(item))
+
+    def _invalidate(self, item: QueuedTask) -> bool:
+        entry = self._entries.pop(id(item), None)
+        if entry is None:
+            return False
+        entry[2] = None
+        return True
+
+    def _discard_invalid(self) -> None:
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+
+    def peek(self) -> Optional[QueuedTask]:
+        """Best remaining task without removing it."""
+        self._discard_invalid()
+        return self._heap[0][2] if self._heap else None
+
+    def pop_next(self) -> Optional[QueuedTask]:
+        """Remove and return the best remaining task (None when empty)."""
+        self._discard_invalid()
+        if not self._heap:
+            return None
+        item = heapq.heappop(self._heap)[2]
+        del self._entries[id(item)]
+        return item
+
+    def remove(self, item: QueuedTask) -> bool:
+        """Drop a task from the queue. Returns False if it was not queued."""
+        return self._invalidate(item)
+
+    def complete(self, item: QueuedTask) -> List[QueuedTask]:
+        """Mark a task finished; queue and return dependents it was the last blocker of."""
+        if self._graph is None:
+            return []
+        released = []
+        for dependent in self._graph.dependents(item):
+            held = self._held.get(id(dependent))
+            if held is None:
+                continue
+            held[1] -= 1
+            if held[1] == 0:
+                del self._held[id(dependent)]
+                self.push(dependent)
+                released.append(dependent)
+        return released
+
+    def held(self) -> List[QueuedTask]:
+        """Tasks still waiting on prerequisites that have not completed."""
+        return [held[0] for held in self._held.values()]
+
+    def rerank(self, item: QueuedTask, priority_score: Optional[float] = None) -> None:
+        """Re-score a queued task (recomputed from its properties by default)."""
+        if id(item) not in self._entries:
+            return
+        if priority_score is None:
+            priority_score = calculate_priority(item.task)
+        item.priority_score = priority_score
+        if self._graph is not None:
+            # Inherited priorities of its prerequisites may change too
+            self._graph.refresh()
+            self.rerank_all(lambda other: False)
+            return
+        self.push(item)
+
+    def rerank_all(self, predicate: Optional[Callable[[QueuedTask], bool]] = None) -> None:
+        """Re-score every queued task (or those matching predicate) and re-heapify."""
+        items = [entry[2] for entry in self._entries.values()]
+        for item in items:
+            if predicate is None or predicate(item):
+                item.priority_score = calculate_priority(item.task)
+        if self._graph is not None:
+            self._graph.refresh()
+        self._entries.clear()
+        self._heap = [self._entry(item) for item in items]
+        heapq.heapify(self._heap)
+
+
+def _space_of(item: QueuedTask) -> str:
+    return item.task.space or '0-personal'
+
+
+class FairTaskQueue:
+    """Weighted fair queuing across spaces: deficit round robin over per-space TaskQueues.
+
+    Each space's tasks keep their priority order in a TaskQueue of their
+    own. Spaces take turns; on its turn a space's deficit grows by
+    weight * quantum and it hands out tasks while their estimated cost fits
+    the deficit. Over a run each space therefore gets budget in proportion
+    to its weight (default 1), however many tasks it queued. The quantum
+    defaults to the costliest task's estimate, so every space with weight
+    >= 1 gets at least one task per round.
+
+    Same interface as TaskQueue for the run loop. With a DependencyGraph,
+    complete() releases waiting tasks in any space.
+    """
+
+    def __init__(
+        self,
+        items: Iterable[QueuedTask] = (),
+        graph: Optional[DependencyGraph] = None,
+        weights: Optional[Dict[str, float]] = None,
+        quantum_usd: Optional[float] = None,
+    ):
+        items = list(items)
+        self._graph = graph
+        self._weights = weights or {}
+        self._queues: Dict[str, TaskQueue] = {}
+        by_space: Dict[str, List[QueuedTask]] = {}
+        for item in items:
+            by_space.setdefault(_space_of(item), []).append(item)
+        # Spaces take turns in order of their best task
+        for space, space_items in by_space.items():
+            self._queues[space] = TaskQueue(space_items, graph)
+        self._order = list(self._queues)
+        self._deficit = {space: 0.0 for space in self._order}
+        self.quantum_usd = quantum_usd or max((self._cost(item) for item in items), default=1.0)
+        self._turn = 0
+        self._credited = False  # Whether the current space got its quantum this turn
+
+    @staticmethod
+    def _cost(item: QueuedTask) -> float:
+        if item.estimated_cost_usd > 0:
+            return item.estimated_cost_usd
+        return (DEFAULT_TOKENS / 1000) * COST_PER_1K_TOKENS
+
+    def weight(self, space: str) -> float:
+        return self._weights.get(space, 1.0)
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def spaces(self) -> List[str]:
+        return list(self._order)
+
+    def push(self, item: QueuedTask) -> None:
+        """Add a task (or re-add a popped one) to its space."""
+        space = _space_of(item)
+        if space not in self._queues:
+            self._queues[space] = TaskQueue((), self._graph)
+            self._order.append(space)
+            self._deficit[space] = 0.0
+        self._queues[space].push(item)
+
+    def remove(self, item: QueuedTask) -> bool:
+        queue = self._queues.get(_space_of(item))
+        return queue.remove(item) if queue is not None else False
+
+    def _next_turn(self) -> None:
+        self._turn = (self._turn + 1) % len(self._order)
+        self._credited = False
+
+    def pop_next(self) -> Optional[QueuedTask]:
+        """Next task in deficit round robin order (None when nothing is ready)."""
+        if not len(self):
+            return None
+        while True:
+            space = self._order[self._turn]
+            queue = self._queues[space]
+            head = queue.peek()
+            if head is None:
+                # Idle spaces do not bank credit
+                self._deficit[space] = 0.0
+                self._next_turn()
+                continue
+            if not self._credited:
+                self._deficit[space] += self.weight(space) * self.quantum_usd
+                self._credited = True
+            cost = self._cost(head)
+            if cost <= self._deficit[space]:
+                self._deficit[space] -= cost
+                return queue.pop_next()
+            self._next_turn()
+
+    def complete(self, item: QueuedTask) -> List[QueuedTask]:
+        """Mark a task finished; queue and return dependents it was the last blocker of."""
+        released = []
+        for queue in self._queues.values():
+            released.extend(queue.complete(item))
+        return released
+
+    def held(self) -> List[QueuedTask]:
+        """Tasks still waiting on prerequisites that have not completed."""
+        return [item for queue in self._queues.values() for item in queue.held()]
+
+
+def build_task_queue(
+    data_dir: Path,
+    include_pending: bool = False,
+    index: Optional[TaskIndex] = None,
+    stream: bool = False,
+) -> TaskQueue:
+    """Incremental counterpart of build_queue (see it for the arguments).
+
+    Honours :DEPENDS_ON: the same way: call complete() on a task once it
+    has finished to release the tasks waiting on it.
+    """
+    candidates = list(iter_queue_candidates(_queue_tasks(data_dir, include_pending, index, stream)))
+    if any(depends_on(item.task) for item in candidates):
+        graph = build_dependency_graph(data_dir, include_pending, index, stream, candidates)
+        return TaskQueue(candidates, graph)
+    return TaskQueue(candidates)
 
 
 def print_queue(queue: List[QueuedTask]) -> None:
@@ -157,6 +584,10 @@ def print_queue(queue: List[QueuedTask]) -> None:
         return
 
     print(f"\nNightshift Queue ({len(queue)} tasks)")
+    if any(item.estimate for item in queue):
+        cost = sum(item.estimated_cost_usd for item in queue)
+        minutes = sum(item.estimated_seconds for item in queue) / 60
+        print(f"Estimated: ${cost:.2f}, {minutes:.0f} min sequential")
     print("=" * 60)
 
     for i, item in enumerate(queue, 1):
@@ -164,21 +595,117 @@ def print_queue(queue: List[QueuedTask]) -> None:
         print(f"\n{i}. [{task.state}] {task.title}")
         print(f"   Tag: {task.ai_tag}")
         print(f"   Priority: {item.priority_score}")
+        if item.estimate:
+            est = item.estimate
+            print(f"   Estimate: ~{item.estimated_tokens} tokens "
+                  f"(${est.cost_usd.low:.2f}-${est.cost_usd.high:.2f}), "
+                  f"{est.seconds.expected / 60:.0f} min "
+                  f"({est.seconds.low / 60:.0f}-{est.seconds.high / 60:.0f}), "
+                  f"{est.samples} past runs")
         print(f"   Space: {task.space or 'unknown'}")
         print(f"   File: {task.file_path.name}:{task.line_number}")
 
 
+def print_waves(graph: DependencyGraph) -> None:
+    """Print dependency wavefronts and blocked tasks."""
+    waves = graph.wavefronts()
+    print(f"\nDependency waves ({len(waves)})")
+    print("=" * 60)
+    for n, wave in enumerate(waves, 1):
+        print(f"\nWave {n} ({len(wave)} independent tasks)")
+        for item in wave:
+            deps = [dep.task.id for dep in graph.prerequisites(item)]
+            after = f"  after {', '.join(deps)}" if deps else ""
+            print(f"  - [{item.priority_score}] {item.task.title} ({item.task.id}){after}")
+
+    blocked = graph.blocked()
+    if blocked:
+        print(f"\nBlocked ({len(blocked)})")
+        for item, reason in blocked:
+            print(f"  - {item.task.title} ({item.task.id}): {reason}")
+
+
+def print_plan(plan: Plan, start: datetime) -> None:
+    """Print a run plan with expected completion times."""
+    limits = []
+    if plan.budget_usd is not None:
+        limits.append(f"${plan.budget_usd:.2f} budget left")
+    if plan.deadline_seconds is not None:
+        limits.append(f"window until {start + timedelta(seconds=plan.deadline_seconds):%H:%M}")
+    print(f"\nNightshift Plan ({len(plan.tasks)} tasks"
+          + (f"; {', '.join(limits)}" if limits else "") + ")")
+    print(f"Expected: ${plan.total_cost_usd:.2f}, done by "
+          f"{start + timedelta(seconds=plan.total_seconds):%H:%M}, total priority "
+          f"{plan.total_priority:.2f}")
+    print("=" * 60)
+
+    for i, planned in enumerate(plan.tasks, 1):
+        task = planned.item.task
+        finish = start + timedelta(seconds=planned.finish_seconds)
+        finish_high = start + timedelta(seconds=planned.finish_high_seconds)
+        print(f"{i:>3}. {start + timedelta(seconds=planned.start_seconds):%H:%M}-{finish:%H:%M} "
+              f"(p90 {finish_high:%H:%M})  ${planned.cumulative_cost_usd:>6.2f}  "
+              f"[{planned.item.priority_score}] {task.title}")
+
+    if plan.deferred:
+        print(f"\nDeferred ({len(plan.deferred)})")
+        for item, reason in plan.deferred:
+            print(f"  - [{item.priority_score}] {item.task.title}: {reason}")
+
+
+def _plan_for_cli(data_dir: Path, queue: List[QueuedTask], budget: Optional[float],
+                  window_minutes: Optional[float], conservative: bool) -> Plan:
+    """Plan with the configured budget/run window unless overridden."""
+    from spend_ledger import SpendLedger
+
+    settings = get_settings(data_dir)
+    if budget is None and settings.budget_daily_usd > 0:
+        budget = SpendLedger.for_data_dir(data_dir).remaining(settings.budget_daily_usd)
+    if window_minutes is not None:
+        deadline = window_minutes * 60
+    elif settings.run_timeout_seconds > 0:
+        deadline = settings.run_timeout_seconds - RUN_OVERHEAD_SECONDS
+    else:
+        deadline = None
+    return plan_queue(queue, budget, deadline, conservative=conservative)
+
+
 if __name__ == '__main__':
     if len(sys.argv) < 2:
-        print("Usage: python queue.py <data_dir> [--limit=N]")
+        print("Usage: python queue.py <data_dir> [--limit=N] [--stream] [--waves]\n"
+              "                       [--plan [--budget=USD] [--window=MIN] [--conservative]]")
         sys.exit(1)
 
     data_dir = Path(sys.argv[1])
     limit = None
+    stream = None
+    waves = False
+    plan = False
+    budget = None
+    window = None
+    conservative = False
 
     for arg in sys.argv[2:]:
         if arg.startswith('--limit='):
             limit = int(arg.split('=')[1])
-
-    queue = build_queue(data_dir, limit=limit)
-    print_queue(queue)
+        elif arg == '--stream':
+            stream = True
+        elif arg == '--waves':
+            waves = True
+        elif arg == '--plan':
+            plan = True
+        elif arg.startswith('--budget='):
+            budget = float(arg.split('=')[1])
+        elif arg.startswith('--window='):
+            window = float(arg.split('=')[1])
+        elif arg == '--conservative':
+            conservative = True
+
+    if waves:
+        print_waves(build_dependency_graph(data_dir, stream=bool(stream)))
+    elif plan:
+        queue = build_queue(data_dir, limit=limit, stream=stream)
+        print_plan(_plan_for_cli(data_dir, queue, budget, window, conservative), datetime.now())
+    else:
+        queue = build_queue(data_dir, limit=limit, stream=stream)
+        print_queue(queue)
@@ -15,14 +15,15 @@ Usage:
 import re
 import sys
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from collections import defaultdict
 
 import yaml
 
 # Add parent to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
-from nightshift_parser import OrgTask, find_ai_tasks, write_org_file
+from nightshift_parser import OrgTask, write_org_file
+from task_index import TaskIndex
 
 
 def _load_routing_config() -> dict:
@@ -255,7 +256,8 @@ def route_tasks(
     data_dir: Path,
     dry_run: bool = False,
     skip_inbox: bool = True,
-    skip_habits: bool = True
+    skip_habits: bool = True,
+    index: Optional[TaskIndex] = None,
 ) -> Tuple[int, Dict[str, int]]:
     """Route :AI: tasks to nightshift.org queue.
 
@@ -264,12 +266,15 @@ def route_tasks(
         dry_run: If True, only print what would be done
         skip_inbox: Skip tasks from inbox.org files
         skip_habits: Skip tasks from habits.org files
+        index: Pre-built TaskIndex to query instead of scanning data_dir
 
     Returns:
         (total_queued, counts_by_space)
     """
     # Find all AI tasks
-    all_tasks = find_ai_tasks(data_dir, states=['TODO', 'NEXT'])
+    if index is None:
+        index = TaskIndex.build(data_dir)
+    all_tasks = index.query(states=['TODO', 'NEXT'])
 
     # Filter
     tasks = []
@@ -6,15 +6,22 @@ Orchestrates the full pipeline: queue -> claim -> execute -> evaluate -> output.
 
 import sys
 import argparse
-import json
+import signal
 import time
-from datetime import datetime, timezone
+from collections import deque
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
 from nightshift_parser import OrgTask, find_ai_tasks
-from queue import build_queue, QueuedTask, load_config
-from claim import claim_task, complete_task, git_pull, git_commit_push
+from queue import build_queue, QueuedTask, TaskQueue, FairTaskQueue, queue_sort_key
+from nightshift_settings import get_settings
+from dependencies import DependencyGraph
+from estimator import record_features
+from spend_ledger import Reservation, SpendLedger
+from planner import RUN_OVERHEAD_SECONDS, plan_queue
+from claim import (CommitCoalescer, claim_batch, claim_snapshot, complete_task, ensure_state_gitignore,
+                   git_pull, git_commit_push, release_claims)
+from discovery import record_files, state_dir
 from execute import execute_task, execute_command, ExecutionResult
 from evaluate import evaluate_output, EvaluationResult
 from output import write_output, generate_exec_id
@@ -106,39 +113,37 @@ def analyze_failure(task: OrgTask, error: str) -> dict:
 
 # ---- Budget enforcement (DIP-0011 5.2) ----
 
-# Cost estimate: tokens / 1000 * price per 1k tokens (same as metrics.py)
-_COST_PER_1K_TOKENS = 0.015
-
-
 def _get_budget_limit(data_dir: Path) -> float:
     """Read budget_daily_usd from settings. Returns 0 for unlimited."""
-    config = load_config(data_dir)
-    return float(config.get('nightshift', {}).get('budget_daily_usd', 0))
+    return get_settings(data_dir).budget_daily_usd
 
 
 def _get_today_spend(data_dir: Path) -> float:
-    """Sum estimated cost from today's execution records in state/nightshift/."""
-    state_dir = data_dir / '.datacore' / 'state' / 'nightshift'
-    if not state_dir.exists():
-        return 0.0
+    """Today's estimated spend from the running ledger (spend_ledger)."""
+    return SpendLedger.for_data_dir(data_dir).spent()
 
-    today_prefix = datetime.now(timezone.utc).strftime('%Y%m%d')
-    total = 0.0
 
-    for f in state_dir.glob(f'{today_prefix}-*.json'):
-        try:
-            data = json.loads(f.read_text())
-            tokens = data.get('tokens_used', 0)
-            total += (tokens / 1000) * _COST_PER_1K_TOKENS
-        except (json.JSONDecodeError, OSError):
-            continue
+def _record_execution(data_dir: Path, reservation: Optional[Reservation] = None,
+                      commits: Optional[CommitCoalescer] = None, **fields) -> None:
+    """record_execution, plus the execution's entry in today's spend ledger.
 
-    return total
+    The ledger entry settles the task's budget reservation, if any. With
+    commits, the record files written go out with its next commit.
+    """
+    before = record_files(data_dir) if commits is not None else None
+    record_execution(data_dir=data_dir, **fields)
+    if commits is not None:
+        commits.track(state_dir(data_dir) / name for name in record_files(data_dir) - before)
+    SpendLedger.for_data_dir(data_dir).record(
+        fields['exec_id'], fields['space'], fields['ai_tag'],
+        fields.get('tokens_used', 0), fields.get('status', ''), reservation)
 
 
 def check_budget(data_dir: Path) -> tuple:
     """Check if daily budget allows another task.
 
+    Budget reserved by tasks still running counts as used.
+
     Returns:
         (allowed: bool, spent: float, limit: float)
         If limit is 0, budget is unlimited and allowed is always True.
@@ -148,7 +153,120 @@ def check_budget(data_dir: Path) -> tuple:
         return (True, 0.0, 0.0)
 
     spent = _get_today_spend(data_dir)
-    return (spent < limit, spent, limit)
+    reserved = SpendLedger.for_data_dir(data_dir).reserved()
+    return (spent + reserved < limit, spent, limit)
+
+
+def reserve_budget(data_dir: Path, queued_task: QueuedTask) -> tuple:
+    """Hold a task's estimated cost against the daily budget before it starts.
+
+    The task is admitted only if spent + reserved + its estimate (p90 when
+    history provides one) fits budget_daily_usd, and its space's quota
+    (space_quotas) if one is set. Recording the execution settles the
+    reservation to actual usage.
+
+    Returns:
+        (reservation, None) if admitted (reservation is None when the
+        budget is unlimited), or (None, skip reason).
+    """
+    settings = get_settings(data_dir)
+    task = queued_task.task
+    space = task.space or '0-personal'
+    limit = settings.budget_daily_usd
+    space_limit = settings.space_budgets_usd.get(space, 0.0)
+    if limit <= 0 and space_limit <= 0:
+        return (None, None)
+
+    estimate = queued_task.estimate
+    cost = estimate.cost_usd.high if estimate is not None else queued_task.estimated_cost_usd
+    ledger = SpendLedger.for_data_dir(data_dir)
+    reservation = ledger.reserve(
+        cost, limit,
+        space=space,
+        ai_tag=task.ai_tag or ':AI:',
+        ttl_seconds=settings.run_timeout_seconds if settings.run_timeout_seconds > 0 else 3600.0,
+        space_limit_usd=space_limit,
+    )
+    if reservation is not None:
+        return (reservation, None)
+    if limit > 0 and ledger.remaining(limit) < cost:
+        return (None, f"Daily budget: ${ledger.spent():.2f} spent + ${ledger.reserved():.2f} "
+                      f"reserved + ~${cost:.2f} estimated exceeds ${limit:.2f}")
+    return (None, f"Space quota for {space}: ${ledger.spent(space):.2f} spent + "
+                  f"${ledger.reserved(space):.2f} reserved + ~${cost:.2f} estimated "
+                  f"exceeds ${space_limit:.2f}")
+
+
+def _claim_window(data_dir: Path, task_queue, size: int, skipped: List[Dict[str, Any]],
+                  commits: CommitCoalescer) -> List[tuple]:
+    """Take up to size tasks off the queue, reserve their budget, and claim them together.
+
+    One commit+push claims the whole window (claim_batch); changes pending
+    in commits are committed first and go out with that push. Tasks over
+    budget are recorded as skipped; tasks that could not be claimed are
+    dropped and their reservations released.
+
+    Returns:
+        (queued_task, reservation, claim_snapshot from before the claim) for
+        each claimed task, in run order
+    """
+    window = []
+    while task_queue and len(window) < size:
+        queued_task = task_queue.pop_next()
+        task = queued_task.task
+
+        # Budget gate: hold the estimated cost until the execution is recorded
+        reservation, reason = reserve_budget(data_dir, queued_task)
+        if reason:
+            print(f"\n  - SKIP {task.title}: {reason}")
+            skipped.append({'title': task.title, 'space': task.space, 'reason': reason})
+            _record_execution(data_dir=data_dir, task_title=task.title, space=task.space or '0-personal', ai_tag=task.ai_tag or ':AI:', status='skipped', score=0.0, duration_seconds=0, tokens_used=0, exec_id=generate_exec_id(), error=reason, commits=commits)
+            continue
+        window.append((queued_task, reservation))
+
+    if not window:
+        return []
+    print(f"\n  - Claiming {len(window)} task(s)...")
+    commits.commit()
+    snapshots = [claim_snapshot(item.task) for item, _ in window]
+    claimed = {id(task) for task in claim_batch([item.task for item, _ in window], data_dir)}
+    result = []
+    for (queued_task, reservation), snapshot in zip(window, snapshots):
+        if id(queued_task.task) in claimed:
+            result.append((queued_task, reservation, snapshot))
+        else:
+            print(f"  - SKIP {queued_task.task.title}: Could not claim (conflict or error)")
+            SpendLedger.for_data_dir(data_dir).release(reservation)
+    return result
+
+
+def _release_unstarted(data_dir: Path, claimed, commits: CommitCoalescer) -> None:
+    """Give back claimed tasks that never ran: restore their state, release
+    their reservations, and queue the change in commits."""
+    leftovers = list(claimed)
+    claimed.clear()
+    print(f"\n  - Releasing {len(leftovers)} claimed task(s) that did not run...")
+    files = release_claims([(item.task, snapshot) for item, _, snapshot in leftovers])
+    ledger = SpendLedger.for_data_dir(data_dir)
+    for _, reservation, _ in leftovers:
+        ledger.release(reservation)
+    ids = ', '.join(item.task.id for item, _, _ in leftovers)
+    commits.add(f"nightshift: release {len(leftovers)} unstarted tasks\n\n{ids}", files)
+
+
+def _space_spend(data_dir: Path, spaces) -> Dict[str, Dict[str, float]]:
+    """Per-space spend for summaries: this run, today so far, and the daily quota (0 = none)."""
+    settings = get_settings(data_dir)
+    ledger = SpendLedger.for_data_dir(data_dir)
+    names = set(spaces) | set(ledger.process_spend) | set(settings.space_budgets_usd)
+    return {
+        space: {
+            'run': ledger.process_spend.get(space, 0.0),
+            'today': ledger.spent(space),
+            'quota': settings.space_budgets_usd.get(space, 0.0),
+        }
+        for space in sorted(names)
+    }
 
 
 def run_command_mode(data_dir: Path, command: str) -> bool:
@@ -203,8 +321,7 @@ def run_task_mode(
     start_time = time.time()
 
     # Load config
-    config = load_config(data_dir)
-    max_retries = config.get('nightshift', {}).get('max_retries', 2)
+    max_retries = get_settings(data_dir).max_retries
 
     # Initialize hook executor
     hook_executor = None
@@ -229,6 +346,29 @@ def run_task_mode(
         print("No :AI: tasks in queue. Nothing to do.")
         return {'completed': [], 'failed': [], 'review': [], 'duration': 0, 'tokens': 0}
 
+    # Fit the queue to the remaining budget and run window
+    settings = get_settings(data_dir)
+    if settings.plan_runs and not test_mode:
+        budget_limit = settings.budget_daily_usd
+        # Without execution history every task gets the default duration, so
+        # the window is only planned against once estimates come from records
+        use_window = settings.run_timeout_seconds > 0 and any(
+            item.estimate is not None and item.estimate.samples > 0 for item in queue)
+        window = settings.run_timeout_seconds - (time.time() - start_time) - RUN_OVERHEAD_SECONDS
+        plan = plan_queue(
+            queue,
+            budget_usd=SpendLedger.for_data_dir(data_dir).remaining(budget_limit) if budget_limit > 0 else None,
+            deadline_seconds=max(0.0, window) if use_window else None,
+        )
+        if use_window:
+            # Planning time comes out of the window too
+            plan.trim_to(settings.run_timeout_seconds - (time.time() - start_time) - RUN_OVERHEAD_SECONDS)
+        if plan.deferred:
+            print(f"Planned {len(plan.tasks)} of {len(queue)} tasks "
+                  f"(~${plan.total_cost_usd:.2f}, ~{plan.total_seconds / 60:.0f} min); "
+                  f"{len(plan.deferred)} deferred to a later run")
+            queue = plan.queue()
+
     print(f"Found {len(queue)} tasks to process")
     for i, item in enumerate(queue[:5], 1):  # Show first 5
         print(f"  {i}. [{item.task.state}] {item.task.title} (priority: {item.priority_score})")
@@ -238,7 +378,9 @@ def run_task_mode(
     # Budget status
     budget_allowed, budget_spent, budget_limit = check_budget(data_dir)
     if budget_limit > 0:
-        print(f"\n  Budget: ${budget_spent:.2f} / ${budget_limit:.2f} USD today")
+        budget_reserved = SpendLedger.for_data_dir(data_dir).reserved()
+        reserved_note = f" (+${budget_reserved:.2f} reserved by running tasks)" if budget_reserved else ""
+        print(f"\n  Budget: ${budget_spent:.2f} / ${budget_limit:.2f} USD today{reserved_note}")
         if not budget_allowed:
             print("  Budget exhausted -- skipping all tasks")
 
@@ -249,71 +391,89 @@ def run_task_mode(
     skipped = []
     total_tokens = 0
 
-    for i, queued_task in enumerate(queue):
-        task = queued_task.task
-        print(f"\n[3/7] Processing task {i+1}/{len(queue)}: {task.title}")
-
-        # Budget gate
-        budget_allowed, budget_spent, budget_limit = check_budget(data_dir)
-        if not budget_allowed:
-            reason = f"Daily budget exhausted (${budget_spent:.2f} / ${budget_limit:.2f})"
-            print(f"  - SKIP: {reason}")
-            skipped.append({'title': task.title, 'space': task.space, 'reason': reason})
-            record_execution(data_dir=data_dir, task_title=task.title, space=task.space or '0-personal', ai_tag=task.ai_tag or ':AI:', status='skipped', score=0.0, duration_seconds=0, tokens_used=0, exec_id=generate_exec_id(), error=reason)
-            continue
-
-        # Claim task
-        print("  - Claiming task...")
-        if not claim_task(task, data_dir):
-            print("  - SKIP: Could not claim (conflict or error)")
-            continue
-
-        # Generate execution ID
-        exec_id = generate_exec_id()
-        print(f"  - Execution ID: {exec_id}")
-
-        # Pre-execution hooks
-        hook_context = ""
-        if hook_executor:
-            try:
-                agent_id = task.ai_tag.strip(':').replace('AI:', '') if task.ai_tag else 'ai-task-executor'
-                should_continue, hook_context = hook_executor.execute_pre_hooks(agent_id, task.title)
-                if not should_continue:
-                    print(f"  - SKIP: Pre-hook aborted execution")
-                    record_execution(data_dir=data_dir, task_title=task.title, space=task.space or '0-personal', ai_tag=task.ai_tag or ':AI:', status='skipped', score=0.0, duration_seconds=0, tokens_used=0, exec_id=exec_id, error=f"Pre-hook abort: {hook_context}")
-                    continue
-            except Exception as e:
-                print(f"  - WARNING: Pre-hook error (continuing): {e}")
-
-        # Execute task
-        print("  - Executing task...")
-        exec_result = execute_task(task, data_dir)
-
-        if not exec_result.success:
-            print(f"  - FAILED: {exec_result.error}")
-
-            # Failure analysis hook — classify and determine retry eligibility
-            failure_info = analyze_failure(task, exec_result.error)
-            print(f"  - Failure analysis: {failure_info['category']} — {failure_info['root_cause']}")
-
-            # Error hooks
+    # Pull tasks best-first so priorities changed mid-run can be re-ranked.
+    # build_queue already dropped tasks blocked outside the queue; within it,
+    # a task is released only once its prerequisites complete successfully.
+    # With fair_share, spaces take weighted turns instead of one global order.
+    graph = DependencyGraph(queue, key=queue_sort_key)
+    if settings.fair_share:
+        task_queue = FairTaskQueue(queue, graph, settings.space_weights)
+    else:
+        task_queue = TaskQueue(queue, graph)
+    # Completions are committed in batches; claims still push synchronously.
+    # Caches and the spend ledger stay machine-local.
+    ensure_state_gitignore(data_dir)
+    commits = CommitCoalescer(data_dir, settings.commit_every_tasks, settings.commit_every_seconds)
+    position = 0
+    claimed = deque()  # (queued_task, reservation, claim_snapshot) claimed ahead, in run order
+    try:
+        while task_queue or claimed:
+            if not claimed:
+                claimed.extend(_claim_window(data_dir, task_queue, settings.claim_window, skipped, commits))
+                continue
+            queued_task, reservation, _ = claimed.popleft()
+            position += 1
+            task = queued_task.task
+            print(f"\n[3/7] Processing task {position}/{len(queue)}: {task.title}")
+
+            # Generate execution ID
+            exec_id = generate_exec_id()
+            print(f"  - Execution ID: {exec_id}")
+            record_features(data_dir, exec_id, task)
+
+            # Pre-execution hooks
+            hook_context = ""
             if hook_executor:
                 try:
                     agent_id = task.ai_tag.strip(':').replace('AI:', '') if task.ai_tag else 'ai-task-executor'
-                    hook_executor.execute_error_hooks(agent_id, Exception(exec_result.error))
+                    should_continue, hook_context = hook_executor.execute_pre_hooks(agent_id, task.title)
+                    if not should_continue:
+                        print(f"  - SKIP: Pre-hook aborted execution")
+                        _record_execution(data_dir=data_dir, task_title=task.title, space=task.space or '0-personal', ai_tag=task.ai_tag or ':AI:', status='skipped', score=0.0, duration_seconds=0, tokens_used=0, exec_id=exec_id, error=f"Pre-hook abort: {hook_context}", reservation=reservation, commits=commits)
+                        continue
                 except Exception as e:
-                    print(f"  - WARNING: Error hook failed: {e}")
-
-            if failure_info['retryable'] and int(task.properties.get('NIGHTSHIFT_RETRIES', '0')) < max_retries:
-                print(f"  - Retrying (transient failure)...")
-                retry_count = int(task.properties.get('NIGHTSHIFT_RETRIES', '0')) + 1
-                task.properties['NIGHTSHIFT_RETRIES'] = str(retry_count)
-                exec_result = execute_task(task, data_dir)
-                if exec_result.success:
-                    print(f"  - Retry succeeded!")
-                    # Fall through to evaluation below
+                    print(f"  - WARNING: Pre-hook error (continuing): {e}")
+
+            # Execute task
+            print("  - Executing task...")
+            exec_result = execute_task(task, data_dir)
+
+            if not exec_result.success:
+                print(f"  - FAILED: {exec_result.error}")
+
+                # Failure analysis hook — classify and determine retry eligibility
+                failure_info = analyze_failure(task, exec_result.error)
+                print(f"  - Failure analysis: {failure_info['category']} — {failure_info['root_cause']}")
+
+                # Error hooks
+                if hook_executor:
+                    try:
+                        agent_id = task.ai_tag.strip(':').replace('AI:', '') if task.ai_tag else 'ai-task-executor'
+                        hook_executor.execute_error_hooks(agent_id, Exception(exec_result.error))
+                    except Exception as e:
+                        print(f"  - WARNING: Error hook failed: {e}")
+
+                if failure_info['retryable'] and int(task.properties.get('NIGHTSHIFT_RETRIES', '0')) < max_retries:
+                    print(f"  - Retrying (transient failure)...")
+                    retry_count = int(task.properties.get('NIGHTSHIFT_RETRIES', '0')) + 1
+                    task.properties['NIGHTSHIFT_RETRIES'] = str(retry_count)
+                    exec_result = execute_task(task, data_dir)
+                    if exec_result.success:
+                        print(f"  - Retry succeeded!")
+                        # Fall through to evaluation below
+                    else:
+                        print(f"  - Retry also failed: {exec_result.error}")
+                        complete_task(task, data_dir, 'failed', 0.0, '')
+                        failed.append({
+                            'title': task.title,
+                            'space': task.space,
+                            'error': exec_result.error,
+                            'failure_analysis': failure_info,
+                        })
+                        _record_execution(data_dir=data_dir, task_title=task.title, space=task.space or '0-personal', ai_tag=task.ai_tag or ':AI:', status='failed', score=0.0, duration_seconds=exec_result.duration_seconds, tokens_used=exec_result.tokens_used, exec_id=exec_id, error=exec_result.error, failure_analysis=failure_info, reservation=reservation, commits=commits)
+                        commits.add(f"nightshift: fail {task.id}", [task.file_path])
+                        continue
                 else:
-                    print(f"  - Retry also failed: {exec_result.error}")
                     complete_task(task, data_dir, 'failed', 0.0, '')
                     failed.append({
                         'title': task.title,
@@ -321,91 +481,96 @@ def run_task_mode(
                         'error': exec_result.error,
                         'failure_analysis': failure_info,
                     })
-                    record_execution(data_dir=data_dir, task_title=task.title, space=task.space or '0-personal', ai_tag=task.ai_tag or ':AI:', status='failed', score=0.0, duration_seconds=exec_result.duration_seconds, tokens_used=exec_result.tokens_used, exec_id=exec_id, error=exec_result.error, failure_analysis=failure_info)
-                    git_commit_push(data_dir, f"nightshift: fail {task.id}")
+                    _record_execution(data_dir=data_dir, task_title=task.title, space=task.space or '0-personal', ai_tag=task.ai_tag or ':AI:', status='failed', score=0.0, duration_seconds=exec_result.duration_seconds, tokens_used=exec_result.tokens_used, exec_id=exec_id, error=exec_result.error, failure_analysis=failure_info, reservation=reservation, commits=commits)
+                    commits.add(f"nightshift: fail {task.id}", [task.file_path])
                     continue
-            else:
+
+            print(f"  - Execution complete ({exec_result.duration_seconds:.1f}s, ~{exec_result.tokens_used} tokens)")
+            total_tokens += exec_result.tokens_used
+
+            # Evaluate output
+            print("  - Evaluating output...")
+            eval_result = evaluate_output(task, exec_result.output, data_dir)
+            print(f"  - Consensus: {eval_result.consensus:.2f} -> {eval_result.decision}")
+
+            # Write output to 0-inbox
+            print("  - Writing output...")
+            output_path, write_success = write_output(
+                task=task,
+                output=exec_result.output,
+                evaluation=eval_result,
+                exec_id=exec_id,
+                data_dir=data_dir,
+                duration_seconds=exec_result.duration_seconds,
+                tokens_used=exec_result.tokens_used
+            )
+
+            if not write_success:
+                print(f"  - FAILED: Could not write output to {output_path}")
                 complete_task(task, data_dir, 'failed', 0.0, '')
                 failed.append({
                     'title': task.title,
                     'space': task.space,
-                    'error': exec_result.error,
-                    'failure_analysis': failure_info,
+                    'error': f'Output write failed: {output_path}'
                 })
-                record_execution(data_dir=data_dir, task_title=task.title, space=task.space or '0-personal', ai_tag=task.ai_tag or ':AI:', status='failed', score=0.0, duration_seconds=exec_result.duration_seconds, tokens_used=exec_result.tokens_used, exec_id=exec_id, error=exec_result.error, failure_analysis=failure_info)
-                git_commit_push(data_dir, f"nightshift: fail {task.id}")
+                _record_execution(data_dir=data_dir, task_title=task.title, space=task.space or '0-personal', ai_tag=task.ai_tag or ':AI:', status='failed', score=eval_result.consensus, duration_seconds=exec_result.duration_seconds, tokens_used=exec_result.tokens_used, exec_id=exec_id, error=f'Output write failed: {output_path}', reservation=reservation, commits=commits)
+                commits.add(f"nightshift: write-fail {task.id}", [task.file_path, output_path])
                 continue
 
-        print(f"  - Execution complete ({exec_result.duration_seconds:.1f}s, ~{exec_result.tokens_used} tokens)")
-        total_tokens += exec_result.tokens_used
-
-        # Evaluate output
-        print("  - Evaluating output...")
-        eval_result = evaluate_output(task, exec_result.output, data_dir)
-        print(f"  - Consensus: {eval_result.consensus:.2f} -> {eval_result.decision}")
-
-        # Write output to 0-inbox
-        print("  - Writing output...")
-        output_path, write_success = write_output(
-            task=task,
-            output=exec_result.output,
-            evaluation=eval_result,
-            exec_id=exec_id,
-            data_dir=data_dir,
-            duration_seconds=exec_result.duration_seconds,
-            tokens_used=exec_result.tokens_used
-        )
+            # Update task state
+            print("  - Completing task...")
+            complete_task(
+                task=task,
+                data_dir=data_dir,
+                status=eval_result.decision,
+                score=eval_result.consensus,
+                output_path=str(output_path)
+            )
 
-        if not write_success:
-            print(f"  - FAILED: Could not write output to {output_path}")
-            complete_task(task, data_dir, 'failed', 0.0, '')
-            failed.append({
+            # Commit (pushed with the next batch or claim)
+            commits.add(f"nightshift: complete {task.id}", [task.file_path, output_path])
+
+            # Categorize result
+            task_result = {
                 'title': task.title,
                 'space': task.space,
-                'error': f'Output write failed: {output_path}'
-            })
-            git_commit_push(data_dir, f"nightshift: write-fail {task.id}")
-            continue
-
-        # Update task state
-        print("  - Completing task...")
-        complete_task(
-            task=task,
-            data_dir=data_dir,
-            status=eval_result.decision,
-            score=eval_result.consensus,
-            output_path=str(output_path)
-        )
-
-        # Commit and push
-        git_commit_push(data_dir, f"nightshift: complete {task.id}")
-
-        # Categorize result
-        task_result = {
-            'title': task.title,
-            'space': task.space,
-            'score': eval_result.consensus,
-            'status': eval_result.decision,
-            'output_path': str(output_path)
-        }
-
-        if eval_result.decision in ['approved', 'approved_with_notes']:
-            completed.append(task_result)
-        else:
-            review.append(task_result)
-
-        # Post-execution hooks
-        if hook_executor:
-            try:
-                agent_id = task.ai_tag.strip(':').replace('AI:', '') if task.ai_tag else 'ai-task-executor'
-                hook_executor.execute_post_hooks(agent_id, {'output': exec_result.output, 'score': eval_result.consensus, 'decision': eval_result.decision, 'duration': exec_result.duration_seconds, 'tokens': exec_result.tokens_used, 'task_title': task.title, 'space': task.space or '0-personal'})
-            except Exception as e:
-                print(f"  - WARNING: Post-hook error: {e}")
+                'score': eval_result.consensus,
+                'status': eval_result.decision,
+                'output_path': str(output_path)
+            }
 
-        # Record execution for analytics
-        record_execution(data_dir=data_dir, task_title=task.title, space=task.space or '0-personal', ai_tag=task.ai_tag or ':AI:', status=eval_result.decision, score=eval_result.consensus, duration_seconds=exec_result.duration_seconds, tokens_used=exec_result.tokens_used, exec_id=exec_id)
+            if eval_result.decision in ['approved', 'approved_with_notes']:
+                completed.append(task_result)
+                task_queue.complete(queued_task)
+            else:
+                review.append(task_result)
 
-        print(f"  - Done!")
+            # Post-execution hooks
+            if hook_executor:
+                try:
+                    agent_id = task.ai_tag.strip(':').replace('AI:', '') if task.ai_tag else 'ai-task-executor'
+                    hook_executor.execute_post_hooks(agent_id, {'output': exec_result.output, 'score': eval_result.consensus, 'decision': eval_result.decision, 'duration': exec_result.duration_seconds, 'tokens': exec_result.tokens_used, 'task_title': task.title, 'space': task.space or '0-personal'})
+                except Exception as e:
+                    print(f"  - WARNING: Post-hook error: {e}")
+
+            # Record execution for analytics
+            _record_execution(data_dir=data_dir, task_title=task.title, space=task.space or '0-personal', ai_tag=task.ai_tag or ':AI:', status=eval_result.decision, score=eval_result.consensus, duration_seconds=exec_result.duration_seconds, tokens_used=exec_result.tokens_used, exec_id=exec_id, reservation=reservation, commits=commits)
+
+            print(f"  - Done!")
+    except BaseException:
+        # Killed (SIGTERM exits via SystemExit), timed out or crashed mid-loop:
+        # hand back tasks claimed but never started, and push what is pending
+        # so other executors can take them
+        if claimed:
+            _release_unstarted(data_dir, claimed, commits)
+        commits.flush()
+        raise
+
+    for queued_task in task_queue.held():
+        task = queued_task.task
+        reason = "Prerequisite did not complete in this run"
+        print(f"\n  - SKIP {task.title}: {reason}")
+        skipped.append({'title': task.title, 'space': task.space, 'reason': reason})
 
     # Write summary report and journal entries
     total_duration = time.time() - start_time
@@ -417,24 +582,28 @@ def run_task_mode(
         space = task.get('space') or '0-personal'
         spaces_with_tasks.add(space)
 
+    space_spend = _space_spend(data_dir, spaces_with_tasks)
+    written = []
+
     for space in spaces_with_tasks:
         space_completed = [t for t in completed if (t.get('space') or '0-personal') == space]
         space_review = [t for t in review if (t.get('space') or '0-personal') == space]
         space_failed = [t for t in failed if (t.get('space') or '0-personal') == space]
 
         if space_completed or space_review or space_failed:
-            write_summary_file(
+            written.append(write_summary_file(
                 data_dir=data_dir,
                 space=space,
                 completed_tasks=space_completed,
                 failed_tasks=space_failed,
                 review_tasks=space_review,
                 total_duration=total_duration,
-                total_tokens=total_tokens
-            )
+                total_tokens=total_tokens,
+                space_spend={space: space_spend[space]},
+            ))
 
     # Write journal entries (existing behavior)
-    write_nightshift_summary(
+    written += write_nightshift_summary(
         data_dir=data_dir,
         completed_tasks=completed,
         failed_tasks=failed,
@@ -445,7 +614,9 @@ def run_task_mode(
 
     # Final push
     print("\n[7/7] Final commit and push...")
-    git_commit_push(data_dir, "nightshift: batch-end")
+    # Whole tree once per run: also picks up files the executor edited
+    commits.add("nightshift: batch-end", written)
+    commits.flush(all_files=True)
 
     # Summary
     print(f"\n{'=' * 50}")
@@ -455,9 +626,15 @@ def run_task_mode(
     print(f"For Review: {len(review)}")
     print(f"Failed: {len(failed)}")
     if skipped:
-        print(f"Skipped (budget): {len(skipped)}")
+        print(f"Skipped: {len(skipped)}")
     print(f"Duration: {total_duration:.1f}s")
     print(f"Tokens: ~{total_tokens}")
+    spent_spaces = {space: row for space, row in space_spend.items() if row['run'] or row['today']}
+    if spent_spaces:
+        print("Spend by space (this run / today):")
+        for space, row in spent_spaces.items():
+            quota = f" of ${row['quota']:.2f}" if row['quota'] else ""
+            print(f"  {space}: ${row['run']:.2f} / ${row['today']:.2f}{quota}")
 
     return {
         'completed': completed,
@@ -465,7 +642,8 @@ def run_task_mode(
         'review': review,
         'skipped': skipped,
         'duration': total_duration,
-        'tokens': total_tokens
+        'tokens': total_tokens,
+        'space_spend': space_spend,
     }
 
 
@@ -479,6 +657,10 @@ def main():
 
     args = parser.parse_args()
 
+    # systemd stops the run with SIGTERM: raise SystemExit so run_task_mode
+    # releases unstarted claims and pushes pending commits
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
     if not args.data_dir.exists():
         print(f"ERROR: Data directory does not exist: {args.data_dir}")
         sys.exit(1)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Batch priority scoring for what-if re-ranking.
+
+queue.calculate_priority scores one task at a time and stays the reference.
+PriorityBatch reads IMPACT/URGENCY/EFFORT/INTENT_SCORE, state and AI tag
+for a whole backlog once, then scores and ranks it under many weight
+configurations (component weights, tag boosts, intent overrides) at once:
+
+    batch = PriorityBatch.from_tasks(tasks)
+    configs = [PriorityWeights(), PriorityWeights(urgency=0.4, impact=0.2)]
+    scores = batch.scores(configs)          # one row per config
+    top = batch.rank(configs, top_k=20)     # task indices, best first
+
+Scores equal calculate_priority exactly, including its rounding to two
+decimals, and rankings break ties like queue_sort_key. NumPy is used when
+installed (one vectorized pass per config set); otherwise a pure-Python
+loop computes the same results.
+"""
+
+import heapq
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # Optional: pure-Python fallback below
+    np = None
+
+from queue import AI_TAG_BOOST, PRIORITY_WEIGHTS
+
+
+@dataclass(frozen=True)
+class PriorityWeights:
+    """One scoring configuration. Defaults reproduce calculate_priority.
+
+    intent_scores overrides INTENT_SCORE by task ID (what-if strategy changes).
+    """
+    impact: float = PRIORITY_WEIGHTS['impact']
+    urgency: float = PRIORITY_WEIGHTS['urgency']
+    readiness: float = PRIORITY_WEIGHTS['readiness']
+    effort: float = PRIORITY_WEIGHTS['effort']
+    intent: float = PRIORITY_WEIGHTS['intent']
+    tag_boost: Mapping[str, float] = field(default_factory=lambda: dict(AI_TAG_BOOST))
+    default_boost: float = 1.0  # Tags missing from tag_boost
+    intent_scores: Optional[Mapping[str, float]] = None
+
+
+def _number(value, convert, default):
+    """Property value parsed like calculate_priority does."""
+    if value is None:
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        return default
+
+
+class PriorityBatch:
+    """Scoring inputs for a fixed list of tasks, stored column-wise."""
+
+    def __init__(self, tasks: Sequence):
+        self.tasks = list(tasks)
+        self.ids: List[str] = [t.id for t in self.tasks]
+        self.impact = [_number(t.get_property('IMPACT'), int, 5) for t in self.tasks]
+        self.urgency = [_number(t.get_property('URGENCY'), int, 5) for t in self.tasks]
+        # Inverted: lower effort = higher priority
+        self.effort = [10 - _number(t.get_property('EFFORT'), int, 5) for t in self.tasks]
+        self.intent = [_number(t.get_property('INTENT_SCORE'), float, 5) for t in self.tasks]
+        self.readiness = [10 if t.state == 'NEXT' else 5 for t in self.tasks]
+        self.tags: List[str] = []
+        tag_codes: Dict[str, int] = {}
+        self.tag_codes = []
+        for t in self.tasks:
+            tag = t.ai_tag or ':AI:'
+            if tag not in tag_codes:
+                tag_codes[tag] = len(self.tags)
+                self.tags.append(tag)
+            self.tag_codes.append(tag_codes[tag])
+        # queue_sort_key tie-break: QUEUED before pending, then input order
+        self.tie_order = sorted(range(len(self.tasks)),
+                                key=lambda i: self.tasks[i].state != 'QUEUED')
+        self._arrays = None
+
+    @classmethod
+    def from_tasks(cls, tasks: Iterable) -> 'PriorityBatch':
+        return cls(list(tasks))
+
+    @classmethod
+    def from_queue(cls, queue: Iterable) -> 'PriorityBatch':
+        """From QueuedTasks (build_queue output)."""
+        return cls([item.task for item in queue])
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    # ---- Scoring ----
+
+    def scores(self, configs: Sequence[PriorityWeights]):
+        """Scores per config: a (configs x tasks) array with NumPy, else a list of lists."""
+        if np is not None:
+            return self._scores_numpy(configs)
+        return [self._scores_python(config) for config in configs]
+
+    def rank(self, configs: Sequence[PriorityWeights], top_k: Optional[int] = None):
+        """Task indices per config, best first (top_k of them if given)."""
+        return self._rank(self.scores(configs), top_k)
+
+    def ranked_tasks(self, config: PriorityWeights, top_k: Optional[int] = None) -> List:
+        """(task, score) best first for a single config."""
+        scores = self.scores([config])
+        return [(self.tasks[i], float(scores[0][i])) for i in self._rank(scores, top_k)[0]]
+
+    def _rank(self, scores, top_k: Optional[int]):
+        if np is not None:
+            return self._rank_numpy(scores, top_k)
+        return [self._rank_python(row, top_k) for row in scores]
+
+    def _intents(self, config: PriorityWeights) -> List[float]:
+        if not config.intent_scores:
+            return self.intent
+        overrides = config.intent_scores
+        return [overrides.get(task_id, intent) for task_id, intent in zip(self.ids, self.intent)]
+
+    def _boosts(self, config: PriorityWeights) -> List[float]:
+        return [config.tag_boost.get(tag, config.default_boost) for tag in self.tags]
+
+    def _scores_python(self, config: PriorityWeights) -> List[float]:
+        boosts = self._boosts(config)
+        w_i, w_u, w_r, w_e, w_n = (config.impact, config.urgency, config.readiness,
+                                   config.effort, config.intent)
+        return [
+            round((i * w_i + u * w_u + r * w_r + e * w_e + n * w_n) * boosts[code], 2)
+            for i, u, r, e, n, code in zip(self.impact, self.urgency, self.readiness,
+                                           self.effort, self._intents(config), self.tag_codes)
+        ]
+
+    def _rank_python(self, row: List[float], top_k: Optional[int]) -> List[int]:
+        key = row.__getitem__
+        if top_k is not None:
+            return heapq.nlargest(top_k, self.tie_order, key=key)
+        return sorted(self.tie_order, key=key, reverse=True)
+
+    # ---- NumPy path ----
+
+    def _columns(self):
+        if self._arrays is None:
+            self._arrays = {
+                'impact': np.asarray(self.impact, dtype=np.float64),
+                'urgency': np.asarray(self.urgency, dtype=np.float64),
+                'readiness': np.asarray(self.readiness, dtype=np.float64),
+                'effort': np.asarray(self.effort, dtype=np.float64),
+                'intent': np.asarray(self.intent, dtype=np.float64),
+                'tag_codes': np.asarray(self.tag_codes, dtype=np.intp),
+                'tie_order': np.asarray(self.tie_order, dtype=np.intp),
+            }
+        return self._arrays
+
+    def _scores_numpy(self, configs: Sequence[PriorityWeights]):
+        cols = self._columns()
+        n = len(self.tasks)
+        if not configs or not n:
+            return np.zeros((len(configs), n))
+
+        def weight(name):
+            return np.array([getattr(c, name) for c in configs], dtype=np.float64)[:, None]
+
+        if any(c.intent_scores for c in configs):
+            intent = np.array([self._intents(c) for c in configs], dtype=np.float64)
+        else:
+            intent = cols['intent']
+        boosts = np.array([self._boosts(c) for c in configs], dtype=np.float64)
+
+        # Same operation order as calculate_priority, so results are bit-identical
+        raw = (cols['impact'] * weight('impact')
+               + cols['urgency'] * weight('urgency')
+               + cols['readiness'] * weight('readiness')
+               + cols['effort'] * weight('effort')
+               + intent * weight('intent')) * boosts[:, cols['tag_codes']]
+        return _round2(raw)
+
+    def _rank_numpy(self, scores, top_k: Optional[int]):
+        # Columns in tie-break order, so a stable sort on score alone matches queue_sort_key
+        tie_order = self._columns()['tie_order']
+        ordered = -scores[:, tie_order]
+        if top_k is not None and top_k < ordered.shape[1]:
+            # Keep every task scoring at least the k-th best so ties resolve correctly
+            kth = np.partition(ordered, top_k - 1, axis=1)[:, top_k - 1:top_k]
+            rows = []
+            for row, cutoff in zip(ordered, kth):
+                candidates = np.flatnonzero(row <= cutoff[0])
+                best = candidates[np.argsort(row[candidates], kind='stable')[:top_k]]
+                rows.append(tie_order[best])
+            return np.array(rows, dtype=np.intp).reshape(len(rows), top_k)
+        return tie_order[np.argsort(ordered, axis=1, kind='stable')][:, :top_k]
+
+
+def _round2(values):
+    """round(x, 2) elementwise, matching Python's correctly rounded result.
+
+    np.round scales by 100 first, which can land exactly on a half and round
+    differently from Python; those near-half cases are redone with round().
+    """
+    scaled = values * 100
+    rounded = np.round(scaled) / 100
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(v, 2) for v in values[near_half].tolist()]
+    return rounded
+
+
+def _parse_config(args: List[str]) -> PriorityWeights:
+    """PriorityWeights from CLI args: impact=0.5 urgency=0.2 :AI:code:=1.3 ..."""
+    weights = {}
+    boosts = dict(AI_TAG_BOOST)
+    for arg in args:
+        name, _, value = arg.rpartition('=')
+        if name.startswith(':AI'):
+            boosts[name] = float(value)
+        else:
+            weights[name] = float(value)
+    return PriorityWeights(tag_boost=boosts, **weights)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("Usage: python scoring.py <data_dir> <name=value>... [--top=N]")
+        print("  names: impact urgency readiness effort intent, or an AI tag (:AI:code:=1.3)")
+        sys.exit(1)
+
+    from queue import build_queue
+
+    data_dir = Path(sys.argv[1])
+    top = 20
+    assignments = []
+    for arg in sys.argv[2:]:
+        if arg.startswith('--top='):
+            top = int(arg.split('=')[1])
+        else:
+            assignments.append(arg)
+
+    batch = PriorityBatch.from_queue(build_queue(data_dir, estimate=False))
+    configs = [PriorityWeights(), _parse_config(assignments)]
+    scores = batch.scores(configs)
+    current, what_if = batch._rank(scores, None)
+    current_rank = {int(i): r for r, i in enumerate(current, 1)}
+
+    print(f"\nWhat-if ranking ({len(batch)} tasks, {'numpy' if np is not None else 'python'})")
+    print("=" * 60)
+    for r, i in enumerate(what_if[:top], 1):
+        i = int(i)
+        before = current_rank[i]
+        move = f"{before - r:+d}" if before != r else "="
+        print(f"{r:>3}. [{float(scores[1][i]):.2f} was {float(scores[0][i]):.2f}] ({move:>4}) "
+              f"{batch.tasks[i].title}")
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Append-only daily spend ledger for the nightshift budget.
+
+Each execution's estimated cost is appended as one JSON line to
+.datacore/state/nightshift/spend-YYYYMMDD.jsonl (UTC day, like the execution
+records). SpendLedger keeps the day's running total and its breakdown by
+space and :AI: tag in memory, so check_budget no longer re-reads every
+execution record before each task:
+
+- record() appends a line and updates the totals.
+- Reads stat the ledger file and parse only lines appended since the last
+  read (e.g. by another process).
+- Execution records the ledger has not seen yet (pulled from other
+  executors by git_pull) are folded in when the state directory changes,
+  so the daily cap still covers every machine. Spend lines are counted
+  once per exec_id.
+- The ledger is rebuilt from the day's execution records only when it is
+  missing or corrupt (unparseable line, or the file shrank).
+
+The ledger itself is machine-local (see claim.ensure_state_gitignore);
+execution records are what executors share.
+
+A run that crosses midnight UTC moves on to the new day's ledger.
+
+Reservations keep concurrent or long runs under a hard cap: reserve() holds
+a task's estimated cost before it starts and admits the task only if
+spent + reserved + estimate fits the limit (and its space's quota, counting
+only that space); the spend line written when it
+finishes settles the reservation. Reservations are ledger lines too, so
+other processes see them, and reserve() runs under a lock file. A
+reservation left open by a crashed run lapses after its ttl.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX: reservations are only atomic within a process
+    fcntl = None
+
+from estimator import COST_PER_1K_TOKENS
+
+
+LEDGER_PREFIX = 'spend-'
+LOCK_FILENAME = 'spend.lock'
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime('%Y%m%d')
+
+
+def token_cost(tokens: int) -> float:
+    """Estimated USD cost of a token count."""
+    return (tokens / 1000) * COST_PER_1K_TOKENS
+
+
+class _Corrupt(Exception):
+    pass
+
+
+@dataclass
+class Reservation:
+    """Budget held for a task until its spend is recorded."""
+    id: str
+    cost_usd: float
+    space: str
+    ai_tag: str
+    expires: float  # Unix time
+
+
+class SpendLedger:
+    """Running spend for one UTC day, backed by its ledger file."""
+
+    _instances: Dict[Path, 'SpendLedger'] = {}
+
+    def __init__(self, data_dir: Path, day: Optional[str] = None):
+        from discovery import state_dir
+
+        self.state_dir = state_dir(data_dir)
+        self.rebuilds = 0
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._mine: Dict[str, Reservation] = {}  # Open reservations made by this process
+        self.process_spend: Dict[str, float] = {}  # Spend recorded by this process, by space
+        self._follow_today = day is None
+        self._open(day or _today())
+
+    @classmethod
+    def for_data_dir(cls, data_dir: Path) -> 'SpendLedger':
+        """Process-wide ledger for today, switching files when the UTC day changes."""
+        key = Path(data_dir).resolve()
+        ledger = cls._instances.get(key)
+        if ledger is None:
+            ledger = cls._instances[key] = cls(data_dir)
+        return ledger
+
+    def _open(self, day: str) -> None:
+        self.day = day
+        self.path = self.state_dir / f'{LEDGER_PREFIX}{day}.jsonl'
+        self._load()
+
+    def _reset(self) -> None:
+        self.total_usd = 0.0
+        self.total_tokens = 0
+        self.entries = 0
+        self.by_space: Dict[str, float] = {}
+        self.by_tag: Dict[str, float] = {}
+        self._reserved: Dict[str, Tuple[float, float, str]] = {}  # id -> (cost, expires, space)
+        self._offset: Optional[int] = 0  # None: file could not be rewritten
+        self._exec_ids: Set[str] = set()  # Executions already counted
+        self._records_seen: Set[str] = set()  # Execution record file names checked
+        self._dir_mtime: Optional[int] = None
+
+    # ---- Reading ----
+
+    def _add(self, entry: dict) -> None:
+        if 'reserve' in entry:
+            self._reserved[entry['reserve']] = (
+                float(entry['cost_usd']), float(entry['expires']), entry.get('space') or 'unknown')
+            return
+        if 'release' in entry:
+            self._reserved.pop(entry['release'], None)
+            return
+        cost = float(entry['cost_usd'])
+        if entry.get('settles'):
+            self._reserved.pop(entry['settles'], None)
+        exec_id = entry.get('exec_id')
+        if exec_id:
+            if exec_id in self._exec_ids:
+                return  # Also folded in from its execution record
+            self._exec_ids.add(exec_id)
+        self.total_usd += cost
+        self.total_tokens += int(entry.get('tokens', 0))
+        self.entries += 1
+        space = entry.get('space') or 'unknown'
+        tag = entry.get('ai_tag') or ':AI:'
+        self.by_space[space] = self.by_space.get(space, 0.0) + cost
+        self.by_tag[tag] = self.by_tag.get(tag, 0.0) + cost
+
+    def _read_from(self, offset: int, final: bool) -> None:
+        """Apply complete lines after offset. A trailing partial line is corrupt if final."""
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if final and end < len(data):
+            raise _Corrupt()
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._add(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                raise _Corrupt()
+        self._offset = offset + end
+
+    def _load(self) -> None:
+        self._reset()
+        try:
+            self._read_from(0, final=True)
+        except (_Corrupt, OSError):
+            self.rebuild()
+            return
+        self._fold_records()
+
+    def _sync(self) -> None:
+        """Pick up lines appended by other processes and records pulled from other executors.
+
+        Rebuilds if the file was lost or rewritten.
+        """
+        if self._follow_today and self.day != _today():
+            self._open(_today())
+            return
+        if self._offset is None:
+            return
+        if self._read_new():
+            self._fold_records()
+
+    def _read_new(self) -> bool:
+        """Apply lines appended since the last read. False if the ledger was reloaded instead."""
+        try:
+            size = os.stat(self.path).st_size
+        except OSError:
+            size = None
+        if size == self._offset:
+            return True
+        if size is None or size < self._offset:
+            self._load()
+            return False
+        try:
+            self._read_from(self._offset, final=False)
+        except (_Corrupt, OSError):
+            self._load()
+            return False
+        return True
+
+    def _fold_records(self) -> None:
+        """Append spend for the day's execution records not counted yet.
+
+        Only runs when the state directory changed (new record files change
+        its mtime); each record file is read once per process.
+        """
+        try:
+            mtime = os.stat(self.state_dir).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._dir_mtime:
+            return
+        self._dir_mtime = mtime
+        try:
+            names = sorted(n for n in os.listdir(self.state_dir)
+                           if _is_record(n, self.day) and n not in self._records_seen)
+        except OSError:
+            return
+        entries = []
+        for name in names:
+            self._records_seen.add(name)
+            entry = _record_entry(self.state_dir / name)
+            if entry is not None and entry['exec_id'] not in self._exec_ids:
+                entries.append(entry)
+        if not entries:
+            return
+        with self._locked():
+            if self._offset is not None and not self._read_new():
+                return  # Reloaded, which folds in every record
+            for entry in entries:
+                if entry['exec_id'] not in self._exec_ids:
+                    self._append(entry)
+
+    def spent(self, space: Optional[str] = None) -> float:
+        """Today's spend in USD, overall or for one space."""
+        self._sync()
+        if space is not None:
+            return self.by_space.get(space, 0.0)
+        return self.total_usd
+
+    def reserved(self, space: Optional[str] = None) -> float:
+        """USD held by open, unexpired reservations (this and other processes)."""
+        self._sync()
+        now = time.time()
+        return sum(cost for cost, expires, held_by in self._reserved.values()
+                   if expires > now and (space is None or held_by == space))
+
+    def remaining(self, limit_usd: float, space: Optional[str] = None) -> float:
+        """Budget left under limit_usd after spend and open reservations (of space if given)."""
+        return limit_usd - self.spent(space) - self.reserved(space)
+
+    def breakdown(self) -> Dict[str, Dict[str, float]]:
+        """Today's spend by space and by :AI: tag."""
+        self._sync()
+        return {'space': dict(self.by_space), 'ai_tag': dict(self.by_tag)}
+
+    # ---- Writing ----
+
+    @contextmanager
+    def _locked(self):
+        """Serialize ledger writes across threads and (with fcntl) processes. Reentrant."""
+        with self._lock:
+            lock_file = None
+            self._lock_depth += 1
+            if fcntl is not None and self._lock_depth == 1:
+                try:
+                    self.state_dir.mkdir(parents=True, exist_ok=True)
+                    lock_file = open(self.state_dir / LOCK_FILENAME, 'a')
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                except OSError:
+                    lock_file = None
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if lock_file is not None:
+                    lock_file.close()  # Releases the flock
+
+    def _append(self, entry: dict) -> None:
+        """Write one ledger line (caller holds the lock and has synced)."""
+        line = (json.dumps(entry) + '\n').encode('utf-8')
+        if self._offset is not None:
+            try:
+                with open(self.path, 'ab') as f:
+                    f.write(line)
+                self._offset += len(line)
+            except OSError:
+                self._offset = None
+        self._add(entry)
+
+    def record(self, exec_id: str, space: str, ai_tag: str, tokens_used: int,
+               status: str = '', reservation: Optional[Reservation] = None) -> None:
+        """Append an execution's spend, settling its reservation if given.
+
+        Best effort: the in-memory totals update even if the write fails.
+        """
+        entry = {
+            'exec_id': exec_id,
+            'space': space,
+            'ai_tag': ai_tag,
+            'tokens': int(tokens_used or 0),
+            'cost_usd': round(token_cost(tokens_used or 0), 6),
+            'status': status,
+        }
+        if reservation is not None:
+            entry['settles'] = reservation.id
+            self._mine.pop(reservation.id, None)
+        self.process_spend[space] = self.process_spend.get(space, 0.0) + entry['cost_usd']
+        with self._locked():
+            self._sync()
+            self._append(entry)
+
+    def reserve(self, cost_usd: float, limit_usd: float, space: str = '',
+                ai_tag: str = '', ttl_seconds: float = 3600.0,
+                space_limit_usd: float = 0.0) -> Optional[Reservation]:
+        """Hold cost_usd if spent + reserved + cost_usd fits limit_usd (<= 0: unlimited).
+
+        space_limit_usd applies the same check to the space's own spend and
+        reservations. Returns None when either does not fit.
+        """
+        with self._locked():
+            self._sync()
+            if limit_usd > 0 and self.remaining(limit_usd) < cost_usd:
+                return None
+            if space_limit_usd > 0 and self.remaining(space_limit_usd, space) < cost_usd:
+                return None
+            reservation = Reservation(
+                id=uuid.uuid4().hex[:12],
+                cost_usd=round(cost_usd, 6),
+                space=space,
+                ai_tag=ai_tag,
+                expires=time.time() + ttl_seconds,
+            )
+            self._append(_reservation_entry(reservation))
+            self._mine[reservation.id] = reservation
+            return reservation
+
+    def release(self, reservation: Optional[Reservation]) -> None:
+        """Drop a reservation whose task never ran (no-op if already settled)."""
+        if reservation is None or self._mine.pop(reservation.id, None) is None:
+            return
+        with self._locked():
+            self._sync()
+            self._append({'release': reservation.id})
+
+    def rebuild(self) -> None:
+        """Recompute the day's ledger from its execution records and rewrite the file."""
+        with self._locked():
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self.rebuilds += 1
+        self._reset()
+        lines = []
+        try:
+            self._dir_mtime = os.stat(self.state_dir).st_mtime_ns
+            names = sorted(n for n in os.listdir(self.state_dir) if _is_record(n, self.day))
+        except OSError:
+            names = []
+        for name in names:
+            self._records_seen.add(name)
+            entry = _record_entry(self.state_dir / name)
+            if entry is None or entry['exec_id'] in self._exec_ids:
+                continue
+            self._add(entry)
+            lines.append(json.dumps(entry) + '\n')
+        # Records carry no reservations; keep this process's open ones
+        for reservation in self._mine.values():
+            entry = _reservation_entry(reservation)
+            self._add(entry)
+            lines.append(json.dumps(entry) + '\n')
+
+        # Written even when empty, so a day without spend is not rebuilt again
+        data = ''.join(lines).encode('utf-8')
+        tmp = self.path.with_suffix('.jsonl.tmp')
+        try:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+            self._offset = len(data)
+        except OSError:
+            # Keep the in-memory totals for this process
+            self._offset = None
+
+
+def _is_record(name: str, day: str) -> bool:
+    return name.startswith(f'{day}-') and name.endswith('.json')
+
+
+def _record_entry(path: Path) -> Optional[dict]:
+    """Ledger spend line for an execution record file (None if unreadable)."""
+    try:
+        data = json.loads(path.read_text())
+    except (ValueError, OSError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    tokens = data.get('tokens_used') or 0
+    try:
+        tokens = int(tokens)
+    except (TypeError, ValueError):
+        return None
+    return {
+        'exec_id': data.get('exec_id') or path.name[:-5],
+        'space': data.get('space') or 'unknown',
+        'ai_tag': data.get('ai_tag') or ':AI:',
+        'tokens': tokens,
+        'cost_usd': round(token_cost(tokens), 6),
+        'status': data.get('status', ''),
+    }
+
+
+def _reservation_entry(reservation: Reservation) -> dict:
+    return {
+        'reserve': reservation.id,
+        'cost_usd': reservation.cost_usd,
+        'expires': round(reservation.expires, 1),
+        'space': reservation.space,
+        'ai_tag': reservation.ai_tag,
+    }
+
+
+def today_spend(data_dir: Path) -> float:
+    """Today's estimated spend in USD (O(1) after the first call in a process)."""
+    return SpendLedger.for_data_dir(data_dir).spent()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python spend_ledger.py <data_dir> [--rebuild]")
+        sys.exit(1)
+
+    ledger = SpendLedger.for_data_dir(Path(sys.argv[1]))
+    if '--rebuild' in sys.argv[2:]:
+        ledger.rebuild()
+    breakdown = ledger.breakdown()
+    print(f"\nSpend {ledger.day[:4]}-{ledger.day[4:6]}-{ledger.day[6:]} (UTC): "
+          f"${ledger.total_usd:.2f}, {ledger.entries} executions, ~{ledger.total_tokens} tokens")
+    reserved = ledger.reserved()
+    if reserved:
+        print(f"Reserved for running tasks: ${reserved:.2f}")
+    for title, key in (('By space', 'space'), ('By AI tag', 'ai_tag')):
+        print(f"\n{title}")
+        for name, cost in sorted(breakdown[key].items(), key=lambda kv: -kv[1]):
+            print(f"  {name:<24} ${cost:.2f}")
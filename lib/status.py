@@ -8,7 +8,8 @@ import sys
 from pathlib import Path
 from datetime import datetime
 
-from nightshift_parser import find_ai_tasks
+from discovery import DiscoveryStats
+from task_index import TaskIndex
 
 
 def show_status(data_dir: Path) -> None:
@@ -20,11 +21,13 @@ def show_status(data_dir: Path) -> None:
     print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print()
 
-    # Find all :AI: tasks in various states
-    queued = find_ai_tasks(data_dir, states=['TODO', 'NEXT'])
-    working = find_ai_tasks(data_dir, states=['WORKING'])
-    review = find_ai_tasks(data_dir, states=['REVIEW'])
-    done_recent = find_ai_tasks(data_dir, states=['DONE'])
+    # Find all :AI: tasks in one scan, then query by state
+    discovery_stats = DiscoveryStats()
+    index = TaskIndex.build(data_dir, stats=discovery_stats)
+    queued = index.query(states=['TODO', 'NEXT'])
+    working = index.query(states=['WORKING'])
+    review = index.query(states=['REVIEW'])
+    done_recent = index.query(states=['DONE'])
 
     # Filter done to only those with NIGHTSHIFT_COMPLETED in last 24h
     # (simplified - just show all for now)
@@ -75,6 +78,10 @@ def show_status(data_dir: Path) -> None:
         print(f"  - {f.name} ({mtime})")
     print()
 
+    print(f"## Discovery")
+    print(discovery_stats.summary())
+    print()
+
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
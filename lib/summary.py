@@ -13,7 +13,8 @@ def generate_summary(
     failed_tasks: List[Dict[str, Any]],
     review_tasks: List[Dict[str, Any]],
     total_duration: float,
-    total_tokens: int
+    total_tokens: int,
+    space_spend: Optional[Dict[str, Dict[str, float]]] = None
 ) -> str:
     """
     Generate a summary report of nightshift execution.
@@ -24,6 +25,7 @@ def generate_summary(
         review_tasks: List of tasks needing review
         total_duration: Total execution time in seconds
         total_tokens: Estimated total tokens used
+        space_spend: Per-space spend {space: {run, today, quota}} in USD
 
     Returns:
         Markdown content for the summary report
@@ -77,6 +79,17 @@ def generate_summary(
     content_parts.append(f'| Est. Cost | ~${est_cost:.2f} |')
     content_parts.append('')
 
+    # Spend per space against its daily quota
+    if space_spend:
+        content_parts.append('## Spend by Space')
+        content_parts.append('')
+        content_parts.append('| Space | This Run | Today | Quota |')
+        content_parts.append('|-------|----------|-------|-------|')
+        for space, spend in sorted(space_spend.items()):
+            quota = f"${spend['quota']:.2f}" if spend.get('quota') else '-'
+            content_parts.append(f"| {space} | ~${spend.get('run', 0.0):.2f} | ~${spend.get('today', 0.0):.2f} | {quota} |")
+        content_parts.append('')
+
     # Group tasks by space
     all_tasks = []
     for task in completed_tasks:
@@ -231,7 +244,8 @@ def write_summary_file(
     failed_tasks: List[Dict[str, Any]],
     review_tasks: List[Dict[str, Any]],
     total_duration: float,
-    total_tokens: int
+    total_tokens: int,
+    space_spend: Optional[Dict[str, Dict[str, float]]] = None
 ) -> Path:
     """
     Write summary file to space's 0-inbox directory.
@@ -256,7 +270,8 @@ def write_summary_file(
         failed_tasks=failed_tasks,
         review_tasks=review_tasks,
         total_duration=total_duration,
-        total_tokens=total_tokens
+        total_tokens=total_tokens,
+        space_spend=space_spend
     )
 
     output_path.write_text(content, encoding='utf-8')
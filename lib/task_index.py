@@ -0,0 +1,369 @@
+"""
+In-memory index of :AI: tasks for nightshift.
+
+Built from a single discovery pass and grouped by state, :AI: tag, space and
+file, so a command that needs several views of the queue (status, queue
+building, routing) walks and parses the data directory once.
+
+Incremental builds record the git HEAD of the data repo (and any nested
+repos) and on the next build re-check only the paths git reports as
+changed, untracked or ignored, instead of walking the whole tree.
+"""
+
+import json
+import os
+import subprocess
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from nightshift_parser import OrgTask, PARSER_VERSION
+from discovery import (
+    PARALLEL_PARSE_THRESHOLD,
+    DiscoveryStats,
+    ParseCache,
+    WalkFilter,
+    discover_ai_tasks,
+    iter_org_files,
+    load_ai_tasks,
+    state_dir,
+    walk_order_key,
+)
+
+
+INDEX_STATE_FILENAME = 'task-index.json'
+
+
+class TaskIndex:
+    """:AI: tasks in every state, grouped for cheap queries.
+
+    Queries return the indexed OrgTask objects themselves (not copies), in
+    discovery order (file walk order, then line order within a file).
+    """
+
+    def __init__(self, tasks: Iterable[OrgTask]):
+        self.tasks: List[OrgTask] = list(tasks)
+        self._position: Dict[int, int] = {}
+        self._by_state: Dict[str, List[OrgTask]] = defaultdict(list)
+        self._by_ai_tag: Dict[str, List[OrgTask]] = defaultdict(list)
+        self._by_space: Dict[Optional[str], List[OrgTask]] = defaultdict(list)
+        self._by_file: Dict[Path, List[OrgTask]] = defaultdict(list)
+
+        for pos, task in enumerate(self.tasks):
+            self._position[id(task)] = pos
+            self._by_state[task.state].append(task)
+            self._by_ai_tag[task.ai_tag or ':AI:'].append(task)
+            self._by_space[task.space].append(task)
+            self._by_file[task.file_path].append(task)
+
+    @classmethod
+    def build(
+        cls,
+        data_dir: Path,
+        spaces: Optional[List[str]] = None,
+        exclude_spaces: Optional[List[str]] = None,
+        ignore_globs: Optional[List[str]] = None,
+        use_cache: bool = True,
+        parallel_threshold: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        stats: Optional[DiscoveryStats] = None,
+        incremental: bool = False,
+    ) -> 'TaskIndex':
+        """Scan data_dir once (see nightshift_parser.find_ai_tasks for arguments).
+
+        With incremental=True (requires use_cache) the build re-checks only
+        files git reports as changed since the last incremental build, and
+        falls back to a full walk whenever that cannot be determined.
+        """
+        if incremental and use_cache:
+            return cls(_discover_incremental(
+                data_dir, WalkFilter(spaces, exclude_spaces, ignore_globs),
+                parallel_threshold, max_workers, stats,
+            ))
+        return cls(discover_ai_tasks(
+            data_dir, spaces, exclude_spaces, ignore_globs,
+            use_cache, parallel_threshold, max_workers, stats,
+        ))
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def __iter__(self) -> Iterator[OrgTask]:
+        return iter(self.tasks)
+
+    # ---- Group accessors ----
+
+    def states(self) -> List[str]:
+        return [s for s, tasks in self._by_state.items() if tasks]
+
+    def spaces(self) -> List[Optional[str]]:
+        return [s for s, tasks in self._by_space.items() if tasks]
+
+    def files(self) -> List[Path]:
+        return [f for f, tasks in self._by_file.items() if tasks]
+
+    def in_file(self, file_path: Path) -> List[OrgTask]:
+        return list(self._by_file.get(file_path, ()))
+
+    # ---- Queries ----
+
+    def _merge(self, groups: List[List[OrgTask]]) -> List[OrgTask]:
+        """Union of groups, restored to discovery order."""
+        if len(groups) == 1:
+            return list(groups[0])
+        merged = [task for group in groups for task in group]
+        merged.sort(key=lambda t: self._position[id(t)])
+        return merged
+
+    def query(
+        self,
+        states: Optional[List[str]] = None,
+        ai_tags: Optional[List[str]] = None,
+        spaces: Optional[List[str]] = None,
+        file_name: Optional[str] = None,
+        exclude_file_name: Optional[str] = None,
+    ) -> List[OrgTask]:
+        """Tasks matching every given filter, in discovery order.
+
+        states/ai_tags/spaces match any listed value (ai_tags as
+        ':AI:research:', untagged subtypes as ':AI:'). file_name and
+        exclude_file_name are substring tests on the file name.
+        """
+        # Start from the narrowest grouped filter, then test the rest per task
+        candidates = None
+        if states is not None:
+            candidates = self._merge([self._by_state.get(s, []) for s in states])
+        elif ai_tags is not None:
+            candidates = self._merge([self._by_ai_tag.get(t, []) for t in ai_tags])
+        elif spaces is not None:
+            candidates = self._merge([self._by_space.get(s, []) for s in spaces])
+        else:
+            candidates = self.tasks
+
+        results = []
+        for task in candidates:
+            if ai_tags is not None and (task.ai_tag or ':AI:') not in ai_tags:
+                continue
+            if spaces is not None and task.space not in spaces:
+                continue
+            if file_name is not None and file_name not in task.file_path.name:
+                continue
+            if exclude_file_name is not None and exclude_file_name in task.file_path.name:
+                continue
+            results.append(task)
+        return results
+
+    def count_by_state(self) -> Dict[str, int]:
+        return {state: len(tasks) for state, tasks in self._by_state.items() if tasks}
+
+
+# ---------------------------------------------------------------------------
+# Git-diff-driven incremental discovery
+# ---------------------------------------------------------------------------
+
+def _git(root: Path, *args: str) -> Optional[str]:
+    """Run a git command in root. Returns stdout, or None on any failure."""
+    try:
+        result = subprocess.run(
+            ['git', *args],
+            cwd=root,
+            capture_output=True,
+            text=True
+        )
+    except OSError:
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def _git_head(root: Path) -> Optional[str]:
+    out = _git(root, 'rev-parse', 'HEAD')
+    return out.strip() if out else None
+
+
+def _changed_paths(root: Path, old_head: str, new_head: str) -> Optional[List[str]]:
+    """Repo-relative paths that may differ from what was indexed at old_head.
+
+    Committed changes since old_head, uncommitted and untracked files, plus
+    ignored .org files (git never reports changes to those, so they are
+    always re-checked by mtime).
+    """
+    paths = []
+    if old_head != new_head:
+        diff = _git(root, 'diff', '--name-only', '-z', '--no-renames', old_head, new_head)
+        if diff is None:
+            return None  # old_head unknown (rewritten history, shallow clone)
+        paths.extend(diff.split('\0'))
+
+    status = _git(root, 'status', '--porcelain', '-z', '--no-renames', '--untracked-files=all')
+    if status is None:
+        return None
+    paths.extend(record[3:] for record in status.split('\0') if len(record) > 3)
+
+    ignored = _git(root, 'ls-files', '-z', '--others', '--ignored', '--exclude-standard', '--', '*.org')
+    if ignored is None:
+        return None
+    paths.extend(ignored.split('\0'))
+
+    return [p for p in paths if p]
+
+
+def _root_key(parts: tuple) -> str:
+    return '/'.join(parts)
+
+
+def _root_parts(key: str) -> tuple:
+    return tuple(key.split('/')) if key else ()
+
+
+class IndexState:
+    """Git HEADs and walk rules the incremental index was last built at."""
+
+    def __init__(self, data_dir: Path):
+        self.path = state_dir(data_dir) / INDEX_STATE_FILENAME
+        self.repos: Dict[str, str] = {}  # repo root relative to data_dir -> HEAD
+        self.walk_filter: Optional[list] = None
+        self.recheck: List[str] = []  # files not cached (racy mtime)
+
+    @classmethod
+    def load(cls, data_dir: Path) -> 'IndexState':
+        state = cls(data_dir)
+        try:
+            data = json.loads(state.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return state
+        if data.get('version') == PARSER_VERSION:
+            state.repos = data.get('repos') or {}
+            state.walk_filter = data.get('walk_filter')
+            state.recheck = data.get('recheck') or []
+        return state
+
+    def save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix('.tmp')
+            tmp.write_text(json.dumps({
+                'version': PARSER_VERSION,
+                'repos': self.repos,
+                'walk_filter': self.walk_filter,
+                'recheck': self.recheck,
+            }), encoding='utf-8')
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+def _owning_root(parts: tuple, roots: List[tuple]) -> tuple:
+    """Deepest repo root containing parts."""
+    best = ()
+    for root in roots:
+        if len(root) > len(best) and parts[:len(root)] == root:
+            best = root
+    return best
+
+
+def _incremental_plan(
+    data_dir: Path,
+    walk_filter: WalkFilter,
+    cache: ParseCache,
+    state: IndexState,
+) -> Optional[Tuple[List[Path], set, Dict[str, str]]]:
+    """Work out which files to load from git changes since the recorded HEADs.
+
+    Returns (files in walk order, files safe to serve from cache unchecked,
+    new HEADs), or None when a full walk is required.
+    """
+    if '' not in state.repos or state.walk_filter != walk_filter.signature():
+        return None
+    if not cache.entries:
+        return None  # Cache was reset; nothing to build on
+
+    roots = [_root_parts(key) for key in state.repos]
+    root_set = set(roots)
+    heads = {}
+    changed = set()
+    untracked_dirs = []
+
+    for key, old_head in state.repos.items():
+        root_parts = _root_parts(key)
+        root = data_dir.joinpath(*root_parts)
+        head = _git_head(root)
+        if head is None:
+            return None
+        paths = _changed_paths(root, old_head, head)
+        if paths is None:
+            return None
+        heads[key] = head
+
+        for path in paths:
+            parts = root_parts + tuple(p for p in path.split('/') if p)
+            if path.endswith('/'):
+                if parts not in root_set:
+                    untracked_dirs.append(parts)
+            elif path.endswith('.org') and _owning_root(parts, roots) == root_parts:
+                changed.add(parts)
+
+    changed.update(_root_parts(key) for key in state.recheck)
+
+    for dir_parts in untracked_dirs:
+        if not all(walk_filter.enter_dir(dir_parts[:n]) for n in range(1, len(dir_parts) + 1)):
+            continue
+        for org_file in iter_org_files(data_dir, walk_filter, start=dir_parts):
+            changed.add(tuple(org_file.relative_to(data_dir).parts))
+
+    selected = {}
+    for parts in changed:
+        org_file = data_dir.joinpath(*parts)
+        if org_file.is_file() and walk_filter.allows(parts):
+            selected[parts] = org_file
+        else:
+            cache.forget(org_file)
+
+    trusted = set()
+    for key in cache.ai_files():
+        parts = Path(key).parts
+        if parts in selected or parts in changed or not walk_filter.allows(parts):
+            continue
+        org_file = data_dir.joinpath(*parts)
+        selected[parts] = org_file
+        trusted.add(org_file)
+
+    files = [selected[parts] for parts in sorted(selected, key=walk_order_key)]
+    return files, trusted, heads
+
+
+def _discover_incremental(
+    data_dir: Path,
+    walk_filter: WalkFilter,
+    parallel_threshold: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    stats: Optional[DiscoveryStats] = None,
+) -> List[OrgTask]:
+    """discover_ai_tasks driven by git changes, recording state for next time."""
+    if parallel_threshold is None:
+        parallel_threshold = PARALLEL_PARSE_THRESHOLD
+
+    cache = ParseCache.for_data_dir(data_dir)
+    state = IndexState.load(data_dir)
+    plan = _incremental_plan(data_dir, walk_filter, cache, state)
+
+    if plan is None:
+        repo_roots: List[tuple] = []
+        files = list(iter_org_files(data_dir, walk_filter, repo_roots))
+        trusted = None
+        heads = {}
+        for root_parts in repo_roots:
+            head = _git_head(data_dir.joinpath(*root_parts))
+            if head is not None:
+                heads[_root_key(root_parts)] = head
+    else:
+        files, trusted, heads = plan
+
+    tasks = load_ai_tasks(files, cache, parallel_threshold, max_workers, stats, trusted)
+    cache.save(prune=plan is None and not walk_filter.include and not walk_filter.exclude)
+
+    state.repos = heads
+    state.walk_filter = walk_filter.signature()
+    state.recheck = [key for key in map(cache.key, files) if key not in cache.entries]
+    state.save()
+
+    return tasks
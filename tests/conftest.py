@@ -0,0 +1,30 @@
+"""Shared fixtures. The modules under test live in lib/ and import each other
+by bare name, as they do when run from there."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+LIB_DIR = Path(__file__).resolve().parent.parent / 'lib'
+sys.path.insert(0, str(LIB_DIR))
+
+
+def git(cwd: Path, *args: str) -> str:
+    return subprocess.run(['git', *args], cwd=cwd, check=True,
+                          capture_output=True, text=True).stdout
+
+
+@pytest.fixture
+def data_repo(tmp_path):
+    """A Data repository clone with a bare origin, ready to commit and push."""
+    remote = tmp_path / 'origin.git'
+    repo = tmp_path / 'data'
+    git(tmp_path, 'init', '-q', '--bare', str(remote))
+    git(tmp_path, 'clone', '-q', str(remote), str(repo))
+    git(repo, 'config', 'user.email', 'nightshift@example.com')
+    git(repo, 'config', 'user.name', 'nightshift')
+    git(repo, 'commit', '-q', '--allow-empty', '-m', 'init')
+    git(repo, 'push', '-q', '-u', 'origin', 'HEAD')
+    return repo
@@ -0,0 +1,109 @@
+"""claim_batch and release_claims on a Data repository with a bare origin."""
+
+import pytest
+
+import org_patch
+from claim import claim_batch, claim_snapshot, release_claims
+from conftest import git
+from nightshift_parser import parse_org_file
+
+NEXT_ACTIONS = """* QUEUED Draft pricing report :AI:research:
+:PROPERTIES:
+:ID: t1
+:END:
+Body one.
+* QUEUED Summarize interviews :AI:
+:PROPERTIES:
+:ID: t2
+:NIGHTSHIFT_STATUS: failed
+:NIGHTSHIFT_EXECUTOR: server:old
+:END:
+"""
+
+INBOX = """#+TITLE: Inbox
+
+* TODO Migrate onboarding :AI:pm:
+SCHEDULED: <2026-10-16 Fri>
+:PROPERTIES:
+:ID: t3
+:END:
+"""
+
+
+@pytest.fixture
+def org_files(data_repo):
+    files = {
+        data_repo / '0-personal' / 'org' / 'next_actions.org': NEXT_ACTIONS,
+        data_repo / '1-team' / 'org' / 'inbox.org': INBOX,
+    }
+    for path, text in files.items():
+        path.parent.mkdir(parents=True)
+        path.write_text(text)
+    git(data_repo, 'add', '.')
+    git(data_repo, 'commit', '-q', '-m', 'tasks')
+    git(data_repo, 'push', '-q')
+    return files
+
+
+def _tasks(files):
+    return [t for path in files for t in parse_org_file(path)]
+
+
+def _log(repo):
+    return git(repo, 'log', '--format=%s', '@{u}').splitlines()
+
+
+def test_claim_batch_is_one_pushed_commit(data_repo, org_files):
+    tasks = _tasks(org_files)
+    assert claim_batch(tasks, data_repo) == tasks
+    assert _log(data_repo)[0] == 'nightshift: claim 3 tasks'
+    assert git(data_repo, 'status', '--porcelain') == ''
+    for task in _tasks(org_files):
+        assert task.state == 'WORKING'
+        assert task.properties['NIGHTSHIFT_STATUS'] == 'executing'
+
+
+@pytest.mark.parametrize('byte_patch', [True, False])
+def test_release_restores_files_as_before_the_claim(data_repo, org_files, monkeypatch, byte_patch):
+    tasks = _tasks(org_files)
+    snapshots = [claim_snapshot(t) for t in tasks]
+    claim_batch(tasks, data_repo)
+    if not byte_patch:
+        monkeypatch.setattr(org_patch, 'patch_tasks', lambda *args: False)
+
+    edited = release_claims(zip(tasks, snapshots))
+    assert sorted(edited) == sorted(org_files)
+    for path, text in org_files.items():
+        assert path.read_text() == text
+    assert [(t.state, t.properties.get('NIGHTSHIFT_STATUS')) for t in tasks] == [
+        ('QUEUED', None), ('QUEUED', 'failed'), ('TODO', None)]
+
+
+def test_conflicting_batch_claims_per_task(data_repo, org_files, tmp_path):
+    other = tmp_path / 'other'
+    git(tmp_path, 'clone', '-q', str(tmp_path / 'origin.git'), str(other))
+    git(other, 'config', 'user.email', 'other@example.com')
+    git(other, 'config', 'user.name', 'other')
+    theirs = next(t for t in parse_org_file(other / '0-personal' / 'org' / 'next_actions.org')
+                  if t.id == 't1')
+    assert claim_batch([theirs], other) == [theirs]
+
+    tasks = _tasks(org_files)
+    claimed = claim_batch(tasks, data_repo)
+    assert [t.id for t in claimed] == ['t2', 't3']
+    assert _log(data_repo)[:3] == ['nightshift: claim t3', 'nightshift: claim t2', 'nightshift: claim t1']
+    assert git(data_repo, 'status', '--porcelain') == ''
+
+
+def test_gitignored_files_are_claimed_locally(data_repo, org_files):
+    (data_repo / '.gitignore').write_text('1-team/\n')
+    git(data_repo, 'rm', '-q', '--cached', '-r', '1-team')
+    git(data_repo, 'add', '.gitignore')
+    git(data_repo, 'commit', '-q', '-m', 'ignore 1-team')
+    git(data_repo, 'push', '-q')
+
+    tasks = _tasks(org_files)
+    assert claim_batch(tasks, data_repo) == tasks
+    assert _log(data_repo)[0] == 'nightshift: claim 2 tasks'
+    assert 'inbox.org' not in git(data_repo, 'show', '--stat', 'HEAD')
+    assert [t.state for t in _tasks(org_files)] == ['WORKING'] * 3
@@ -0,0 +1,148 @@
+"""org_patch byte patches: round trips, and refusals that leave the file alone."""
+
+import os
+
+import pytest
+
+import org_patch
+from nightshift_parser import NIGHTSHIFT_STATE_CONFIG, parse_org_file
+
+STATES = NIGHTSHIFT_STATE_CONFIG.all_states
+
+ORG = """#+TITLE: Tasks
+
+* QUEUED Draft pricing report :AI:research:
+SCHEDULED: <2026-10-16 Fri>
+:PROPERTIES:
+:ID: t1
+:CONTEXT: |
+  First line
+  Second line
+:END:
+Body one.
+** TODO Child without drawer
+* TODO Second task :AI:
+:PROPERTIES:
+:ID: t2
+:END:
+Body two.
+* Plain note
+:PROPERTIES:
+:ID: t3
+:END:
+"""
+
+TITLES = {'t1': 'Draft pricing report', 't2': 'Second task', 't3': 'Plain note'}
+
+
+@pytest.fixture
+def org_file(tmp_path):
+    path = tmp_path / 'tasks.org'
+    path.write_bytes(ORG.encode('utf-8'))
+    return path
+
+
+def _patch(path, edits, titles=None):
+    return org_patch.patch_tasks(path, edits, titles if titles is not None else TITLES, STATES)
+
+
+def _task(path, task_id):
+    return next(t for t in parse_org_file(path) if t.id == task_id)
+
+
+def test_state_and_property_edits(org_file):
+    context = _task(org_file, 't1').properties['CONTEXT']
+    assert _patch(org_file, {
+        't1': [('state', 'WORKING'), ('property', 'NIGHTSHIFT_STATUS', 'executing')],
+        't2': [('property', 'ID', 't2')],
+    })
+    text = org_file.read_text()
+    assert '* WORKING Draft pricing report :AI:research:\n' in text
+    assert ':NIGHTSHIFT_STATUS: executing\n:END:\nBody one.' in text
+    task = _task(org_file, 't1')
+    assert task.state == 'WORKING'
+    assert task.properties['CONTEXT'] == context
+    # Untouched tasks keep their bytes
+    assert text.split('* TODO Second task')[1] == ORG.split('* TODO Second task')[1]
+
+
+def test_replace_then_restore_is_byte_identical(org_file):
+    assert _patch(org_file, {'t1': [('state', 'WORKING'),
+                                    ('property', 'NIGHTSHIFT_STATUS', 'executing'),
+                                    ('property', 'CONTEXT', 'one line')]})
+    assert _task(org_file, 't1').properties['CONTEXT'] == 'one line'
+    assert _patch(org_file, {'t1': [('state', 'QUEUED'),
+                                    ('remove', 'NIGHTSHIFT_STATUS'),
+                                    ('remove', 'CONTEXT'),
+                                    ('remove', 'NOT_THERE')]})
+    assert 'CONTEXT' not in _task(org_file, 't1').properties
+    assert _patch(org_file, {'t2': [('remove', 'ID')]})
+    assert ':ID: t2' not in org_file.read_text()
+
+
+def test_claim_and_release_round_trip(org_file):
+    claim = [('state', 'WORKING'), ('property', 'NIGHTSHIFT_STATUS', 'executing'),
+             ('property', 'NIGHTSHIFT_EXECUTOR', 'host:me')]
+    release = [('state', 'QUEUED'), ('remove', 'NIGHTSHIFT_STATUS'),
+               ('remove', 'NIGHTSHIFT_EXECUTOR')]
+    assert _patch(org_file, {'t1': claim})
+    assert _patch(org_file, {'t1': release})
+    assert org_file.read_bytes() == ORG.encode('utf-8')
+
+
+def test_creates_drawer_after_planning_line(tmp_path):
+    path = tmp_path / 'tasks.org'
+    path.write_text("* TODO No drawer\nSCHEDULED: <2026-10-16 Fri>\n:PROPERTIES:\n:ID: a\n:END:\n")
+    assert org_patch.patch_tasks(path, {'a': [('property', 'X', '1')]}, {'a': 'No drawer'}, STATES)
+    assert path.read_text() == ("* TODO No drawer\nSCHEDULED: <2026-10-16 Fri>\n"
+                                ":PROPERTIES:\n:ID: a\n:X: 1\n:END:\n")
+
+
+def test_keeps_crlf_and_missing_final_newline(tmp_path):
+    path = tmp_path / 'tasks.org'
+    original = b"* TODO Windows task\r\n:PROPERTIES:\r\n:ID: w\r\n:END:"
+    path.write_bytes(original)
+    assert org_patch.patch_tasks(path, {'w': [('state', 'WORKING'), ('property', 'X', '1')]},
+                                 {'w': 'Windows task'}, STATES)
+    assert path.read_bytes() == b"* WORKING Windows task\r\n:PROPERTIES:\r\n:ID: w\r\n:X: 1\r\n:END:"
+    assert org_patch.patch_tasks(path, {'w': [('state', 'TODO'), ('remove', 'X')]},
+                                 {'w': 'Windows task'}, STATES)
+    assert path.read_bytes() == original
+
+
+def test_follows_external_edits(org_file):
+    assert _patch(org_file, {'t2': [('state', 'WORKING')]})
+    # Another writer shifts every offset after the index was built
+    org_file.write_text('#+FILETAGS: :x:\n\n' + org_file.read_text())
+    assert _patch(org_file, {'t2': [('state', 'DONE')]})
+    assert _task(org_file, 't2').state == 'DONE'
+    assert org_file.read_text().startswith('#+FILETAGS: :x:\n\n#+TITLE: Tasks')
+
+
+@pytest.mark.parametrize('edits, titles', [
+    ({'t1': [('state', 'WORKING')]}, {'t1': 'Draft'}),  # Title prefix only
+    ({'t1': [('state', 'WORKING')]}, {'t1': 'Draft pricing report extra'}),
+    ({'t3': [('state', 'WORKING')]}, TITLES),  # No state keyword
+    ({'t1': [('property', 'NOTE', 'two\nlines')]}, TITLES),
+    ({'missing': [('state', 'WORKING')]}, TITLES),
+    # One refused edit refuses the whole file
+    ({'t2': [('state', 'WORKING')], 't1': [('state', 'DONE')]}, {'t1': 'Other', 't2': 'Second task'}),
+])
+def test_refusals_leave_file_untouched(org_file, edits, titles):
+    before = os.stat(org_file).st_mtime_ns
+    assert not _patch(org_file, edits, titles)
+    assert org_file.read_bytes() == ORG.encode('utf-8')
+    assert os.stat(org_file).st_mtime_ns == before
+
+
+def test_refuses_duplicate_ids_and_unterminated_drawers(tmp_path):
+    path = tmp_path / 'tasks.org'
+    duplicate = "* TODO One\n:PROPERTIES:\n:ID: d\n:END:\n* TODO Two\n:PROPERTIES:\n:ID: d\n:END:\n"
+    path.write_text(duplicate)
+    assert not org_patch.patch_tasks(path, {'d': [('state', 'DONE')]}, {'d': 'One'}, STATES)
+    assert path.read_text() == duplicate
+
+    unterminated = "* TODO One\n:PROPERTIES:\n:ID: u\n* TODO Two\n"
+    path.write_text(unterminated)
+    assert not org_patch.patch_tasks(path, {'u': [('property', 'X', '1')]}, {'u': 'One'}, STATES)
+    assert path.read_text() == unterminated
@@ -0,0 +1,52 @@
+"""nightshift_parser must read org files exactly as org_parser does."""
+
+import pytest
+
+import org_parser
+import nightshift_parser
+from benchmark import RepoShape, generate_data_repo, generate_org_text
+
+FIELDS = ('id', 'title', 'state', 'tags', 'properties', 'line_number', 'heading_level', 'body')
+
+
+def _fields(tasks):
+    return [{name: getattr(t, name) for name in FIELDS} for t in tasks]
+
+
+@pytest.fixture(scope='module')
+def data_dir(tmp_path_factory):
+    root = tmp_path_factory.mktemp('corpus')
+    generate_data_repo(root, RepoShape(spaces=2, files_per_space=6, headings_per_file=30,
+                                       multiline_ratio=0.3, ai_density=0.3))
+    for shape in ('flat', 'nested'):
+        (root / '0-personal' / f'{shape}.org').write_text(generate_org_text(200, shape))
+    return root
+
+
+@pytest.fixture(scope='module')
+def corpus(data_dir):
+    return sorted(data_dir.rglob('*.org'))
+
+
+def test_corpus_is_not_trivial(corpus):
+    assert sum(len(org_parser.parse_org_file(f)) for f in corpus) > 500
+
+
+@pytest.mark.parametrize('lazy', [True, False])
+def test_parse_matches_org_parser(corpus, lazy):
+    for org_file in corpus:
+        expected = _fields(org_parser.parse_org_file(org_file))
+        assert _fields(nightshift_parser.parse_org_file(org_file, lazy=lazy)) == expected, org_file
+
+
+@pytest.mark.parametrize('use_cache', [False, True])
+def test_find_ai_tasks_matches_org_parser(data_dir, use_cache):
+    states = ['TODO', 'NEXT', 'QUEUED', 'WORKING', 'DONE', 'FAILED']
+
+    def key(t):
+        return (str(t.file_path), t.line_number)
+
+    expected = sorted(org_parser.find_ai_tasks(data_dir, states=states), key=key)
+    for _ in range(2):  # Cold, then warm when cached
+        found = nightshift_parser.find_ai_tasks(data_dir, states=states, use_cache=use_cache)
+        assert _fields(sorted(found, key=key)) == _fields(expected)
@@ -0,0 +1,107 @@
+"""plan_queue at the edges of the budget and the run window."""
+
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from nightshift_parser import OrgTask
+from planner import TASK_OVERHEAD_SECONDS, plan_queue
+
+# One task: 4 minutes of execution plus overhead, i.e. 5 minutes of the window
+SECONDS = 300.0 - TASK_OVERHEAD_SECONDS
+
+
+def _item(task_id, priority, cost=1.0, seconds=SECONDS, depends_on=None):
+    properties = {'ID': task_id}
+    if depends_on:
+        properties['DEPENDS_ON'] = depends_on
+    task = OrgTask(task_id, task_id, 'QUEUED', ['AI'], properties, Path('tasks.org'), 1, 1)
+    return SimpleNamespace(task=task, priority_score=priority, estimated_cost_usd=cost,
+                           estimated_seconds=seconds, estimate=None)
+
+
+@pytest.fixture
+def queue():
+    return [_item('a', 5.0), _item('b', 4.0), _item('c', 3.0), _item('d', 2.0)]
+
+
+def _ids(items):
+    return [item.task.id for item in items]
+
+
+def test_unlimited_plans_everything_in_queue_order(queue):
+    plan = plan_queue(queue)
+    assert _ids(plan.queue()) == ['a', 'b', 'c', 'd']
+    assert plan.deferred == []
+    assert [p.start_seconds for p in plan.tasks] == [0.0, 300.0, 600.0, 900.0]
+    assert plan.total_seconds == 1200.0
+    assert plan.total_cost_usd == pytest.approx(4.0)
+
+
+@pytest.mark.parametrize('budget', [0.0, -3.0, 0.99])
+def test_exhausted_budget_plans_nothing(queue, budget):
+    plan = plan_queue(queue, budget_usd=budget)
+    assert plan.tasks == []
+    assert plan.budget_usd == max(0.0, budget)
+    assert {reason for _, reason in plan.deferred} == {"costs more than the remaining budget"}
+
+
+def test_budget_boundary(queue):
+    assert _ids(plan_queue(queue, budget_usd=4.0).queue()) == ['a', 'b', 'c', 'd']
+    assert _ids(plan_queue(queue, budget_usd=3.99).queue()) == ['a', 'b', 'c']
+    plan = plan_queue(queue, budget_usd=2.0)
+    assert _ids(plan.queue()) == ['a', 'b']
+    assert dict((item.task.id, reason) for item, reason in plan.deferred) == {
+        'c': "does not fit alongside higher-value tasks",
+        'd': "does not fit alongside higher-value tasks",
+    }
+
+
+def test_beats_greedy_when_two_cheaper_tasks_are_worth_more():
+    queue = [_item('big', 10.0, cost=1.0), _item('x', 6.0, cost=0.6), _item('y', 6.0, cost=0.6)]
+    assert _ids(plan_queue(queue, budget_usd=1.2).queue()) == ['x', 'y']
+
+
+def test_deadline_boundary(queue):
+    assert _ids(plan_queue(queue, deadline_seconds=900.0).queue()) == ['a', 'b', 'c']
+    assert _ids(plan_queue(queue, deadline_seconds=899.0).queue()) == ['a', 'b']
+    assert plan_queue(queue, deadline_seconds=0.0).tasks == []
+    long = _item('long', 9.0, seconds=3600.0)
+    plan = plan_queue([long] + queue, deadline_seconds=600.0)
+    assert _ids(plan.queue()) == ['a', 'b']
+    assert plan.deferred[0] == (long, "longer than the run window")
+
+
+def test_budget_and_deadline_together(queue):
+    queue[0].estimated_cost_usd = 3.0
+    plan = plan_queue(queue, budget_usd=3.0, deadline_seconds=900.0)
+    assert _ids(plan.queue()) == ['b', 'c', 'd']
+
+
+def test_trim_to_defers_the_tail(queue):
+    plan = plan_queue(queue, budget_usd=3.0)
+    plan.trim_to(600.0)
+    assert _ids(plan.queue()) == ['a', 'b']
+    assert [(item.task.id, reason) for item, reason in plan.deferred] == [
+        ('c', "longer than the run window"),
+        ('d', "does not fit alongside higher-value tasks"),
+    ]
+    assert plan.deadline_seconds == 600.0
+    plan.trim_to(-1.0)
+    assert plan.tasks == []
+
+
+def test_prerequisites_come_first_and_gate_dependents():
+    queue = [_item('pre', 1.0), _item('dep', 9.0, depends_on='pre'), _item('other', 5.0)]
+    assert _ids(plan_queue(queue, budget_usd=2.0).queue()) == ['pre', 'dep']
+    plan = plan_queue([_item('pre', 1.0, cost=5.0), _item('dep', 9.0, depends_on='pre')],
+                      budget_usd=2.0)
+    assert plan.tasks == []
+    assert plan.deferred[1][1] == "waits on deferred pre"
+
+
+def test_greedy_fill_beyond_the_candidates(queue):
+    plan = plan_queue(queue, budget_usd=3.0, max_candidates=1)
+    assert _ids(plan.queue()) == ['a', 'b', 'c']
+    assert plan_queue(queue, budget_usd=-1.0, max_candidates=0).tasks == []
@@ -0,0 +1,104 @@
+"""SpendLedger shared by two processes (two instances on one data dir)."""
+
+import json
+
+import pytest
+
+from discovery import state_dir
+from spend_ledger import SpendLedger, _today, token_cost
+
+TOKENS = 100_000
+COST = token_cost(TOKENS)
+
+
+@pytest.fixture
+def ledgers(tmp_path):
+    return SpendLedger(tmp_path), SpendLedger(tmp_path)
+
+
+def _write_record(data_dir, exec_id, tokens=TOKENS, space='1-team'):
+    path = state_dir(data_dir) / f'{_today()}-{exec_id}.json'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({'exec_id': exec_id, 'space': space, 'ai_tag': ':AI:research:',
+                                'tokens_used': tokens, 'status': 'completed'}))
+    return path
+
+
+def test_record_is_seen_by_the_other_instance(ledgers):
+    a, b = ledgers
+    a.record('e1', '0-personal', ':AI:', TOKENS, 'completed')
+    assert b.spent() == pytest.approx(COST)
+    assert b.spent('0-personal') == pytest.approx(COST)
+    assert b.breakdown() == a.breakdown()
+
+
+def test_reservations_hold_budget_across_instances(ledgers):
+    a, b = ledgers
+    limit = COST * 1.5
+    held = a.reserve(COST, limit, space='0-personal')
+    assert held is not None
+    assert b.reserved() == pytest.approx(COST)
+    assert b.reserve(COST, limit) is None
+
+    a.release(held)
+    other = b.reserve(COST, limit)
+    assert other is not None
+    assert a.reserve(COST, limit) is None
+
+    # The spend line settles the reservation: spent, no longer reserved
+    b.record('e1', '0-personal', ':AI:', TOKENS, 'completed', reservation=other)
+    assert a.reserved() == 0.0
+    assert a.spent() == pytest.approx(COST)
+    assert a.reserve(COST, limit) is None
+
+
+def test_space_quota_counts_only_that_space(ledgers):
+    a, b = ledgers
+    a.record('e1', '1-team', ':AI:', TOKENS)
+    assert b.reserve(COST, 0, space='1-team', space_limit_usd=COST * 1.5) is None
+    assert b.reserve(COST, 0, space='2-other', space_limit_usd=COST * 1.5) is not None
+
+
+def test_pulled_records_are_folded_in_once(tmp_path, ledgers):
+    a, b = ledgers
+    a.record('mine', '0-personal', ':AI:', TOKENS)
+    _write_record(tmp_path, 'mine')       # This executor's own record, pushed later
+    _write_record(tmp_path, 'theirs')     # Another executor's, pulled by git
+    for ledger in (a, b, SpendLedger(tmp_path)):
+        assert ledger.spent() == pytest.approx(2 * COST)
+        assert ledger.spent('1-team') == pytest.approx(COST)
+    lines = a.path.read_text().splitlines()
+    assert sorted(json.loads(line)['exec_id'] for line in lines) == ['mine', 'theirs']
+
+
+def test_rebuild_from_records_when_corrupt(tmp_path, ledgers):
+    a, b = ledgers
+    _write_record(tmp_path, 'e1')
+    _write_record(tmp_path, 'e2', tokens=TOKENS * 2)
+    held = a.reserve(COST, 0)
+    assert b.spent() == pytest.approx(3 * COST)
+    rebuilds = a.rebuilds, b.rebuilds
+
+    with open(a.path, 'a') as f:
+        f.write('{not json}\n')
+    assert b.spent() == pytest.approx(3 * COST)
+    assert b.rebuilds == rebuilds[1] + 1
+
+    a.rebuild()
+    assert a.rebuilds == rebuilds[0] + 1
+    assert a.spent() == pytest.approx(3 * COST)
+    assert a.reserved() == pytest.approx(COST)  # Its own open reservation survives
+    assert b.spent() == pytest.approx(3 * COST)
+    assert b.reserved() == pytest.approx(COST)
+    a.release(held)
+    assert b.reserved() == 0.0
+
+
+def test_rebuild_when_ledger_is_lost(tmp_path, ledgers):
+    a, b = ledgers
+    a.record('e1', '0-personal', ':AI:', TOKENS)
+    _write_record(tmp_path, 'e1', space='0-personal')
+    a.path.unlink()
+    assert b.spent() == pytest.approx(COST)
+    assert b.spent('0-personal') == pytest.approx(COST)
+    assert a.path.exists()